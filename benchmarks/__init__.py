@@ -0,0 +1,2 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Performance benchmarks for the PHD2 exporter."""
@@ -0,0 +1,23 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Fixtures for benchmarks."""
+
+from collections.abc import Iterator
+
+import pytest
+
+from phd2_exporter.rms import WINDOW_LIVE
+from phd2_exporter.rmsstore import RmsWindow
+from phd2_exporter.state import PHD2State, reset_state, set_state
+
+
+@pytest.fixture
+def state() -> Iterator[PHD2State]:
+    """State for a guiding instance with global labels, set as the current state."""
+    state = PHD2State()
+    state.set_global_labels("bench", 1)
+    state.phd_state = "Guiding"
+    state.pixel_scale = 1.5
+    state.phd_rms_windows = [RmsWindow(WINDOW_LIVE, samples=10)]
+    token = set_state(state)
+    yield state
+    reset_state(token)
@@ -0,0 +1,53 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Throughput benchmark for JSON decoders on the PHD2 event stream.
+
+Decodes every line of a recorded stream with each installed decoder.
+
+Usage:
+    python benchmarks/decoding.py [capture_file]
+
+The capture file is a raw recording of the PHD2 event stream, see
+benchmarks/framing.py. Without one a synthetic guiding session is generated.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+from framing import synthetic_stream
+
+from phd2_exporter.decoding import available_decoders, get_decoder
+from phd2_exporter.framing import LineFramer
+
+ROUNDS = 3
+
+
+def main() -> int:
+    """Run the benchmark."""
+    stream = Path(sys.argv[1]).read_bytes() if len(sys.argv) > 1 else synthetic_stream()
+    lines = LineFramer(max_line_length=len(stream)).feed(stream)
+    print(f"stream: {len(stream)} bytes, {len(lines)} lines")
+
+    results = {}
+    for name in available_decoders():
+        _, decode = get_decoder(name)
+        best = float("inf")
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            for line in lines:
+                decode(line)
+            best = min(best, time.perf_counter() - start)
+        results[name] = best
+
+    # json is always available and is the baseline
+    for name, elapsed in results.items():
+        print(
+            f"{name:<10} {len(lines) / elapsed:>12,.0f} lines/sec  "
+            f"{results['json'] / elapsed:>5.1f}x json"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
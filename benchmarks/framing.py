@@ -0,0 +1,126 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Throughput benchmark for framing and parsing the PHD2 event stream.
+
+Compares the previous approach (recv(1024), decode, split on CRLF) with the
+buffered LineFramer reading in RECV_BUFSIZE chunks. The previous approach
+breaks any event straddling a 1024 byte boundary, each of which caused a
+reconnect; those are reported as failures.
+
+Usage:
+    python benchmarks/framing.py [capture_file]
+
+The capture file is a raw recording of the PHD2 event stream, for example
+taken with `nc 127.0.0.1 4400 > capture.txt`. Without one a synthetic guiding
+session is generated.
+"""
+
+import json
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from phd2_exporter.framing import RECV_BUFSIZE, LineFramer
+
+SYNTHETIC_FRAMES = 50000
+
+
+def synthetic_stream(frames: int = SYNTHETIC_FRAMES) -> bytes:
+    """Generate a stream resembling a guiding session."""
+    events = [
+        {"Event": "Version", "Host": "bench", "Inst": 1, "PHDVersion": "2.6.11"},
+        {"Event": "AppState", "Host": "bench", "Inst": 1, "State": "Guiding"},
+    ]
+    for frame in range(frames):
+        events.append(
+            {
+                "Event": "GuideStep",
+                "Timestamp": 1700000000.0 + frame * 2,
+                "Host": "bench",
+                "Inst": 1,
+                "Frame": frame,
+                "Time": frame * 2.0,
+                "Mount": "EQMOD ASCOM HEQ5/6",
+                "dx": 0.123,
+                "dy": -0.456,
+                "RADistanceRaw": 0.321,
+                "DECDistanceRaw": -0.111,
+                "RADistanceGuide": 0.25,
+                "DECDistanceGuide": 0.0,
+                "RADuration": 120,
+                "RADirection": "West",
+                "DECDuration": 0,
+                "DECDirection": "North",
+                "StarMass": 23456,
+                "SNR": 45.67,
+                "HFD": 2.34,
+                "AvgDist": 0.42,
+            }
+        )
+    return b"".join(json.dumps(e).encode() + b"\r\n" for e in events)
+
+
+def chunks(stream: bytes, size: int) -> list[bytes]:
+    """Split the stream into reads of the given size."""
+    return [stream[i : i + size] for i in range(0, len(stream), size)]
+
+
+def run_split(reads: list[bytes]) -> tuple[int, int]:
+    """Previous approach: decode each read and split on CRLF."""
+    events = 0
+    failures = 0
+    for raw in reads:
+        try:
+            for line in raw.decode().split("\r\n"):
+                if len(line) > 0:
+                    json.loads(line)
+                    events += 1
+        except ValueError:
+            # the exporter tore down the connection here
+            failures += 1
+    return events, failures
+
+
+def run_framer(reads: list[bytes]) -> tuple[int, int]:
+    """LineFramer approach: only complete lines are parsed."""
+    events = 0
+    framer = LineFramer()
+    for raw in reads:
+        for line in framer.feed(raw):
+            json.loads(line)
+            events += 1
+    return events, 0
+
+
+def report(
+    name: str,
+    reads: list[bytes],
+    runner: Callable[[list[bytes]], tuple[int, int]],
+) -> None:
+    """Time a runner and print events/sec."""
+    start = time.perf_counter()
+    events, failures = runner(reads)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<28} {events:>9} events  {failures:>6} failures  "
+        f"{events / elapsed:>12,.0f} events/sec"
+    )
+
+
+def main() -> int:
+    """Run the benchmark."""
+    stream = Path(sys.argv[1]).read_bytes() if len(sys.argv) > 1 else synthetic_stream()
+
+    print(f"stream: {len(stream)} bytes")
+    report("before: recv(1024) + split", chunks(stream, 1024), run_split)
+    report(
+        f"after: recv({RECV_BUFSIZE}) + framer",
+        chunks(stream, RECV_BUFSIZE),
+        run_framer,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
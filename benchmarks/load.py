@@ -0,0 +1,70 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Load test of the collector against the PHD2 simulator.
+
+Streams a simulated session at the requested GuideStep rate into an
+InstanceCollector in the same process and reports the events handled per
+second and the delay between an event being sent and being decoded.
+
+Usage:
+    python benchmarks/load.py [rate] [frames]
+
+Defaults to 10000 GuideSteps/sec for 50000 frames. Use a rate higher than
+the collector can keep up with to measure its maximum throughput.
+"""
+
+import asyncio
+import sys
+import time
+from typing import Any
+
+from phd2_exporter.collector import InstanceCollector
+from phd2_exporter.decoding import get_decoder
+from phd2_exporter.simulator import Simulator, SimulatorConfig
+from phd2_exporter.state import set_state
+
+
+async def run(rate: float, frames: int) -> None:
+    """Run one session and print the results."""
+    decoder_name, decode = get_decoder()
+    lags: list[float] = []
+
+    def timed_decode(line: bytes) -> Any:
+        data = decode(line)
+        if "Timestamp" in data:
+            lags.append(time.time() - data["Timestamp"])
+        return data
+
+    simulator = Simulator(SimulatorConfig(port=0, rate=rate, frames=frames, seed=1))
+    await simulator.start()
+    collector = InstanceCollector("127.0.0.1", simulator.port, decode=timed_decode)
+    set_state(collector.state)
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", simulator.port)
+    start = time.perf_counter()
+    await collector.read_events(reader, writer)
+    elapsed = time.perf_counter() - start
+    writer.close()
+    await simulator.close()
+
+    lags.sort()
+    print(f"decoder:  {decoder_name}")
+    print(f"target:   {rate:,.0f} GuideSteps/sec, {frames} frames")
+    print(f"handled:  {len(lags)} events in {elapsed:.2f}s")
+    print(f"rate:     {len(lags) / elapsed:,.0f} events/sec")
+    for quantile in (0.5, 0.9, 0.99):
+        lag = lags[min(len(lags) - 1, int(quantile * len(lags)))]
+        print(f"lag p{quantile * 100:g}: {lag * 1000:8.2f} ms")
+
+
+def main() -> int:
+    """Run the load test."""
+    args = sys.argv[1:]
+    rate = float(args[0]) if args else 10000.0
+    frames = int(args[1]) if len(args) > 1 else 50000
+    asyncio.run(run(rate, frames))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Microbenchmark for metric updates per GuideStep event.
+
+Compares building metric names and label dicts on every update (the
+previous approach) with cached metric handles, both writing to the real
+metrics backend.
+
+Usage:
+    python benchmarks/metrics.py
+"""
+
+import copy
+import time
+from typing import Any
+
+from phd2_exporter.state import APP_STATES, PHD2State
+from phd2_exporter.utils import (
+    create_event_metrics,
+    get_metric_handle,
+    utility_set,
+)
+
+EVENTS = 20000
+
+GUIDE_STEP = {
+    "Event": "GuideStep",
+    "dx": 0.123,
+    "dy": -0.456,
+    "RADistanceRaw": 0.321,
+    "DECDistanceRaw": -0.111,
+    "RADistanceGuide": 0.25,
+    "DECDistanceGuide": 0.0,
+    "RADuration": 120,
+    "RADirection": "West",
+    "RALimited": False,
+    "DECDuration": 0,
+    "DECDirection": "North",
+    "DecLimited": False,
+    "StarMass": 23456,
+    "SNR": 45.67,
+    "HFD": 2.34,
+    "AvgDist": 0.42,
+    "ErrorCode": 0,
+}
+
+GENERAL_KEYS = (
+    "dx",
+    "dy",
+    "RADistanceRaw",
+    "DECDistanceRaw",
+    "RADistanceGuide",
+    "DECDistanceGuide",
+    "StarMass",
+    "SNR",
+    "HFD",
+    "AvgDist",
+    "ErrorCode",
+)
+
+
+def per_call(state: PHD2State, data: dict[str, Any]) -> None:
+    """Previous approach: names and labels built on every update."""
+    assert state.global_labels is not None
+    for status in [*APP_STATES, "Settling"]:
+        labels = copy.deepcopy(state.global_labels)
+        labels.update({"status": status})
+        utility_set("phd2_status", int(state.phd_state == status), labels)
+
+    for key in GENERAL_KEYS:
+        utility_set(f"phd2_{data['Event']}_{key}", data[key], state.global_labels)
+
+    l_ra = copy.deepcopy(state.global_labels)
+    l_ra.update({"RADirection": data["RADirection"], "RALimited": data["RALimited"]})
+    utility_set(f"phd2_{data['Event']}_RADuration", data["RADuration"], l_ra)
+
+    l_dec = copy.deepcopy(state.global_labels)
+    l_dec.update(
+        {"DECDirection": data["DECDirection"], "DecLimited": data["DecLimited"]}
+    )
+    utility_set(f"phd2_{data['Event']}_DECDuration", data["DECDuration"], l_dec)
+
+
+STATUS_LABELS = {status: (("status", status),) for status in [*APP_STATES, "Settling"]}
+
+
+def handles(state: PHD2State, data: dict[str, Any]) -> None:
+    """Cached handles resolved once per label set."""
+    for status, labels in STATUS_LABELS.items():
+        get_metric_handle(state, "phd2_status", labels).set(
+            int(state.phd_state == status)
+        )
+
+    create_event_metrics(state, data, GENERAL_KEYS)
+    create_event_metrics(state, data, ("RADuration",), ("RADirection", "RALimited"))
+    create_event_metrics(state, data, ("DECDuration",), ("DECDirection", "DecLimited"))
+
+
+def report(name: str, runner: Any) -> None:
+    """Time a runner and print the cost per event."""
+    state = PHD2State()
+    state.set_global_labels("bench", 1)
+    state.phd_state = "Guiding"
+    runner(state, GUIDE_STEP)
+
+    start = time.perf_counter()
+    for _ in range(EVENTS):
+        runner(state, GUIDE_STEP)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<10} {elapsed / EVENTS * 1e6:>8.1f} us/event")
+
+
+def main() -> int:
+    """Run the benchmark."""
+    report("per-call", per_call)
+    report("handles", handles)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,38 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Sample PHD2 events for benchmarks."""
+
+import random
+from typing import Any
+
+from phd2_exporter.simulator import SimulatorConfig, guide_step, make_event
+
+CONFIG = SimulatorConfig(name="bench")
+
+
+def sample_events() -> dict[str, dict[str, Any]]:
+    """One representative event per supported event type."""
+    rng = random.Random(1)
+    events = [
+        make_event(CONFIG, "Version", PHDVersion="2.6.13", PHDSubver="", MsgVersion=1),
+        make_event(CONFIG, "AppState", State="Guiding"),
+        make_event(CONFIG, "LockPositionSet", X=512.3, Y=384.7),
+        make_event(CONFIG, "StarSelected", X=512.3, Y=384.7),
+        make_event(
+            CONFIG, "Calibrating", dir="West", dist=12.5, dx=8.1, dy=-9.4, step=4
+        ),
+        make_event(CONFIG, "StarLost", StarMass=120, SNR=2.1, AvgDist=0.4, ErrorCode=1),
+        make_event(
+            CONFIG,
+            "Settling",
+            Distance=0.8,
+            Time=3.0,
+            SettleTime=10.0,
+            StarLocked=True,
+        ),
+        make_event(CONFIG, "SettleDone", Status=0, TotalFrames=5, DroppedFrames=0),
+        make_event(CONFIG, "GuidingDithered", dx=2.0, dy=-1.5),
+        make_event(CONFIG, "Alert", Msg="Star lost", Type="warning"),
+        make_event(CONFIG, "GuideParamChange", Name="Aggressiveness", Value=70),
+        guide_step(CONFIG, 1, rng),
+    ]
+    return {event["Event"]: event for event in events}
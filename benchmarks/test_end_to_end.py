@@ -0,0 +1,27 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Benchmark from the socket to the metrics backend."""
+
+import asyncio
+
+from phd2_exporter.collector import InstanceCollector
+from phd2_exporter.simulator import Simulator, SimulatorConfig
+from phd2_exporter.state import set_state
+
+FRAMES = 2000
+
+
+async def session() -> None:
+    """Stream a simulated session as fast as possible into a collector."""
+    simulator = Simulator(SimulatorConfig(port=0, rate=1e9, frames=FRAMES, seed=1))
+    await simulator.start()
+    collector = InstanceCollector("127.0.0.1", simulator.port)
+    set_state(collector.state)
+    reader, writer = await asyncio.open_connection("127.0.0.1", simulator.port)
+    await collector.read_events(reader, writer)
+    writer.close()
+    await simulator.close()
+
+
+def test_socket_to_metrics(benchmark):
+    """Handle a guiding session of FRAMES GuideSteps end to end."""
+    benchmark.pedantic(lambda: asyncio.run(session()), rounds=5, iterations=1)
@@ -0,0 +1,25 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Benchmarks for handling a single event of each type."""
+
+import pytest
+
+from benchmarks.samples import sample_events
+from phd2_exporter.events import handle_event
+from phd2_exporter.jsonrpc import reset_requests
+from phd2_exporter.replay import NullSender
+
+EVENTS = sample_events()
+
+
+@pytest.mark.parametrize("event", list(EVENTS))
+def test_handle_event(benchmark, state, event):
+    """Handle one event with metrics written to the real backend."""
+    data = EVENTS[event]
+    sender = NullSender()
+
+    def run() -> None:
+        handle_event(sender, data)
+        # requests are never answered, do not let callbacks pile up
+        reset_requests(state)
+
+    benchmark(run)
@@ -0,0 +1,45 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Benchmarks for RMS collection and export per GuideStep."""
+
+import random
+
+import pytest
+
+from benchmarks.samples import CONFIG
+from phd2_exporter.rms import calculate_and_export_rms, collect_rms_data
+from phd2_exporter.rmsstore import RmsWindow, parse_rms_windows
+from phd2_exporter.simulator import guide_step
+
+
+@pytest.mark.parametrize(
+    "windows",
+    ["live:10", "live:100", "live:1000", "live:10,5m:5m,session"],
+)
+def test_collect_and_export_rms(benchmark, state, windows):
+    """Collect one GuideStep into full windows and export RMS."""
+    state.phd_rms_windows = parse_rms_windows(windows)
+    rng = random.Random(1)
+    steps = [guide_step(CONFIG, frame, rng) for frame in range(2000)]
+    # fill every window first, timestamps keep increasing below
+    for step in steps:
+        collect_rms_data(step)
+    step = steps[-1]
+
+    def run() -> None:
+        step["Timestamp"] += 2.0
+        if collect_rms_data(step):
+            calculate_and_export_rms()
+
+    benchmark(run)
+
+
+def test_collect_only(benchmark, state):
+    """Collect one GuideStep without exporting, the store update cost."""
+    state.phd_rms_windows = [RmsWindow("live", samples=1000)]
+    step = guide_step(CONFIG, 1, random.Random(1))
+
+    def run() -> None:
+        step["Timestamp"] += 2.0
+        collect_rms_data(step)
+
+    benchmark(run)
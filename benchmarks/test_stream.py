@@ -0,0 +1,36 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Benchmarks for framing and decoding the PHD2 event stream."""
+
+import pytest
+
+from benchmarks.framing import chunks, synthetic_stream
+from phd2_exporter.decoding import available_decoders, get_decoder
+from phd2_exporter.framing import RECV_BUFSIZE, LineFramer
+
+FRAMES = 5000
+
+STREAM = synthetic_stream(FRAMES)
+LINES = LineFramer(max_line_length=len(STREAM)).feed(STREAM)
+
+
+def test_framing(benchmark):
+    """Frame a session read in RECV_BUFSIZE chunks."""
+    reads = chunks(STREAM, RECV_BUFSIZE)
+
+    def run() -> int:
+        framer = LineFramer()
+        return sum(len(framer.feed(raw)) for raw in reads)
+
+    assert benchmark(run) == len(LINES)
+
+
+@pytest.mark.parametrize("decoder", available_decoders())
+def test_decoding(benchmark, decoder):
+    """Decode every line of a session."""
+    _, decode = get_decoder(decoder)
+
+    def run() -> None:
+        for line in LINES:
+            decode(line)
+
+    benchmark(run)
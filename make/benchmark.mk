@@ -0,0 +1,24 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+# Benchmark Targets
+# =================
+
+BENCHMARK_STORAGE := benchmarks/baselines
+BENCHMARK_ARGS := benchmarks/ --no-cov --benchmark-storage=$(BENCHMARK_STORAGE) --benchmark-columns=min,mean,stddev,ops
+
+.PHONY: benchmark benchmark-baseline benchmark-check
+
+benchmark: requirements-dev ## Run benchmarks
+	@$(VENV_PYTHON) -m pytest $(BENCHMARK_ARGS) $(ARGS)
+	@printf "$(GREEN)✅ Benchmarks completed$(RESET)\n"
+
+benchmark-baseline: requirements-dev ## Run benchmarks and store the results as the new baseline
+	@$(VENV_PYTHON) -m pytest $(BENCHMARK_ARGS) --benchmark-save=baseline $(ARGS)
+	@printf "$(GREEN)✅ Baseline stored in $(BENCHMARK_STORAGE)$(RESET)\n"
+
+benchmark-check: requirements-dev ## Fail if benchmarks regressed against the latest baseline
+	@if [ -z "$$(find $(BENCHMARK_STORAGE) -name '*.json' 2>/dev/null)" ]; then \
+		printf "$(RED)❌ No baseline found. Run 'make benchmark-baseline' first.$(RESET)\n"; \
+		exit 1; \
+	fi
+	@$(VENV_PYTHON) -m pytest $(BENCHMARK_ARGS) --benchmark-compare --benchmark-compare-fail=mean:$(BENCHMARK_THRESHOLD)% $(ARGS)
+	@printf "$(GREEN)✅ No benchmark regressed more than $(BENCHMARK_THRESHOLD)%%$(RESET)\n"
@@ -12,6 +12,9 @@ VENV_UV := $(VENV_DIR)/bin/uv
 # Coverage settings
 COVERAGE_THRESHOLD ?= 80
 
+# Benchmark settings, percent slower in mean than the baseline that fails
+BENCHMARK_THRESHOLD ?= 20
+
 # Colors for output
 BLUE := \033[34m
 GREEN := \033[32m
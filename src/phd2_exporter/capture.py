@@ -0,0 +1,241 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Capture of the raw PHD2 event stream to compressed, size rotated files.
+
+Every batch of lines read from PHD2 is written unchanged, preceded by a
+{"Received": <time>} line with the time it was read. JSONRPC requests sent
+to PHD2 are written the same way, so replay can tell which method each
+captured response answers. The files are captures that phd2-replay can
+read, the Received lines are skipped on replay.
+
+Writing happens on a background thread fed by a bounded queue, so a slow
+disk never stalls reading from PHD2. Batches that do not fit in the queue
+are dropped and counted. Batches that fail to write, e.g. on a full disk,
+are reported and counted, and writing goes on with a new file.
+"""
+
+import contextlib
+import gzip
+import json
+import queue
+import threading
+import time
+from collections.abc import Callable
+from io import BufferedIOBase, BufferedReader
+from pathlib import Path
+from typing import Any
+
+COMPRESSION_AUTO = "auto"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_NONE = "none"
+
+COMPRESSIONS = (COMPRESSION_ZSTD, COMPRESSION_GZIP, COMPRESSION_NONE)
+
+SUFFIXES = {
+    COMPRESSION_ZSTD: ".txt.zst",
+    COMPRESSION_GZIP: ".txt.gz",
+    COMPRESSION_NONE: ".txt",
+}
+
+# start a new file after this many compressed bytes
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+# batches waiting to be written before new ones are dropped
+DEFAULT_QUEUE_SIZE = 1024
+
+# seconds close waits for room in the queue before checking the writer is alive
+CLOSE_TIMEOUT = 1.0
+
+LINE_DELIMITER = b"\r\n"
+
+# wraps a raw file in a compressing writer
+Compressor = Callable[[BufferedIOBase], BufferedIOBase]
+
+
+def _zstd_compressor() -> Compressor | None:
+    """Get a zstd compressor if zstandard is installed."""
+    try:
+        import zstandard  # noqa: PLC0415
+    except ImportError:
+        return None
+
+    def compress(raw: BufferedIOBase) -> BufferedIOBase:
+        writer: BufferedIOBase = zstandard.ZstdCompressor().stream_writer(raw)
+        return writer
+
+    return compress
+
+
+def _gzip_compressor(raw: BufferedIOBase) -> BufferedIOBase:
+    """Wrap a file in a gzip writer."""
+    return gzip.GzipFile(fileobj=raw, mode="wb")
+
+
+def get_compression(name: str = COMPRESSION_AUTO) -> tuple[str, Compressor | None]:
+    """
+    Get a compressor by name, auto picks zstd if installed else gzip.
+
+    The compressor is None for no compression. Raises ValueError for unknown
+    names or zstd when zstandard is not installed.
+    """
+    if name == COMPRESSION_AUTO:
+        compressor = _zstd_compressor()
+        if compressor is not None:
+            return COMPRESSION_ZSTD, compressor
+        return COMPRESSION_GZIP, _gzip_compressor
+    if name == COMPRESSION_ZSTD:
+        compressor = _zstd_compressor()
+        if compressor is None:
+            raise ValueError("zstd capture compression needs zstandard installed")
+        return name, compressor
+    if name == COMPRESSION_GZIP:
+        return name, _gzip_compressor
+    if name == COMPRESSION_NONE:
+        return name, None
+    raise ValueError(
+        f"Unknown capture compression '{name}', expected one of: {COMPRESSION_AUTO}, {', '.join(COMPRESSIONS)}"
+    )
+
+
+def encode_batch(received: float, lines: list[bytes]) -> bytes:
+    """Encode lines read at the same time, preceded by the receive time."""
+    marker = json.dumps({"Received": received}).encode("utf-8")
+    return LINE_DELIMITER.join([marker, *lines]) + LINE_DELIMITER
+
+
+class CaptureSink:
+    """Writes the raw event stream of one PHD2 instance to rotating files."""
+
+    def __init__(
+        self,
+        directory: Path,
+        prefix: str,
+        compression: str = COMPRESSION_AUTO,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ) -> None:
+        """Initialize sink, files are named <prefix>-<time><suffix> in directory."""
+        self.directory = directory
+        self.prefix = prefix
+        self.compression, self.compressor = get_compression(compression)
+        self.max_bytes = max_bytes
+        self.queue: queue.Queue[bytes | None] = queue.Queue(queue_size)
+        # batches dropped because the queue was full
+        self.dropped = 0
+        # batches that could not be written
+        self.failed = 0
+        self.files: list[Path] = []
+        self._raw: BufferedIOBase | None = None
+        self._out: BufferedIOBase | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(
+            target=self._run, name=f"capture-{self.prefix}", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, received: float, lines: list[bytes]) -> bool:
+        """Queue lines read at the given time, False if dropped. Never blocks."""
+        try:
+            self.queue.put_nowait(encode_batch(received, lines))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def close(self) -> None:
+        """Write everything queued, close the current file and stop the thread."""
+        if self._thread is None:
+            return
+        # waits for room, close is not called from the reader
+        put_while_alive(self._thread, self.queue, None)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        """Write queued batches until closed, a failed batch is reported and lost."""
+        failing = False
+        try:
+            while (batch := self.queue.get()) is not None:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    self.failed += 1
+                    if not failing:
+                        print(f"Capture to {self.directory} failed: {e}")
+                    failing = True
+                    # the file may be broken, the next batch starts a new one
+                    with contextlib.suppress(Exception):
+                        self._close_file()
+                    self._raw = self._out = None
+                else:
+                    if failing:
+                        print(f"Capture to {self.directory} recovered")
+                    failing = False
+        finally:
+            with contextlib.suppress(Exception):
+                self._close_file()
+
+    def _write(self, batch: bytes) -> None:
+        """Write a batch, rotating first if the current file is full."""
+        if self._raw is not None and self._raw.tell() >= self.max_bytes:
+            self._close_file()
+        if self._out is None:
+            self._open_file()
+        assert self._out is not None
+        self._out.write(batch)
+
+    def _open_file(self) -> None:
+        """Open a new capture file."""
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = self.directory / f"{self.prefix}-{stamp}{SUFFIXES[self.compression]}"
+        # several files in the same second get a counter
+        count = 1
+        while path.exists():
+            path = self.directory / (
+                f"{self.prefix}-{stamp}-{count}{SUFFIXES[self.compression]}"
+            )
+            count += 1
+        self._raw = path.open("wb")
+        self._out = self._raw if self.compressor is None else self.compressor(self._raw)
+        self.files.append(path)
+
+    def _close_file(self) -> None:
+        """Finish compression and close the current file."""
+        if self._out is not None and self._out is not self._raw:
+            self._out.close()
+        if self._raw is not None and not self._raw.closed:
+            self._raw.close()
+        self._raw = None
+        self._out = None
+
+
+def put_while_alive(
+    thread: threading.Thread, items: queue.Queue[Any], item: Any
+) -> bool:
+    """Queue an item for a writer thread, waiting for room, False if it died."""
+    while thread.is_alive():
+        try:
+            items.put(item, timeout=CLOSE_TIMEOUT)
+        except queue.Full:
+            continue
+        return True
+    return False
+
+
+def open_capture(path: Path) -> BufferedIOBase:
+    """Open a capture for reading, decompressing .gz and .zst files."""
+    if path.suffix == ".zst":
+        import zstandard  # noqa: PLC0415
+
+        # buffered for reading guide logs line by line
+        return BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(path.open("rb"))
+        )
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    return path.open("rb")
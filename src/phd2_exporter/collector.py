@@ -0,0 +1,247 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Asyncio collector for one or more PHD2 instances."""
+
+import asyncio
+import contextlib
+import json
+import time
+from typing import Any
+
+from .capture import CaptureSink
+from .decoding import Decoder
+from .events import handle_event, publish_status
+from .framing import LINE_DELIMITER, RECV_BUFSIZE, LineFramer
+from .histogram import publish_histograms
+from .jsonrpc import expire_requests, handle_jsonrpc_response, reset_requests
+from .latency import observe_event
+from .poller import Poller
+from .state import PHD2State, set_state
+from .utils import get_metric_handle, utility_inc
+
+# seconds to wait for data before counting PHD2 as idle
+READ_TIMEOUT = 2.0
+
+# seconds to wait before reconnecting after something went wrong
+RECONNECT_DELAY = 2.0
+
+# batches of lines read but not yet handled before new batches are dropped
+QUEUE_SIZE = 256
+
+# most batches taken from the queue at once, the reader runs between batches
+MAX_DRAIN = 64
+
+# the only lines shed when event handling is behind, every other line changes state
+GUIDE_STEP = b'"GuideStep"'
+
+# Connection refused error code - don't log these, it's spammy
+CONNECTION_REFUSED_ERRNO = 10061
+
+
+# time lines were read and the lines
+Batch = tuple[float, list[bytes]]
+
+
+class StreamSocket:
+    """Gives an asyncio stream writer the socket interface used for JSONRPC requests."""
+
+    def __init__(
+        self, writer: asyncio.StreamWriter, capture: CaptureSink | None = None
+    ) -> None:
+        """Wrap a stream writer, requests are also written to capture if given."""
+        self._writer = writer
+        self._capture = capture
+
+    def sendall(self, data: bytes) -> None:
+        """Queue data for sending, the event loop flushes it without blocking."""
+        self._writer.write(data)
+        if self._capture is not None:
+            # replay matches captured responses to these requests
+            self._capture.write(time.time(), data.split(LINE_DELIMITER)[:-1])
+
+
+def process_line(s: StreamSocket, line: bytes, decode: Decoder = json.loads) -> Any:
+    """Parse a single line from PHD2, dispatch it and return the parsed data."""
+    data = decode(line)
+    if "Event" in data:
+        handle_event(s, data)
+    elif "jsonrpc" in data and "id" in data:
+        handle_jsonrpc_response(data)
+    return data
+
+
+class InstanceCollector:
+    """Owns the connection to a single PHD2 instance and its state."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        state: PHD2State | None = None,
+        *,
+        decode: Decoder = json.loads,
+        capture: CaptureSink | None = None,
+        queue_size: int = QUEUE_SIZE,
+        poll_intervals: dict[str, float] | None = None,
+    ) -> None:
+        """Initialize collector for PHD2 at host:port, optionally capturing the raw stream."""
+        self.host = host
+        self.port = port
+        self.state = state if state is not None else PHD2State()
+        self.decode = decode
+        self.capture = capture
+        self.queue_size = queue_size
+        # seconds between polls of each JSONRPC method, see poller.parse_poll
+        self.poll_intervals = poll_intervals or {}
+
+    async def run(self) -> None:
+        """Connect to PHD2 and process events forever, reconnecting on failure."""
+        # runs in its own task, so this only affects event handling for this instance
+        set_state(self.state)
+        print_connect_error = True
+
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                print_connect_error = True
+                try:
+                    await self.read_events(reader, writer)
+                finally:
+                    writer.close()
+                    with contextlib.suppress(Exception):
+                        await writer.wait_closed()
+            except OSError as e:
+                utility_inc("phd2_error", {"type": type(e).__name__})
+                if e.errno == CONNECTION_REFUSED_ERRNO:
+                    if print_connect_error:
+                        print(
+                            f"Failed to connect to PHD2 at {self.host}:{self.port}.  Server is down or unreachable.  Retrying silently..."
+                        )
+                        print_connect_error = False
+                else:
+                    print(f"socket.error: {e}")
+            except Exception as e:
+                utility_inc("phd2_error", {"type": type(e).__name__})
+                print(f"Exception: {e}")
+
+            # something went wrong.  try again in a little bit...
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def read_events(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Read events until the connection is closed, handling them in a separate task.
+
+        Reading only frames lines and queues them, so slow event handling
+        never stops the socket from being drained. Batches that do not fit
+        in the queue are dropped.
+        """
+        state = self.state
+        s = StreamSocket(writer, self.capture)
+        # responses to requests sent on a previous connection never arrive
+        reset_requests(state)
+        # partial lines are carried across reads, one framer per connection
+        framer = LineFramer()
+        batches: asyncio.Queue[Batch | None] = asyncio.Queue(self.queue_size)
+        processor = asyncio.create_task(self.process_batches(s, batches))
+        poller = Poller(self.poll_intervals)
+
+        try:
+            while True:
+                if processor.done():
+                    # event handling failed, raise its exception
+                    processor.result()
+
+                if state.global_labels is not None:
+                    # at least every READ_TIMEOUT, requests are written without waiting
+                    poller.poll(s, state, time.monotonic())
+
+                try:
+                    raw = await asyncio.wait_for(
+                        reader.read(RECV_BUFSIZE), READ_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    # this is fine, just nothing to read.  PHD2 idle.  No metric so it's not confused as an error
+                    # keep a count (inc / total) for everything
+                    if state.global_labels is not None:
+                        get_metric_handle(state, "phd2").inc()
+                        # PHD2 sends nothing while stopped, keep time in state current
+                        now = state.clock()
+                        state.account_state_time(now)
+                        publish_status(state, [], now)
+                        publish_histograms(state, now)
+                    expire_requests(state, time.monotonic())
+                    continue
+
+                if len(raw) == 0:
+                    # empty response without a timeout, server is down
+                    # handle what was read, then return which triggers a reconnect
+                    await batches.put(None)
+                    await processor
+                    return
+
+                # keep a count (inc / total) for everything
+                if state.global_labels is not None:
+                    get_metric_handle(state, "phd2").inc()
+
+                lines = framer.feed(raw)
+                if not lines:
+                    continue
+                received = time.time()
+                if self.capture is not None:
+                    # never blocks, batches are dropped if the writer falls behind
+                    captured = self.capture.write(received, lines)
+                    if not captured and state.global_labels is not None:
+                        get_metric_handle(state, "phd2_capture_dropped").inc()
+
+                try:
+                    batches.put_nowait((received, lines))
+                except asyncio.QueueFull:
+                    if state.global_labels is not None:
+                        get_metric_handle(state, "phd2_queue_dropped").inc()
+                    kept = [line for line in lines if GUIDE_STEP not in line]
+                    if kept:
+                        # state changes and responses are never dropped, rare
+                        # enough that waiting for room does not back up the socket
+                        await batches.put((received, kept))
+        finally:
+            processor.cancel()
+
+    async def process_batches(
+        self, s: StreamSocket, batches: asyncio.Queue[Batch | None]
+    ) -> None:
+        """Handle queued lines, draining all waiting batches at once, until None is queued."""
+        state = self.state
+        while True:
+            batch = await batches.get()
+            drained = [batch]
+            while len(drained) < MAX_DRAIN and not batches.empty():
+                drained.append(batches.get_nowait())
+
+            if state.global_labels is not None and batch is not None:
+                # lag of the oldest batch, how far behind reading event handling is
+                get_metric_handle(state, "phd2_queue_lag_seconds").set(
+                    time.time() - batch[0]
+                )
+                get_metric_handle(state, "phd2_queue_depth").set(batches.qsize())
+
+            for item in drained:
+                if item is None:
+                    return
+                received, lines = item
+                for line in lines:
+                    started = time.time()
+                    begin = time.perf_counter()
+                    data = process_line(s, line, self.decode)
+                    elapsed = time.perf_counter() - begin
+                    observe_event(state, data, received, started, elapsed)
+                # let the reader drain the socket between batches
+                await asyncio.sleep(0)
+            publish_histograms(state, time.time())
+            expire_requests(state, time.monotonic())
+
+
+async def run_collectors(collectors: list[InstanceCollector]) -> None:
+    """Run collectors for all PHD2 instances concurrently."""
+    # each collector runs in its own task and therefore its own context
+    await asyncio.gather(*(collector.run() for collector in collectors))
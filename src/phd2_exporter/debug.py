@@ -0,0 +1,127 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Opt-in debug endpoints for profiling the running exporter.
+
+They are served next to /metrics by the exposition server, see
+exposition.make_handler, when the exporter is started with --debug.
+
+/debug/profile samples the stack of the thread running the collectors for a
+number of seconds and returns collapsed stacks, one "frame;frame;... count"
+line per distinct stack, as used by flamegraph.pl and speedscope.
+/debug/stats lists event handling call counts and times per PHD2 instance.
+"""
+
+import functools
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from pathlib import Path
+from types import FrameType
+from urllib.parse import parse_qs, urlparse
+
+from .latency import LABEL_EVENT, METRIC_PROCESSING
+from .state import PHD2State
+
+PATH_PROFILE = "/debug/profile"
+PATH_STATS = "/debug/stats"
+
+DEFAULT_PROFILE_SECONDS = 10.0
+MAX_PROFILE_SECONDS = 60.0
+# seconds between stack samples
+DEFAULT_PROFILE_INTERVAL = 0.005
+
+# only one profile at a time, sampling is not free
+_profile_lock = threading.Lock()
+
+
+def frame_name(frame: FrameType) -> str:
+    """Name a stack frame as file:function."""
+    code = frame.f_code
+    return f"{Path(code.co_filename).name}:{code.co_name}"
+
+
+def collapse_stack(frame: FrameType | None) -> str:
+    """Collapse a stack to frame names separated by ;, outermost first."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def sample_stacks(thread_id: int, seconds: float, interval: float) -> Counter[str]:
+    """Count the collapsed stacks of a thread sampled every interval for seconds."""
+    stacks: Counter[str] = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            # thread is gone
+            break
+        stacks[collapse_stack(frame)] += 1
+        # release the frame, keeping it alive would keep its locals alive
+        del frame
+        time.sleep(interval)
+    return stacks
+
+
+def format_collapsed(stacks: Counter[str]) -> str:
+    """Format stacks as collapsed stack lines, most frequent first."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def format_stats(states: list[PHD2State]) -> str:
+    """Format event handling call counts and times for each PHD2 instance."""
+    lines = [
+        f"{'instance':<24} {'event':<24} {'calls':>10} {'total s':>10} {'mean us':>10}"
+    ]
+    for state in states:
+        labels = state.global_labels or {}
+        instance = f"{labels.get('host', '?')}/{labels.get('inst', '?')}"
+        handlers = [
+            (dict(labels_items)[LABEL_EVENT], histogram)
+            for (name, labels_items), histogram in list(state.histograms.items())
+            if name == METRIC_PROCESSING
+        ]
+        for event, histogram in sorted(handlers, key=lambda h: -h[1].sum):
+            mean = histogram.sum / histogram.count * 1e6 if histogram.count else 0.0
+            lines.append(
+                f"{instance:<24} {event:<24} {histogram.count:>10} "
+                f"{histogram.sum:>10.3f} {mean:>10.1f}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+def debug_response(
+    path: str, states: list[PHD2State], thread_id: int
+) -> tuple[int, str]:
+    """Answer a GET of a debug path with a status and plain text body."""
+    url = urlparse(path)
+    query = parse_qs(url.query)
+    if url.path == PATH_STATS:
+        return 200, format_stats(states)
+    if url.path != PATH_PROFILE:
+        return 404, f"not found, try {PATH_PROFILE} or {PATH_STATS}\n"
+    try:
+        seconds = float(query.get("seconds", [DEFAULT_PROFILE_SECONDS])[0])
+        interval = float(query.get("interval", [DEFAULT_PROFILE_INTERVAL])[0])
+    except ValueError:
+        return 400, "seconds and interval must be numbers\n"
+    if not 0 < seconds <= MAX_PROFILE_SECONDS or interval <= 0:
+        return 400, f"seconds must be 0-{MAX_PROFILE_SECONDS:g}, interval above 0\n"
+    if not _profile_lock.acquire(blocking=False):
+        return 409, "a profile is already running\n"
+    try:
+        stacks = sample_stacks(thread_id, seconds, interval)
+    finally:
+        _profile_lock.release()
+    return 200, format_collapsed(stacks)
+
+
+def make_debug(
+    states: list[PHD2State], thread_id: int
+) -> Callable[[str], tuple[int, str]]:
+    """Build the debug endpoints for the collectors' states and thread."""
+    return functools.partial(debug_response, states=states, thread_id=thread_id)
@@ -0,0 +1,82 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Pluggable JSON decoding for lines read from PHD2."""
+
+import json
+from collections.abc import Callable
+from typing import Any
+
+# decodes one line, raises ValueError if the line is not valid JSON
+Decoder = Callable[[bytes], Any]
+
+DECODER_AUTO = "auto"
+
+# preferred order when picking a decoder automatically, json is always available
+DECODER_NAMES = ("orjson", "msgspec", "json")
+
+
+def _load_orjson() -> Decoder | None:
+    """Get the orjson decoder if installed."""
+    try:
+        import orjson  # noqa: PLC0415
+    except ImportError:
+        return None
+    # orjson.JSONDecodeError is a ValueError
+    decode: Decoder = orjson.loads
+    return decode
+
+
+def _load_msgspec() -> Decoder | None:
+    """Get the msgspec decoder if installed."""
+    try:
+        import msgspec  # noqa: PLC0415
+    except ImportError:
+        return None
+    decoder = msgspec.json.Decoder()
+
+    def decode(line: bytes) -> Any:
+        try:
+            return decoder.decode(line)
+        except msgspec.DecodeError as e:
+            # same error as the other decoders
+            raise ValueError(str(e)) from e
+
+    return decode
+
+
+def _load_json() -> Decoder:
+    """Get the standard library decoder."""
+    return json.loads
+
+
+_LOADERS: dict[str, Callable[[], Decoder | None]] = {
+    "orjson": _load_orjson,
+    "msgspec": _load_msgspec,
+    "json": _load_json,
+}
+
+
+def available_decoders() -> list[str]:
+    """Get names of decoders that can be used, in preferred order."""
+    return [name for name in DECODER_NAMES if _LOADERS[name]() is not None]
+
+
+def get_decoder(name: str = DECODER_AUTO) -> tuple[str, Decoder]:
+    """
+    Get a decoder by name, or the fastest installed one for "auto".
+
+    Returns the name of the decoder used with the decoder. Raises ValueError
+    for unknown names or decoders that are not installed.
+    """
+    if name == DECODER_AUTO:
+        for candidate in DECODER_NAMES:
+            decoder = _LOADERS[candidate]()
+            if decoder is not None:
+                return candidate, decoder
+    if name not in _LOADERS:
+        raise ValueError(
+            f"Unknown JSON decoder '{name}', expected one of: {DECODER_AUTO}, {', '.join(DECODER_NAMES)}"
+        )
+    decoder = _LOADERS[name]()
+    if decoder is None:
+        raise ValueError(f"JSON decoder '{name}' is not installed")
+    return name, decoder
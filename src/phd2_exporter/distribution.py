@@ -0,0 +1,146 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Distributions of GuideStep values, fed from every frame.
+
+The phd2_GuideStep_* gauges only hold the last frame, a scrape every 15s
+sees one frame in many. These histograms count every frame, so quantiles
+and averages over any range cover all of them.
+"""
+
+from itertools import pairwise
+from typing import Any, TypeGuard
+
+from .histogram import get_histogram
+from .rms import (
+    KEY_DEC_RAW,
+    KEY_RA_RAW,
+    LABEL_SCALE,
+    LABEL_SOURCE,
+    SCALE_ARCSEC,
+    SCALE_PX,
+)
+from .state import LabelItems, PHD2State
+
+METRIC_GUIDE_ERROR = "phd2_guide_error"
+METRIC_GUIDE_PULSE = "phd2_guide_pulse_seconds"
+METRIC_GUIDE_HFD = "phd2_guide_hfd"
+METRIC_GUIDE_SNR = "phd2_guide_snr"
+
+# guide error fields, observed as distance from the lock position
+ERROR_KEYS = (KEY_RA_RAW, KEY_DEC_RAW)
+
+# guide pulse fields, PHD2 reports milliseconds
+PULSE_KEYS = ("RADuration", "DECDuration")
+
+ERROR_BUCKETS = {
+    SCALE_PX: (0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0),
+    SCALE_ARCSEC: (
+        0.1,
+        0.2,
+        0.3,
+        0.4,
+        0.5,
+        0.6,
+        0.8,
+        1.0,
+        1.25,
+        1.5,
+        2.0,
+        3.0,
+        5.0,
+        10.0,
+    ),
+}
+
+PULSE_BUCKETS = (
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.2,
+    0.3,
+    0.5,
+    0.75,
+    1.0,
+    1.5,
+    2.0,
+    3.0,
+    5.0,
+)
+
+HFD_BUCKETS = (1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 5.0, 6.0, 8.0, 10.0)
+
+SNR_BUCKETS = (5.0, 10.0, 15.0, 20.0, 30.0, 40.0, 50.0, 75.0, 100.0, 150.0, 200.0)
+
+# labels resolved once, not per frame
+ERROR_LABELS: dict[str, dict[str, LabelItems]] = {
+    key: {
+        scale: ((LABEL_SOURCE, key), (LABEL_SCALE, scale))
+        for scale in (SCALE_PX, SCALE_ARCSEC)
+    }
+    for key in ERROR_KEYS
+}
+PULSE_LABELS: dict[str, LabelItems] = {
+    key: ((LABEL_SOURCE, key),) for key in PULSE_KEYS
+}
+
+
+def parse_buckets(spec: str) -> tuple[float, ...]:
+    """Parse comma separated bucket upper bounds, positive and increasing."""
+    try:
+        bounds = tuple(float(item) for item in spec.split(",") if item.strip())
+    except ValueError:
+        raise ValueError(f"invalid histogram buckets: {spec!r}") from None
+    if not bounds:
+        raise ValueError("histogram buckets must not be empty")
+    if bounds[0] <= 0 or any(b <= a for a, b in pairwise(bounds)):
+        raise ValueError(f"histogram buckets must be positive and increasing: {spec!r}")
+    return bounds
+
+
+def get_error_buckets(state: PHD2State, scale: str) -> tuple[float, ...]:
+    """Get configured guide error buckets for a scale, or the defaults."""
+    return state.guide_error_buckets.get(scale) or ERROR_BUCKETS[scale]
+
+
+def is_number(value: Any) -> TypeGuard[float]:
+    """Check if a field value can be observed."""
+    return isinstance(value, int | float)
+
+
+def observe_guide_step(state: PHD2State, data: dict[str, Any]) -> None:
+    """Add the values of a GuideStep to their histograms."""
+    for key in ERROR_KEYS:
+        value = data.get(key)
+        if not is_number(value):
+            continue
+        error = abs(value)
+        labels = ERROR_LABELS[key]
+        get_histogram(
+            state,
+            METRIC_GUIDE_ERROR,
+            get_error_buckets(state, SCALE_PX),
+            labels[SCALE_PX],
+        ).observe(error)
+        # arcsec once the pixel scale is known
+        if state.pixel_scale > 0:
+            get_histogram(
+                state,
+                METRIC_GUIDE_ERROR,
+                get_error_buckets(state, SCALE_ARCSEC),
+                labels[SCALE_ARCSEC],
+            ).observe(error * state.pixel_scale)
+
+    for key in PULSE_KEYS:
+        value = data.get(key)
+        if is_number(value):
+            get_histogram(
+                state, METRIC_GUIDE_PULSE, PULSE_BUCKETS, PULSE_LABELS[key]
+            ).observe(value / 1000)
+
+    hfd = data.get("HFD")
+    if is_number(hfd):
+        get_histogram(state, METRIC_GUIDE_HFD, HFD_BUCKETS).observe(hfd)
+    snr = data.get("SNR")
+    if is_number(snr):
+        get_histogram(state, METRIC_GUIDE_SNR, SNR_BUCKETS).observe(snr)
@@ -0,0 +1,161 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Drift rate and polar alignment error estimated from guiding frames.
+
+Guiding hides drift: the raw distance of each frame is what is left after
+the previous corrections. Adding up the guide corrections applied so far
+(RADistanceGuide, DECDistanceGuide) to the raw distance gives the star
+position as if the mount had not been guided. A linear regression of that
+position over time, kept as running sums, is the drift rate.
+
+A fit covers the frames between dithers. GuidingDithered starts a new fit,
+settling frames are not added, so fitting resumes after SettleDone.
+"""
+
+import math
+import time
+from typing import Any
+
+from .rms import (
+    KEY_DEC_GUIDE,
+    KEY_DEC_RAW,
+    KEY_RA_GUIDE,
+    KEY_RA_RAW,
+    LABEL_SCALE,
+    SCALE_ARCSEC,
+    SCALE_PX,
+)
+from .state import PHD2State
+from .utils import get_metric_handle
+
+METRIC_DRIFT_RATE = "phd2_drift_rate"
+METRIC_POLAR_ALIGNMENT = "phd2_polar_alignment_error_arcmin"
+
+LABEL_AXIS = "axis"
+
+AXIS_RA = "RA"
+AXIS_DEC = "DEC"
+
+# raw and guide distance fields of each axis
+AXES = {
+    AXIS_RA: (KEY_RA_RAW, KEY_RA_GUIDE),
+    AXIS_DEC: (KEY_DEC_RAW, KEY_DEC_GUIDE),
+}
+
+# fewer frames or seconds do not give a meaningful rate
+MIN_FRAMES = 10
+MIN_SECONDS = 60.0
+
+# sidereal rotation of the sky in radians per minute
+SIDEREAL_RATE = 2 * math.pi / 86164.0905 * 60
+
+# arcmin of polar alignment error per arcsec/min of DEC drift, about 3.81
+ARCMIN_PER_DRIFT = 1 / (SIDEREAL_RATE * 60)
+
+DRIFT_LABELS = {
+    axis: {
+        scale: ((LABEL_AXIS, axis), (LABEL_SCALE, scale))
+        for scale in (SCALE_PX, SCALE_ARCSEC)
+    }
+    for axis in AXES
+}
+
+
+class LinearFit:
+    """Least squares line through points, kept as running sums."""
+
+    __slots__ = ("n", "sum_t", "sum_tt", "sum_tx", "sum_x")
+
+    def __init__(self) -> None:
+        """Initialize an empty fit."""
+        self.n = 0
+        self.sum_t = 0.0
+        self.sum_x = 0.0
+        self.sum_tt = 0.0
+        self.sum_tx = 0.0
+
+    def add(self, t: float, x: float) -> None:
+        """Add a point."""
+        self.n += 1
+        self.sum_t += t
+        self.sum_x += x
+        self.sum_tt += t * t
+        self.sum_tx += t * x
+
+    def slope(self) -> float | None:
+        """Get the slope, None with fewer than two distinct times."""
+        denominator = self.n * self.sum_tt - self.sum_t * self.sum_t
+        if denominator <= 0:
+            return None
+        return (self.n * self.sum_tx - self.sum_t * self.sum_x) / denominator
+
+
+class DriftEstimator:
+    """Drift fit of each axis over the frames since the last dither."""
+
+    def __init__(self) -> None:
+        """Initialize estimator, the first frame starts the fit."""
+        # times are seconds since the first frame, keeps the sums precise
+        self.start: float | None = None
+        self.seconds = 0.0
+        self.fits = {axis: LinearFit() for axis in AXES}
+        # px of guide corrections applied to each axis before the current frame
+        self.corrections = dict.fromkeys(AXES, 0.0)
+
+    def add(self, timestamp: float, data: dict[str, Any]) -> None:
+        """Add the star position of a GuideStep without the guide corrections."""
+        if self.start is None:
+            self.start = timestamp
+        self.seconds = timestamp - self.start
+        for axis, (raw_key, guide_key) in AXES.items():
+            raw = data.get(raw_key)
+            if not isinstance(raw, int | float):
+                continue
+            self.fits[axis].add(self.seconds, raw + self.corrections[axis])
+            guide = data.get(guide_key)
+            if isinstance(guide, int | float):
+                self.corrections[axis] += guide
+
+    def rate(self, axis: str) -> float | None:
+        """Get the drift of an axis in px per minute, None until enough frames."""
+        fit = self.fits[axis]
+        if fit.n < MIN_FRAMES or self.seconds < MIN_SECONDS:
+            return None
+        slope = fit.slope()
+        return None if slope is None else slope * 60
+
+
+def publish_drift(state: PHD2State, estimator: DriftEstimator) -> None:
+    """Publish drift rates and, from the DEC drift, the polar alignment error."""
+    for axis in AXES:
+        rate = estimator.rate(axis)
+        if rate is None:
+            continue
+        labels = DRIFT_LABELS[axis]
+        get_metric_handle(state, METRIC_DRIFT_RATE, labels[SCALE_PX]).set(rate)
+        if state.pixel_scale > 0:
+            rate_arcsec = rate * state.pixel_scale
+            get_metric_handle(state, METRIC_DRIFT_RATE, labels[SCALE_ARCSEC]).set(
+                rate_arcsec
+            )
+            if axis == AXIS_DEC:
+                # the declination of the target is not known, this is the error
+                # at the celestial equator and a lower bound elsewhere
+                get_metric_handle(state, METRIC_POLAR_ALIGNMENT).set(
+                    abs(rate_arcsec) * ARCMIN_PER_DRIFT
+                )
+
+
+def observe_drift(state: PHD2State, data: dict[str, Any]) -> None:
+    """Add a GuideStep to the drift fit and publish the drift."""
+    estimator = state.drift
+    if estimator is None:
+        estimator = state.drift = DriftEstimator()
+    estimator.add(data.get("Timestamp") or time.time(), data)
+    if state.global_labels is not None:
+        publish_drift(state, estimator)
+
+
+def handle_dither(state: PHD2State, _data: dict[str, Any]) -> None:
+    """Start a new drift fit, the lock position moved."""
+    state.drift = None
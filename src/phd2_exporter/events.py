@@ -1,147 +1,274 @@
 # Generated-by: Cursor (Claude Sonnet 4.5)
 """PHD2 event handling."""
 
-import socket
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, replace
 from typing import Any
 
-from .jsonrpc import request_connected, request_current_equipment, request_pixel_scale
+from .distribution import observe_guide_step
+from .drift import handle_dither, observe_drift
+from .frames import record_frame
+from .histogram import drop_series, publish_counter, publish_histograms
+from .jsonrpc import Sender, send_requests
+from .periodic import observe_periodic_error
 from .rms import calculate_and_export_rms, collect_rms_data
-from .state import APP_STATES, get_state
-from .utils import create_event_metrics, make_labels, utility_inc, utility_set
+from .sketch import observe_session
+from .state import APP_STATES, STATUS_SETTLING, LabelItems, PHD2State, get_state
+from .utils import create_event_metrics, get_metric_handle
 
+# every status published as phd2_status, settling can be true while other states are true
+ALL_STATUSES = [*APP_STATES, STATUS_SETTLING]
 
-def handle_event(s: socket.socket, data: dict[str, Any]) -> None:
-    """Handle a PHD2 event."""
+# status label for each status
+STATUS_LABELS: dict[str, LabelItems] = {
+    status: (("status", status),) for status in ALL_STATUSES
+}
+
+# seconds between updates of time in state while the state does not change
+STATE_SECONDS_INTERVAL = 5.0
+
+GUIDE_STEP_METRICS = (
+    "dx",
+    "dy",
+    "RADistanceRaw",
+    "DECDistanceRaw",
+    "RADistanceGuide",
+    "DECDistanceGuide",
+    "StarMass",
+    "SNR",
+    "HFD",
+    "AvgDist",
+    "ErrorCode",
+)
+
+# JSONRPC follow-ups
+# did equipment change? get pixel scale! uses callback so reading is handled in main loop
+# note, could stop guiding because equipment disconnects.  there is no event if equipment is disconnected :(
+RPC_EQUIPMENT = ("get_connected", "get_current_equipment")
+RPC_CONFIGURATION = ("get_pixel_scale", *RPC_EQUIPMENT)
+
+
+@dataclass(frozen=True)
+class MetricGroup:
+    """Event fields exported as phd2_<event>_<field>, labelled with label fields."""
+
+    fields: tuple[str, ...]
+    label_fields: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class EventSpec:
+    """
+    How a PHD2 event is handled.
+
+    state is the app state entered, or state_field names the event field
+    holding it. settling is the new settling flag, None leaves it unchanged.
+    reset_session starts new session sketches and analyses.
+    counter_label_fields label the phd2_<event> counter. rpc lists JSONRPC
+    methods requested after the event, even if already waiting for a response. handler runs after event metrics.
+    """
+
+    set_labels: bool = False
+    state: str | None = None
+    state_field: str | None = None
+    settling: bool | None = None
+    reset_rms: bool = False
+    reset_session: bool = False
+    metrics: tuple[MetricGroup, ...] = ()
+    counter_label_fields: tuple[str, ...] = ()
+    rpc: tuple[str, ...] = ()
+    handler: Callable[[PHD2State, dict[str, Any]], None] | None = None
+    counter: str = ""
+
+
+def handle_guide_step_rms(state: PHD2State, data: dict[str, Any]) -> None:
+    """Collect GuideStep distances for RMS and export RMS when ready."""
+    # skip RMS if settling
+    if not state.phd_settling and collect_rms_data(data):
+        calculate_and_export_rms()
+
+
+def handle_guide_step(state: PHD2State, data: dict[str, Any]) -> None:
+    """Add GuideStep values to their distributions, RMS and the frame store."""
+    record_frame(state, data)
+    # settling frames are dither recovery, not guiding performance
+    if not state.phd_settling:
+        observe_guide_step(state, data)
+        observe_session(state, data)
+        observe_periodic_error(state, data)
+        observe_drift(state, data)
+    handle_guide_step_rms(state, data)
+
+
+# supported PHD2 events, adding an event is a new entry here
+EVENTS: dict[str, EventSpec] = {
+    "Version": EventSpec(set_labels=True),
+    "AppState": EventSpec(
+        set_labels=True, state_field="State", settling=False, rpc=RPC_CONFIGURATION
+    ),
+    "ConfigurationChange": EventSpec(rpc=RPC_CONFIGURATION),
+    "LoopingExposures": EventSpec(state="Looping"),
+    "LoopingExposuresStopped": EventSpec(
+        state="Stopped", reset_rms=True, reset_session=True, rpc=RPC_EQUIPMENT
+    ),
+    "LockPositionSet": EventSpec(state="Selected", metrics=(MetricGroup(("X", "Y")),)),
+    "StarSelected": EventSpec(metrics=(MetricGroup(("X", "Y")),)),
+    "StartCalibration": EventSpec(state="Calibrating"),
+    "Calibrating": EventSpec(
+        state="Calibrating",
+        metrics=(MetricGroup(("dist", "dx", "dy", "step"), ("dir",)),),
+    ),
+    "CalibrationComplete": EventSpec(),
+    "CalibrationFailed": EventSpec(),
+    "GuideStep": EventSpec(
+        state="Guiding",
+        metrics=(
+            MetricGroup(GUIDE_STEP_METRICS),
+            # RA pulse metric
+            MetricGroup(("RADuration",), ("RADirection", "RALimited")),
+            # DEC pulse metric
+            MetricGroup(("DECDuration",), ("DECDirection", "DecLimited")),
+        ),
+        handler=handle_guide_step,
+    ),
+    "GuidingDithered": EventSpec(
+        metrics=(MetricGroup(("dx", "dy")),), handler=handle_dither
+    ),
+    "StarLost": EventSpec(
+        state="LostLock",
+        metrics=(MetricGroup(("StarMass", "SNR", "AvgDist", "ErrorCode")),),
+    ),
+    "Paused": EventSpec(state="Paused"),
+    "SettleBegin": EventSpec(settling=True),
+    "Settling": EventSpec(
+        settling=True,
+        metrics=(MetricGroup(("Distance", "Time", "SettleTime", "StarLocked")),),
+    ),
+    # TODO consider if should flip "Status" from 0==success to 1==success....
+    "SettleDone": EventSpec(
+        settling=False,
+        metrics=(MetricGroup(("Status", "TotalFrames", "DroppedFrames")),),
+    ),
+    "Alert": EventSpec(counter_label_fields=("Type",)),
+    # parameter names are a fixed set in PHD2, non numeric values are skipped
+    "GuideParamChange": EventSpec(metrics=(MetricGroup(("Value",), ("Name",)),)),
+}
+
+
+def compile_events(events: dict[str, EventSpec]) -> dict[str, EventSpec]:
+    """Resolve per event values, e.g. counter names, once up front."""
+    return {
+        event: replace(spec, counter=f"phd2_{event}") for event, spec in events.items()
+    }
+
+
+EVENT_SPECS = compile_events(EVENTS)
+
+
+def get_event_spec(event: str) -> EventSpec:
+    """Get the spec for an event, unknown events are only counted."""
+    spec = EVENT_SPECS.get(event)
+    if spec is None:
+        # not kept, any name the peer sends would grow the table forever
+        spec = EventSpec(counter=f"phd2_{event}")
+    return spec
+
+
+def publish_status(state: PHD2State, changed: list[str], now: float) -> None:
+    """
+    Publish status metrics for a state transition.
+
+    Status gauges are only touched for statuses that changed, or all of them
+    the first time after global labels are set. Entering a status counts a
+    transition. Time in state is published on transitions and otherwise at
+    most every STATE_SECONDS_INTERVAL seconds.
+    """
+    publish = changed
+    if not state.status_published:
+        publish = ALL_STATUSES
+        state.status_published = True
+
+    for status in publish:
+        labels = STATUS_LABELS.get(status)
+        if labels is None:
+            # not a known PHD2 state, nothing to publish
+            continue
+        if status == STATUS_SETTLING:
+            value = int(state.phd_settling)
+        else:
+            value = int(state.phd_state == status)
+        get_metric_handle(state, "phd2_status", labels).set(value)
+        if value and status in changed:
+            get_metric_handle(state, "phd2_state_transitions", labels).inc()
+
+    if changed or now - state.state_seconds_published >= STATE_SECONDS_INTERVAL:
+        for status, seconds in state.state_seconds.items():
+            labels = STATUS_LABELS.get(status)
+            if labels is not None:
+                # a counter, metrics_utility only increments by one
+                publish_counter(state, "phd2_state_seconds", labels, seconds)
+        state.state_seconds_published = now
+
+
+def handle_event(s: Sender, data: dict[str, Any]) -> None:
+    """Handle a PHD2 event as described by its EventSpec."""
     state = get_state()
 
     if "Event" not in data:
         return
 
-    event = data["Event"]
-
-    # use global PHD_STATE to get an updated state, which is then updated at the end of the function
+    spec = get_event_spec(data["Event"])
 
-    if event in ["Version", "AppState"]:
+    if spec.set_labels:
         # initialize global labels
+        previous = state.global_label_items
         state.set_global_labels(data["Host"], data["Inst"])
+        if previous and previous != state.global_label_items:
+            # republished with the new labels, the old series would never update
+            drop_series(previous)
 
-    # update state based on event
-    if event in ["LoopingExposuresStopped"]:
-        state.phd_state = "Stopped"
-        # reset RMS data
+    # determine new state based on event, applied as a transition below
+    phd_state = state.phd_state
+    phd_settling = state.phd_settling
+    if spec.state is not None:
+        phd_state = spec.state
+    elif spec.state_field is not None and spec.state_field in data:
+        phd_state = data[spec.state_field]
+    if spec.settling is not None:
+        phd_settling = spec.settling
+    if spec.reset_rms:
         state.reset_rms_data()
-    elif event in ["LockPositionSet"]:
-        state.phd_state = "Selected"
-    elif event in ["StartCalibration", "Calibrating"]:
-        state.phd_state = "Calibrating"
-    elif event in ["GuideStep"]:
-        state.phd_state = "Guiding"
-    elif event in ["StarLost"]:
-        state.phd_state = "LostLock"
-    elif event in ["Paused"]:
-        state.phd_state = "Paused"
-    elif event in ["LoopingExposures"]:
-        state.phd_state = "Looping"
-    elif event == "AppState" and "State" in data:
-        state.phd_state = data["State"]
-        state.phd_settling = False
-    elif event in ["SettleBegin", "Settling"]:
-        state.phd_settling = True
-    elif event in ["SettleDone"]:
-        state.phd_settling = False
+    if spec.reset_session:
+        # publish the complete session before starting over
+        if state.global_labels is not None:
+            publish_histograms(state, time.time(), force=True)
+        state.reset_session()
+
+    now = state.clock()
+    changed = state.update_status(phd_state, phd_settling, now)
 
     # Export status metrics
     if state.global_labels is not None:
-        for status in APP_STATES:
-            value = int(state.phd_state == status)
-            labels = state.get_global_labels_deepcopy()
-            labels.update({"status": status})
-            utility_set("phd2_status", value, labels)
-
-        # set settling status, which can be true while other states are true
-        value = int(state.phd_settling)
-        labels = state.get_global_labels_deepcopy()
-        labels.update({"status": "Settling"})
-        utility_set("phd2_status", value, labels)
-
-    # very chatty with GuideStep events
-    # print("EVENT: " + event)
-
-    # did equipment change? get pixel scale! uses callback so reading is handled in main loop
-    if event in ["AppState", "ConfigurationChange"]:
-        # get updated pixel scale
-        request_pixel_scale(s)
-
-    # check for equipment connection changes at key events
-    # note, could stop guiding because equipment disconnects.  there is no event if equipment is disconnected :(
-    if event in ["AppState", "ConfigurationChange", "LoopingExposuresStopped"]:
-        # get updated connected state
-        request_connected(s)
-        # get updated equipment list
-        request_current_equipment(s)
+        publish_status(state, changed, now)
+
+    if spec.rpc:
+        # the event announced a change, responses in flight may predate it
+        send_requests(s, spec.rpc, refresh=True)
 
     if state.global_labels is None:
         return
 
     # Handle event-specific metrics
-    if event in ["LockPositionSet", "StarSelected"]:
-        create_event_metrics(data, state.global_labels, ["X", "Y"])
-    elif event == "Calibrating":
-        labels = state.get_global_labels_deepcopy()
-        labels.update(make_labels(data, ["dir"]))
-        create_event_metrics(data, labels, ["dist", "dx", "dy", "step"])
-    elif event == "Settling":
-        create_event_metrics(
-            data, state.global_labels, ["Distance", "Time", "SettleTime", "StarLocked"]
-        )
-    elif event == "SettleDone":
-        # TODO consider if should flip "Status" from 0==success to 1==success....
-        create_event_metrics(
-            data, state.global_labels, ["Status", "TotalFrames", "DroppedFrames"]
-        )
-    elif event == "StarLost":
-        create_event_metrics(
-            data, state.global_labels, ["StarMass", "SNR", "AvgDist", "ErrorCode"]
-        )
-    elif event == "GuideStep":
-        # general metrics
-        create_event_metrics(
-            data,
-            state.global_labels,
-            [
-                "dx",
-                "dy",
-                "RADistanceRaw",
-                "DECDistanceRaw",
-                "RADistanceGuide",
-                "DECDistanceGuide",
-                "StarMass",
-                "SNR",
-                "HFD",
-                "AvgDist",
-                "ErrorCode",
-            ],
-        )
+    for group in spec.metrics:
+        create_event_metrics(state, data, group.fields, group.label_fields)
 
-        # RA pulse metric
-        l_ra = state.get_global_labels_deepcopy()
-        l_ra.update(make_labels(data, ["RADirection", "RALimited"]))
-        create_event_metrics(data, l_ra, ["RADuration"])
+    if spec.handler is not None:
+        spec.handler(state, data)
 
-        # DEC pulse metric
-        l_dec = state.get_global_labels_deepcopy()
-        l_dec.update(make_labels(data, ["DECDirection", "DecLimited"]))
-        create_event_metrics(data, l_dec, ["DECDuration"])
-
-        # skip RMS if settling
-        if not state.phd_settling:
-            # collect data for RMS
-            calculate_rms = collect_rms_data(data)
-
-            if calculate_rms:
-                calculate_and_export_rms()
-
-    elif event == "GuidingDithered":
-        create_event_metrics(data, state.global_labels, ["dx", "dy"])
-
-    utility_inc(f"phd2_{event}", state.global_labels)
+    counter_labels: LabelItems = ()
+    if spec.counter_label_fields:
+        counter_labels = tuple(
+            (field, data.get(field, 0)) for field in spec.counter_label_fields
+        )
+    get_metric_handle(state, spec.counter, counter_labels).inc()
@@ -0,0 +1,152 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Cached /metrics exposition.
+
+Rendering every metric takes the lock of every metric the event handler
+is updating. Several Prometheus servers and agents scraping every few
+seconds would each render the same values. Here the text, and its gzip
+compressed form, are rendered once per generation of metric updates
+(see utils.get_generation) and served from the cache until the next
+update. Renders are also at most min_interval apart, so a busy guiding
+session is rendered once per interval however many scrapers there are.
+"""
+
+import gzip
+import threading
+import time
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import urlparse
+
+from prometheus_client import REGISTRY, CollectorRegistry
+from prometheus_client.exposition import CONTENT_TYPE_LATEST, generate_latest
+
+from .utils import get_generation
+
+PATH_METRICS = "/metrics"
+PATH_DEBUG = "/debug/"
+
+# answers a GET of a debug path with a status and plain text body, see debug.py
+DebugEndpoints = Callable[[str], tuple[int, str]]
+
+# seconds a rendered exposition is served before updates are rendered again
+DEFAULT_MIN_INTERVAL = 1.0
+
+# fast compression, the text is rendered again within seconds
+GZIP_LEVEL = 1
+
+
+class ExpositionCache:
+    """Rendered metrics text, re-rendered only after metrics were updated."""
+
+    def __init__(
+        self,
+        registry: CollectorRegistry = REGISTRY,
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+    ) -> None:
+        """Initialize an empty cache of registry's exposition."""
+        self.registry = registry
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        # generation rendered, None until the first render
+        self.generation: int | None = None
+        self.rendered = 0.0
+        self.text = b""
+        self._gzip: bytes | None = None
+        # renders, and scrapes served from the cache
+        self.renders = 0
+        self.hits = 0
+
+    def get(self, compressed: bool = False) -> bytes:
+        """Get the exposition text, gzip compressed if asked."""
+        # one scraper renders, concurrent scrapes wait for it and share the result
+        with self.lock:
+            generation = get_generation()
+            now = time.monotonic()
+            if generation != self.generation and (
+                self.generation is None or now - self.rendered >= self.min_interval
+            ):
+                self.text = generate_latest(self.registry)
+                self._gzip = None
+                self.generation = generation
+                self.rendered = now
+                self.renders += 1
+            else:
+                self.hits += 1
+            if not compressed:
+                return self.text
+            if self._gzip is None:
+                self._gzip = gzip.compress(self.text, GZIP_LEVEL, mtime=0)
+            return self._gzip
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """Check an Accept-Encoding header allows gzip."""
+    if not accept_encoding:
+        return False
+    for item in accept_encoding.split(","):
+        encoding, _, params = item.partition(";")
+        if encoding.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def make_handler(
+    cache: ExpositionCache, debug: DebugEndpoints | None = None
+) -> type[BaseHTTPRequestHandler]:
+    """Build a request handler serving the cache, and debug paths if given."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Serves /metrics from the cache."""
+
+        def do_GET(self) -> None:
+            """Handle a GET request."""
+            path = urlparse(self.path).path
+            if debug is not None and path.startswith(PATH_DEBUG):
+                self.reply_debug(debug)
+                return
+            if path not in (PATH_METRICS, "/"):
+                self.send_error(404, f"not found, try {PATH_METRICS}")
+                return
+            compressed = accepts_gzip(self.headers.get("Accept-Encoding"))
+            body = cache.get(compressed)
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE_LATEST)
+            if compressed:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def reply_debug(self, endpoints: DebugEndpoints) -> None:
+            """Send the plain text response of a debug endpoint."""
+            status, text = endpoints(self.path)
+            body = text.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+            """Do not log every scrape."""
+
+    return MetricsHandler
+
+
+def start_metrics_server(
+    port: int,
+    host: str = "0.0.0.0",
+    min_interval: float = DEFAULT_MIN_INTERVAL,
+    debug: DebugEndpoints | None = None,
+) -> ThreadingHTTPServer:
+    """Serve the cached exposition, and debug paths if given, on a background thread."""
+    server = ThreadingHTTPServer(
+        (host, port), make_handler(ExpositionCache(min_interval=min_interval), debug)
+    )
+    thread = threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    )
+    thread.start()
+    return server
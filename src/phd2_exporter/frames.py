@@ -0,0 +1,358 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Full resolution store of guiding frames in columnar files.
+
+Every GuideStep is appended to in-memory column arrays, which is all the
+event handler does. Full batches are handed to a background thread that
+writes them to Parquet with pyarrow (the parquet extra) or, without it, to
+a compact binary format readable with read_frames. A file covers one
+guiding session, a new one is started when looping stops. Buffered frames
+are also written every flush_interval seconds, so a crash loses at most
+that much. Parquet is only readable once its footer is written, so Parquet
+files are also closed, and a new one started, every flush_interval.
+
+Like capture, batches that do not fit in the writer queue are dropped and
+counted rather than stalling event handling, and batches that fail to
+write are reported and counted, writing goes on with a new file.
+"""
+
+import contextlib
+import json
+import math
+import queue
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from .capture import put_while_alive
+from .state import PHD2State
+from .utils import get_metric_handle
+
+METRIC_FRAMES_DROPPED = "phd2_frames_dropped"
+
+FORMAT_AUTO = "auto"
+FORMAT_PARQUET = "parquet"
+FORMAT_BINARY = "binary"
+
+FORMATS = (FORMAT_PARQUET, FORMAT_BINARY)
+
+SUFFIXES = {FORMAT_PARQUET: ".parquet", FORMAT_BINARY: ".frames"}
+
+# GuideStep fields stored and their array typecode, missing values are NaN or 0
+FIELDS = (
+    ("Timestamp", "d"),
+    ("Frame", "i"),
+    ("dx", "f"),
+    ("dy", "f"),
+    ("RADistanceRaw", "f"),
+    ("DECDistanceRaw", "f"),
+    ("RADistanceGuide", "f"),
+    ("DECDistanceGuide", "f"),
+    ("RADuration", "f"),
+    ("DECDuration", "f"),
+    ("StarMass", "f"),
+    ("SNR", "f"),
+    ("HFD", "f"),
+)
+
+# 1 for frames taken while settling after a dither
+COLUMN_SETTLING = "Settling"
+
+COLUMNS = (*FIELDS, (COLUMN_SETTLING, "B"))
+
+# frames buffered before a batch is written, about 2 hours of 2 second frames
+DEFAULT_BATCH_ROWS = 4096
+
+# batches waiting to be written before new ones are dropped
+DEFAULT_QUEUE_SIZE = 64
+
+# seconds buffered frames are kept before they are written
+DEFAULT_FLUSH_INTERVAL = 300.0
+
+# first line of binary files, followed by a JSON header line
+BINARY_MAGIC = b"PHD2FRAMES 1\n"
+
+# rows in a binary batch, followed by each column's little endian values
+BATCH_HEADER = struct.Struct("<I")
+
+Columns = dict[str, array]
+
+# closes the current file, queued after the last batch of a session
+_ROTATE = object()
+
+
+def new_columns() -> Columns:
+    """Get empty column arrays."""
+    return {name: array(typecode) for name, typecode in COLUMNS}
+
+
+def _pyarrow() -> Any:
+    """Get pyarrow.parquet if pyarrow is installed, None if not."""
+    try:
+        import pyarrow.parquet as pq  # noqa: PLC0415
+    except ImportError:
+        return None
+    return pq
+
+
+def get_format(name: str = FORMAT_AUTO) -> str:
+    """
+    Get a format by name, auto picks parquet if pyarrow is installed else binary.
+
+    Raises ValueError for unknown names or parquet when pyarrow is not installed.
+    """
+    if name == FORMAT_AUTO:
+        return FORMAT_PARQUET if _pyarrow() is not None else FORMAT_BINARY
+    if name == FORMAT_PARQUET and _pyarrow() is None:
+        raise ValueError("parquet frames need pyarrow installed")
+    if name not in FORMATS:
+        raise ValueError(
+            f"Unknown frames format '{name}', expected one of: {FORMAT_AUTO}, {', '.join(FORMATS)}"
+        )
+    return name
+
+
+class BinaryWriter:
+    """Writes batches to a binary frames file."""
+
+    def __init__(self, path: Path) -> None:
+        """Open path and write the header."""
+        self.file: BinaryIO = path.open("wb")
+        header = {"columns": [list(column) for column in COLUMNS]}
+        self.file.write(BINARY_MAGIC + json.dumps(header).encode("utf-8") + b"\n")
+
+    def write(self, columns: Columns) -> None:
+        """Write a batch, readable as soon as it is written."""
+        self.file.write(BATCH_HEADER.pack(len(columns[COLUMNS[0][0]])))
+        for name, _ in COLUMNS:
+            column = columns[name]
+            if sys.byteorder != "little":
+                column = array(column.typecode, column)
+                column.byteswap()
+            self.file.write(column.tobytes())
+        self.file.flush()
+
+    def close(self) -> None:
+        """Close the file."""
+        self.file.close()
+
+
+class ParquetWriter:
+    """Writes batches as row groups of a Parquet file."""
+
+    def __init__(self, path: Path) -> None:
+        """Open path with the frames schema."""
+        import pyarrow as pa  # noqa: PLC0415
+
+        self.pa = pa
+        types = {"d": pa.float64(), "f": pa.float32(), "i": pa.int32(), "B": pa.uint8()}
+        self.types = [(name, types[typecode]) for name, typecode in COLUMNS]
+        self.writer = _pyarrow().ParquetWriter(path, pa.schema(self.types))
+
+    def write(self, columns: Columns) -> None:
+        """Write a batch, the arrays are used without copying."""
+        pa = self.pa
+        rows = len(columns[COLUMNS[0][0]])
+        arrays = [
+            pa.Array.from_buffers(dtype, rows, [None, pa.py_buffer(columns[name])])
+            for name, dtype in self.types
+        ]
+        self.writer.write_table(
+            pa.Table.from_arrays(arrays, names=[name for name, _ in self.types])
+        )
+
+    def close(self) -> None:
+        """Write the footer and close the file."""
+        self.writer.close()
+
+
+class FrameSink:
+    """Buffers the guiding frames of one PHD2 instance and writes them in batches."""
+
+    def __init__(
+        self,
+        directory: Path,
+        prefix: str,
+        file_format: str = FORMAT_AUTO,
+        batch_rows: int = DEFAULT_BATCH_ROWS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        *,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ) -> None:
+        """Initialize sink, files are named <prefix>-<time><suffix> in directory."""
+        self.directory = directory
+        self.prefix = prefix
+        self.format = get_format(file_format)
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.columns = new_columns()
+        self.rows = 0
+        # monotonic time of the last write, the buffer is written flush_interval later
+        self.flushed = time.monotonic()
+        self.queue: queue.Queue[Any] = queue.Queue(queue_size)
+        # batches dropped because the queue was full
+        self.dropped = 0
+        # batches that could not be written
+        self.failed = 0
+        self.files: list[Path] = []
+        self._writer: BinaryWriter | ParquetWriter | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(
+            target=self._run, name=f"frames-{self.prefix}", daemon=True
+        )
+        self._thread.start()
+
+    def append(self, data: dict[str, Any], settling: bool) -> bool:
+        """Buffer a GuideStep, False if a full batch was dropped. Never blocks."""
+        columns = self.columns
+        for name, typecode in FIELDS:
+            value = data.get(name)
+            if not isinstance(value, int | float):
+                value = math.nan if typecode != "i" else 0
+            elif typecode == "i":
+                value = int(value)
+            columns[name].append(value)
+        columns[COLUMN_SETTLING].append(settling)
+        self.rows += 1
+        if self.rows >= self.batch_rows:
+            return self.flush()
+        if time.monotonic() - self.flushed >= self.flush_interval:
+            if self.format == FORMAT_PARQUET:
+                # written with its footer, readable even if the exporter dies
+                return self.rotate()
+            return self.flush()
+        return True
+
+    def flush(self) -> bool:
+        """Queue the buffered frames for writing, False if dropped."""
+        self.flushed = time.monotonic()
+        if self.rows == 0:
+            return True
+        # the writer owns the full arrays, appending continues with new ones
+        columns, self.columns, self.rows = self.columns, new_columns(), 0
+        return self._put(columns)
+
+    def rotate(self) -> bool:
+        """Flush and start a new file with the next frame, False if dropped."""
+        flushed = self.flush()
+        return self._put(_ROTATE) and flushed
+
+    def close(self) -> None:
+        """Write everything buffered, close the current file and stop the thread."""
+        if self._thread is None:
+            return
+        # waits for room, close is not called from the reader
+        if self.rows:
+            columns, self.columns, self.rows = self.columns, new_columns(), 0
+            put_while_alive(self._thread, self.queue, columns)
+        put_while_alive(self._thread, self.queue, None)
+        self._thread.join()
+        self._thread = None
+
+    def _put(self, item: Any) -> bool:
+        """Queue an item for the writer, dropping it if the queue is full."""
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _run(self) -> None:
+        """Write queued batches until closed, a failed batch is reported and lost."""
+        failing = False
+        try:
+            while (item := self.queue.get()) is not None:
+                try:
+                    self._write(item)
+                except Exception as e:
+                    self.failed += 1
+                    if not failing:
+                        print(f"Writing frames to {self.directory} failed: {e}")
+                    failing = True
+                    # the file may be broken, the next batch starts a new one
+                    with contextlib.suppress(Exception):
+                        self._close_file()
+                    self._writer = None
+                else:
+                    if failing:
+                        print(f"Writing frames to {self.directory} recovered")
+                    failing = False
+        finally:
+            with contextlib.suppress(Exception):
+                self._close_file()
+
+    def _write(self, item: Any) -> None:
+        """Write a batch, or close the current file for _ROTATE."""
+        if item is _ROTATE:
+            self._close_file()
+            return
+        if self._writer is None:
+            self._open_file()
+        assert self._writer is not None
+        self._writer.write(item)
+
+    def _open_file(self) -> None:
+        """Open a new frames file."""
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        suffix = SUFFIXES[self.format]
+        path = self.directory / f"{self.prefix}-{stamp}{suffix}"
+        # several files in the same second get a counter
+        count = 1
+        while path.exists():
+            path = self.directory / f"{self.prefix}-{stamp}-{count}{suffix}"
+            count += 1
+        if self.format == FORMAT_PARQUET:
+            self._writer = ParquetWriter(path)
+        else:
+            self._writer = BinaryWriter(path)
+        self.files.append(path)
+
+    def _close_file(self) -> None:
+        """Close the current file."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def read_batches(path: Path) -> Iterator[Columns]:
+    """Read the batches of a binary frames file."""
+    with path.open("rb") as f:
+        if f.readline() != BINARY_MAGIC:
+            raise ValueError(f"not a binary frames file: {path}")
+        header = json.loads(f.readline())
+        while size := f.read(BATCH_HEADER.size):
+            (rows,) = BATCH_HEADER.unpack(size)
+            batch: Columns = {}
+            for name, typecode in header["columns"]:
+                column = array(typecode)
+                column.frombytes(f.read(rows * column.itemsize))
+                if sys.byteorder != "little":
+                    column.byteswap()
+                batch[name] = column
+            yield batch
+
+
+def read_frames(path: Path) -> Columns:
+    """Read all frames of a binary frames file into one array per column."""
+    frames: Columns = {}
+    for batch in read_batches(path):
+        for name, column in batch.items():
+            frames.setdefault(name, array(column.typecode)).extend(column)
+    return frames
+
+
+def record_frame(state: PHD2State, data: dict[str, Any]) -> None:
+    """Append a GuideStep to the frame sink, counting batches dropped."""
+    sink = state.frames
+    if sink is not None and not sink.append(data, state.phd_settling):
+        get_metric_handle(state, METRIC_FRAMES_DROPPED).inc()
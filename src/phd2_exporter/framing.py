@@ -0,0 +1,72 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Line framing for the PHD2 event stream."""
+
+# PHD2 terminates every event and JSONRPC response with CRLF
+LINE_DELIMITER = b"\r\n"
+
+# read size for the event socket, large enough to take a burst of events in one read
+RECV_BUFSIZE = 65536
+
+# upper bound for a single line, protects against a peer that never sends a delimiter
+MAX_LINE_LENGTH = 1024 * 1024
+
+
+class LineFramer:
+    """
+    Incremental framer that splits a byte stream into complete lines.
+
+    Received bytes are appended to a buffer and only complete, delimiter
+    terminated lines are returned. A partial line at the end of a read is
+    carried over until the rest of it arrives, so events that straddle a read
+    boundary are never handed to the JSON parser half-formed. Lines are
+    returned as bytes; decoding is left to the parser.
+    """
+
+    def __init__(
+        self,
+        delimiter: bytes = LINE_DELIMITER,
+        max_line_length: int = MAX_LINE_LENGTH,
+    ) -> None:
+        """Initialize an empty framer."""
+        self._buffer = bytearray()
+        self._delimiter = delimiter
+        self._max_line_length = max_line_length
+
+    def __len__(self) -> int:
+        """Number of buffered bytes not yet returned as a line."""
+        return len(self._buffer)
+
+    def feed(self, raw: bytes) -> list[bytes]:
+        """
+        Add received bytes and return all lines completed by them.
+
+        Empty lines are skipped. Raises ValueError if the pending partial line
+        grows beyond the configured maximum line length.
+        """
+        buffer = self._buffer
+        buffer += raw
+
+        end = buffer.rfind(self._delimiter)
+        if end < 0:
+            self._check_length()
+            return []
+
+        # split everything up to the last delimiter in one pass, keep the remainder
+        lines = bytes(buffer[:end]).split(self._delimiter)
+        del buffer[: end + len(self._delimiter)]
+        # the remainder is a partial line too, it may already be over the limit
+        self._check_length()
+
+        return [line for line in lines if line]
+
+    def _check_length(self) -> None:
+        """Drop the partial line and raise ValueError if it is too long."""
+        if len(self._buffer) > self._max_line_length:
+            self.clear()
+            raise ValueError(
+                f"line exceeds maximum length of {self._max_line_length} bytes"
+            )
+
+    def clear(self) -> None:
+        """Drop any buffered partial line."""
+        self._buffer.clear()
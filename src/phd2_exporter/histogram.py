@@ -0,0 +1,267 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Histograms and summaries published as typed Prometheus metric families.
+
+Observations only update counts in memory. Publishing snapshots them into
+the DistributionCollector registered with the default registry, which
+exposes them as histogram and summary families, so the exposition has
+the right TYPE and histogram_quantile() and rate() work as for native
+histograms. Counters accumulated by the exporter, e.g. seconds in a state,
+are published the same way as counter families.
+"""
+
+import threading
+from bisect import bisect_left
+from collections.abc import Iterator
+from typing import Any
+
+from prometheus_client import REGISTRY
+from prometheus_client.metrics_core import (
+    CounterMetricFamily,
+    HistogramMetricFamily,
+    Metric,
+    SummaryMetricFamily,
+)
+from prometheus_client.samples import Sample
+
+from .state import LabelItems, PHD2State
+from .utils import utility_samples
+
+# seconds between publishing histograms that changed
+HISTOGRAM_INTERVAL = 5.0
+
+INF = "+Inf"
+
+# label name and value items of one published series
+SeriesKey = tuple[tuple[str, str], ...]
+
+
+def format_bound(bound: float) -> str:
+    """Format a bucket upper bound as the le label."""
+    return repr(float(bound))
+
+
+def series_labels(state: PHD2State, labels: LabelItems) -> SeriesKey:
+    """Get the global labels plus labels as exposition label items."""
+    return tuple(
+        (name, str(value)) for name, value in (*state.global_label_items, *labels)
+    )
+
+
+class DistributionCollector:
+    """Exposes the last published histograms, summaries and counters."""
+
+    def __init__(self) -> None:
+        """Initialize without series."""
+        self.lock = threading.Lock()
+        # cumulative buckets and sum by name and labels
+        self.histograms: dict[
+            str, dict[SeriesKey, tuple[list[tuple[str, float]], float]]
+        ] = {}
+        # quantiles, count and sum by name and labels
+        self.summaries: dict[
+            str, dict[SeriesKey, tuple[list[tuple[str, float]], float, float]]
+        ] = {}
+        # counter values by name without _total and labels
+        self.counters: dict[str, dict[SeriesKey, float]] = {}
+
+    def set_histogram(
+        self,
+        name: str,
+        labels: SeriesKey,
+        buckets: list[tuple[str, float]],
+        sum_value: float,
+    ) -> None:
+        """Set the cumulative buckets, ending with +Inf, and sum of a histogram."""
+        with self.lock:
+            self.histograms.setdefault(name, {})[labels] = (buckets, sum_value)
+
+    def set_summary(
+        self,
+        name: str,
+        labels: SeriesKey,
+        quantiles: list[tuple[str, float]],
+        count_value: float,
+        sum_value: float,
+    ) -> None:
+        """Set the quantiles, count and sum of a summary."""
+        with self.lock:
+            self.summaries.setdefault(name, {})[labels] = (
+                quantiles,
+                count_value,
+                sum_value,
+            )
+
+    def set_counter(self, name: str, labels: SeriesKey, value: float) -> None:
+        """Set the value of a counter, name without the _total suffix."""
+        with self.lock:
+            self.counters.setdefault(name, {})[labels] = value
+
+    def remove(self, prefix: SeriesKey, summaries_only: bool = False) -> None:
+        """Drop the series whose labels start with prefix, e.g. of one instance."""
+        kinds: list[dict[str, dict[SeriesKey, Any]]] = [self.summaries]
+        if not summaries_only:
+            kinds += [self.histograms, self.counters]
+        size = len(prefix)
+        with self.lock:
+            for kind in kinds:
+                for name, series in list(kind.items()):
+                    for labels in [key for key in series if key[:size] == prefix]:
+                        del series[labels]
+                    if not series:
+                        del kind[name]
+
+    def describe(self) -> list[Metric]:
+        """Describe nothing, the families are only known once published."""
+        return []
+
+    def collect(self) -> Iterator[Metric]:
+        """Yield a histogram or summary family per name."""
+        with self.lock:
+            histograms = {
+                name: dict(series) for name, series in self.histograms.items()
+            }
+            summaries = {name: dict(series) for name, series in self.summaries.items()}
+            counters = {name: dict(series) for name, series in self.counters.items()}
+        for name, histogram_series in histograms.items():
+            histogram = HistogramMetricFamily(name, f"Histogram of {name}")
+            for labels, (buckets, sum_value) in histogram_series.items():
+                label_dict = dict(labels)
+                for bound, count in buckets:
+                    histogram.samples.append(
+                        Sample(f"{name}_bucket", {**label_dict, "le": bound}, count)
+                    )
+                histogram.samples.append(
+                    Sample(f"{name}_count", label_dict, buckets[-1][1])
+                )
+                histogram.samples.append(Sample(f"{name}_sum", label_dict, sum_value))
+            yield histogram
+        for name, summary_series in summaries.items():
+            summary = SummaryMetricFamily(name, f"Summary of {name}")
+            for labels, (quantiles, count_value, sum_value) in summary_series.items():
+                label_dict = dict(labels)
+                for quantile, value in quantiles:
+                    summary.samples.append(
+                        Sample(name, {**label_dict, "quantile": quantile}, value)
+                    )
+                summary.samples.append(Sample(f"{name}_count", label_dict, count_value))
+                summary.samples.append(Sample(f"{name}_sum", label_dict, sum_value))
+            yield summary
+        for name, counter_series in counters.items():
+            counter = CounterMetricFamily(name, f"Total of {name}")
+            for labels, value in counter_series.items():
+                counter.samples.append(Sample(f"{name}_total", dict(labels), value))
+            yield counter
+
+
+# series of every PHD2 instance, exposed with the metrics_utility metrics
+collector = DistributionCollector()
+REGISTRY.register(collector)
+
+
+def drop_series(label_items: LabelItems) -> None:
+    """Drop the published series of an instance by its global label items."""
+    collector.remove(tuple((name, str(value)) for name, value in label_items))
+
+
+def publish_counter(
+    state: PHD2State, name: str, labels: LabelItems, value: float
+) -> None:
+    """Publish the value of a counter accumulated by the exporter, name without _total."""
+    series = series_labels(state, labels)
+    collector.set_counter(name, series, value)
+    utility_samples([(f"{name}_total", value, dict(series))])
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed buckets.
+
+    Observations only update counts in memory. publish() snapshots the
+    buckets, sum and count into the collector.
+    """
+
+    __slots__ = ("bounds", "count", "counts", "dirty", "labels", "name", "sum")
+
+    def __init__(
+        self, name: str, bounds: tuple[float, ...], labels: LabelItems = ()
+    ) -> None:
+        """Initialize an empty histogram with bucket upper bounds in increasing order."""
+        self.name = name
+        self.bounds = bounds
+        self.labels = labels
+        # one count per bucket plus +Inf, not cumulative
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.dirty = False
+
+    def observe(self, value: float) -> None:
+        """Add an observation."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.dirty = True
+
+    def buckets(self) -> list[tuple[str, float]]:
+        """Get the cumulative counts by le label, ending with +Inf."""
+        buckets: list[tuple[str, float]] = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts, strict=False):
+            cumulative += count
+            buckets.append((format_bound(bound), cumulative))
+        buckets.append((INF, self.count))
+        return buckets
+
+    def publish(self, state: PHD2State) -> None:
+        """Publish the histogram with the state's global labels."""
+        labels = series_labels(state, self.labels)
+        buckets = self.buckets()
+        collector.set_histogram(self.name, labels, buckets, self.sum)
+        label_dict = dict(labels)
+        utility_samples(
+            [
+                *(
+                    (f"{self.name}_bucket", count, {**label_dict, "le": bound})
+                    for bound, count in buckets
+                ),
+                (f"{self.name}_sum", self.sum, label_dict),
+                (f"{self.name}_count", self.count, label_dict),
+            ]
+        )
+        self.dirty = False
+
+
+def get_histogram(
+    state: PHD2State, name: str, bounds: tuple[float, ...], labels: LabelItems = ()
+) -> Histogram:
+    """Get the histogram for a name and labels, created on first use."""
+    key = (name, labels)
+    histogram = state.histograms.get(key)
+    if histogram is None:
+        histogram = state.histograms[key] = Histogram(name, bounds, labels)
+    return histogram
+
+
+def publish_histograms(state: PHD2State, now: float, force: bool = False) -> None:
+    """
+    Publish histograms and session summaries that changed.
+
+    Publishing happens at most every HISTOGRAM_INTERVAL seconds, force
+    publishes regardless of the interval, e.g. at the end of a replay.
+    """
+    if state.global_labels is None:
+        return
+    if not force and now - state.histograms_published < HISTOGRAM_INTERVAL:
+        return
+    for histogram in state.histograms.values():
+        if histogram.dirty:
+            histogram.publish(state)
+    dirty = [summary for summary in state.sketches.values() if summary.dirty]
+    if dirty and state.summaries_stale:
+        # the new session replaces every summary of the previous one
+        collector.remove(series_labels(state, ()), summaries_only=True)
+        state.summaries_stale = False
+    for summary in dirty:
+        summary.publish(state)
+    state.histograms_published = now
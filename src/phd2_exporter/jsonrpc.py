@@ -1,29 +1,124 @@
 # Generated-by: Cursor (Claude Sonnet 4.5)
-"""JSONRPC request handling for PHD2."""
+"""
+JSONRPC request handling for PHD2.
+
+Requests get increasing IDs and wait in a pending table until answered or
+their deadline passes. A method already waiting for a response is not
+requested again, the pending response is used for both.
+"""
 
 import json
-import random
-import socket
+import time
 from collections.abc import Callable
-from typing import Any
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from .histogram import get_histogram
+from .latency import LATENCY_BUCKETS
+from .state import PHD2State, get_state
+from .utils import get_metric_handle, utility_set
+
+METRIC_RPC_LATENCY = "phd2_rpc_latency_seconds"
+
+LABEL_METHOD = "method"
+
+# called with the response to a request
+Callback = Callable[[dict[str, Any]], None]
+
+
+class Sender(Protocol):
+    """Connection JSONRPC requests are written to, e.g. a socket."""
+
+    def sendall(self, data: bytes, /) -> None:
+        """Send all data."""
+
+
+@dataclass
+class PendingRequest:
+    """A request sent to PHD2 and not answered yet."""
+
+    method: str
+    callback: Callback
+    # monotonic clock
+    sent: float
+    deadline: float
+
+
+def next_request_id(state: PHD2State) -> int:
+    """Claim the next JSONRPC request ID, never reused for the same state."""
+    with state.mutex:
+        state.jrpc_next_id += 1
+        return state.jrpc_next_id
+
+
+def publish_outstanding(state: PHD2State) -> None:
+    """Publish the number of requests waiting for a response."""
+    if state.global_labels is not None:
+        get_metric_handle(state, "phd2_rpc_outstanding").set(len(state.jrpc_pending))
 
-from .state import get_state
-from .utils import utility_set
 
+def forget_request(state: PHD2State, request_id: int) -> PendingRequest | None:
+    """Remove a request from the pending table, None if it is not pending."""
+    pending: PendingRequest | None = state.jrpc_pending.pop(request_id, None)
+    if pending is not None and state.jrpc_methods.get(pending.method) == request_id:
+        del state.jrpc_methods[pending.method]
+    return pending
 
-def random_jrpc_request_id() -> int:
-    """Generate a random unique JSONRPC request ID."""
+
+def expire_requests(state: PHD2State, now: float) -> None:
+    """Drop requests past their deadline, counting a timeout for each."""
+    expired = [
+        request_id
+        for request_id, pending in state.jrpc_pending.items()
+        if pending.deadline <= now
+    ]
+    if not expired:
+        return
+    for request_id in expired:
+        pending = forget_request(state, request_id)
+        if pending is not None and state.global_labels is not None:
+            get_metric_handle(
+                state, "phd2_rpc_timeout", ((LABEL_METHOD, pending.method),)
+            ).inc()
+    publish_outstanding(state)
+
+
+def reset_requests(state: PHD2State) -> None:
+    """Forget all pending requests, e.g. when the connection they were sent on is gone."""
+    state.jrpc_pending.clear()
+    state.jrpc_methods.clear()
+    publish_outstanding(state)
+
+
+def send_request(s: Sender, method: str, callback: Callback) -> int:
+    """
+    Send a request, unless the same method is already waiting for a response.
+
+    Returns the ID of the request whose response will call back. Expired
+    requests are dropped first, so a request PHD2 never answered is sent again.
+    """
     state = get_state()
-    request_id = -1
-    # only need mutex when claiming a request ID
-    state.mutex.acquire()
-    while True:
-        request_id = random.randint(1, 50000)
-        if request_id not in state.jrpc_callbacks:
-            break
-    # claim the request id
-    state.jrpc_callbacks[request_id] = request_id
-    state.mutex.release()
+    now = time.monotonic()
+    expire_requests(state, now)
+
+    request_id = state.jrpc_methods.get(method)
+    if request_id is not None:
+        # the pending response serves this request too
+        if state.global_labels is not None:
+            get_metric_handle(
+                state, "phd2_rpc_deduplicated", ((LABEL_METHOD, method),)
+            ).inc()
+        return request_id
+
+    request_id = next_request_id(state)
+    state.jrpc_pending[request_id] = PendingRequest(
+        method, callback, now, now + state.jrpc_timeout
+    )
+    state.jrpc_methods[method] = request_id
+    publish_outstanding(state)
+    # socket exception handling done in main loop
+    request = {"method": method, "id": request_id}
+    s.sendall((json.dumps(request) + "\r\n").encode("utf-8"))
     return request_id
 
 
@@ -33,9 +128,6 @@ def callback_request_pixel_scale(data: dict[str, Any]) -> None:
     state.pixel_scale = data["result"]
     if state.global_labels is not None:
         utility_set("phd2_pixel_scale", state.pixel_scale, state.global_labels)
-    if "id" in data:
-        # unregister the callback, work is done
-        state.jrpc_callbacks.pop(data["id"])
 
 
 def callback_request_connected(data: dict[str, Any]) -> None:
@@ -44,9 +136,6 @@ def callback_request_connected(data: dict[str, Any]) -> None:
     connected = data["result"]
     if state.global_labels is not None:
         utility_set("phd2_connected", connected, state.global_labels)
-    if "id" in data:
-        # unregister the callback, work is done
-        state.jrpc_callbacks.pop(data["id"])
 
 
 def callback_request_current_equipment(data: dict[str, Any]) -> None:
@@ -63,56 +152,116 @@ def callback_request_current_equipment(data: dict[str, Any]) -> None:
         # NOTE do not collect 'name' as the value will change when device is connected and is not worth cardinality hit.
         if "connected" in eq:
             connected = eq["connected"]
-        labels = state.get_global_labels_deepcopy()
-        labels.update({"device": key})
-        utility_set("phd2_current_equipment", connected, labels)
+        get_metric_handle(state, "phd2_current_equipment", (("device", key),)).set(
+            connected
+        )
 
 
-def request_pixel_scale(s: socket.socket) -> None:
-    """Request pixel scale from PHD2."""
+def callback_request_exposure(data: dict[str, Any]) -> None:
+    """Callback for exposure request, PHD2 answers in milliseconds."""
     state = get_state()
-    # socket exception handling done in main loop
-    # send request
-    request_id = random_jrpc_request_id()
-    request = {
-        "method": "get_pixel_scale",
-        "id": request_id,
-    }
-    state.jrpc_callbacks[request_id] = callback_request_pixel_scale
-    s.sendall((json.dumps(request) + "\r\n").encode("utf-8"))
+    if state.global_labels is not None:
+        get_metric_handle(state, "phd2_exposure_seconds").set(data["result"] / 1000)
 
 
-def request_connected(s: socket.socket) -> None:
-    """Request connected status from PHD2."""
+def callback_request_guide_output_enabled(data: dict[str, Any]) -> None:
+    """Callback for guide output enabled request."""
     state = get_state()
-    # socket exception handling done in main loop
-    # send request
-    request_id = random_jrpc_request_id()
-    request = {
-        "method": "get_connected",
-        "id": request_id,
-    }
-    state.jrpc_callbacks[request_id] = callback_request_connected
-    s.sendall((json.dumps(request) + "\r\n").encode("utf-8"))
+    if state.global_labels is not None:
+        get_metric_handle(state, "phd2_guide_output_enabled").set(data["result"])
+
+
+def callback_request_settling(data: dict[str, Any]) -> None:
+    """Callback for settling request."""
+    state = get_state()
+    if state.global_labels is not None:
+        get_metric_handle(state, "phd2_settling").set(data["result"])
+
 
+# callback of each JSONRPC method, e.g. for responses replayed from a capture
+RPC_CALLBACKS: dict[str, Callback] = {
+    "get_pixel_scale": callback_request_pixel_scale,
+    "get_connected": callback_request_connected,
+    "get_current_equipment": callback_request_current_equipment,
+    "get_exposure": callback_request_exposure,
+    "get_guide_output_enabled": callback_request_guide_output_enabled,
+    "get_settling": callback_request_settling,
+}
 
-def request_current_equipment(s: socket.socket) -> None:
+
+def request_pixel_scale(s: Sender) -> None:
+    """Request pixel scale from PHD2."""
+    send_request(s, "get_pixel_scale", callback_request_pixel_scale)
+
+
+def request_connected(s: Sender) -> None:
+    """Request connected status from PHD2."""
+    send_request(s, "get_connected", callback_request_connected)
+
+
+def request_current_equipment(s: Sender) -> None:
     """Request current equipment from PHD2."""
+    send_request(s, "get_current_equipment", callback_request_current_equipment)
+
+
+def request_exposure(s: Sender) -> None:
+    """Request exposure duration from PHD2."""
+    send_request(s, "get_exposure", callback_request_exposure)
+
+
+def request_guide_output_enabled(s: Sender) -> None:
+    """Request whether guide output is enabled from PHD2."""
+    send_request(s, "get_guide_output_enabled", callback_request_guide_output_enabled)
+
+
+def request_settling(s: Sender) -> None:
+    """Request settling status from PHD2."""
+    send_request(s, "get_settling", callback_request_settling)
+
+
+# JSONRPC methods that can be requested by name, e.g. as event follow-ups or polls
+RPC_REQUESTS: dict[str, Callable[[Sender], None]] = {
+    "get_pixel_scale": request_pixel_scale,
+    "get_connected": request_connected,
+    "get_current_equipment": request_current_equipment,
+    "get_exposure": request_exposure,
+    "get_guide_output_enabled": request_guide_output_enabled,
+    "get_settling": request_settling,
+}
+
+
+def send_requests(s: Sender, methods: tuple[str, ...], refresh: bool = False) -> None:
+    """
+    Send a request for each JSONRPC method, in order.
+
+    With refresh, a method already waiting for a response is requested again,
+    as that response may predate a change PHD2 just announced. The earlier
+    response is still handled, the new one overwrites it.
+    """
     state = get_state()
-    # socket exception handling done in main loop
-    # send request
-    request_id = random_jrpc_request_id()
-    request = {
-        "method": "get_current_equipment",
-        "id": request_id,
-    }
-    state.jrpc_callbacks[request_id] = callback_request_current_equipment
-    s.sendall((json.dumps(request) + "\r\n").encode("utf-8"))
+    for method in methods:
+        if refresh:
+            state.jrpc_methods.pop(method, None)
+        RPC_REQUESTS[method](s)
 
 
 def handle_jsonrpc_response(data: dict[str, Any]) -> None:
-    """Handle JSONRPC response by calling registered callback."""
+    """Handle JSONRPC response by calling the callback of the pending request."""
     state = get_state()
-    if "id" in data and data["id"] in state.jrpc_callbacks:
-        callback: Callable[[dict[str, Any]], None] = state.jrpc_callbacks[data["id"]]
-        callback(data)
+    request_id = data.get("id")
+    if not isinstance(request_id, int):
+        return
+    pending = forget_request(state, request_id)
+    if pending is None:
+        # expired, sent on a previous connection or not ours
+        return
+    labels = ((LABEL_METHOD, pending.method),)
+    get_histogram(state, METRIC_RPC_LATENCY, LATENCY_BUCKETS, labels).observe(
+        time.monotonic() - pending.sent
+    )
+    publish_outstanding(state)
+    if "error" in data:
+        if state.global_labels is not None:
+            get_metric_handle(state, "phd2_rpc_error", labels).inc()
+        return
+    pending.callback(data)
@@ -0,0 +1,92 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Latency of PHD2 events through the exporter."""
+
+from typing import Any
+
+from .histogram import get_histogram
+from .state import PHD2State
+
+METRIC_LATENCY = "phd2_event_latency_seconds"
+METRIC_PROCESSING = "phd2_event_processing_seconds"
+
+LABEL_STAGE = "stage"
+LABEL_EVENT = "event"
+
+# PHD2 Timestamp to received, includes any clock offset between the PHD2 and exporter hosts
+STAGE_NETWORK = "network"
+# received to handling started, time waiting in the queue
+STAGE_QUEUE = "queue"
+# PHD2 Timestamp to metrics updated
+STAGE_TOTAL = "total"
+
+NETWORK_LABELS = ((LABEL_STAGE, STAGE_NETWORK),)
+QUEUE_LABELS = ((LABEL_STAGE, STAGE_QUEUE),)
+TOTAL_LABELS = ((LABEL_STAGE, STAGE_TOTAL),)
+
+# JSONRPC responses have no event name
+EVENT_JSONRPC = "jsonrpc"
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+PROCESSING_BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.1,
+)
+
+
+def observe_event(
+    state: PHD2State,
+    data: dict[str, Any],
+    received: float,
+    started: float,
+    elapsed: float,
+) -> None:
+    """
+    Record latency for a handled event or JSONRPC response.
+
+    received is when the line was read, started when handling began (both
+    wall clock) and elapsed the seconds spent handling it. Stages with
+    PHD2's Timestamp are only recorded for events that have one.
+    """
+    event = data.get("Event", EVENT_JSONRPC)
+    get_histogram(
+        state, METRIC_PROCESSING, PROCESSING_BUCKETS, ((LABEL_EVENT, event),)
+    ).observe(elapsed)
+    get_histogram(state, METRIC_LATENCY, LATENCY_BUCKETS, QUEUE_LABELS).observe(
+        started - received
+    )
+
+    timestamp = data.get("Timestamp")
+    if timestamp:
+        # clocks of the PHD2 and exporter hosts may differ, never negative
+        get_histogram(state, METRIC_LATENCY, LATENCY_BUCKETS, NETWORK_LABELS).observe(
+            max(received - timestamp, 0.0)
+        )
+        get_histogram(state, METRIC_LATENCY, LATENCY_BUCKETS, TOTAL_LABELS).observe(
+            max(started + elapsed - timestamp, 0.0)
+        )
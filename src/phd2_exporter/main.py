@@ -2,16 +2,35 @@
 """Main entry point for PHD2 exporter."""
 
 import argparse
-import json
-import socket
-import time
+import asyncio
+import threading
+from pathlib import Path
 
-import metrics_utility
-
-from .events import handle_event
-from .jsonrpc import handle_jsonrpc_response
-from .state import get_state
-from .utils import utility_inc
+from .capture import (
+    COMPRESSION_AUTO,
+    COMPRESSIONS,
+    DEFAULT_MAX_BYTES,
+    CaptureSink,
+)
+from .collector import QUEUE_SIZE, InstanceCollector, run_collectors
+from .debug import make_debug
+from .decoding import DECODER_AUTO, DECODER_NAMES, get_decoder
+from .distribution import ERROR_BUCKETS, parse_buckets
+from .exposition import DEFAULT_MIN_INTERVAL, start_metrics_server
+from .frames import (
+    DEFAULT_BATCH_ROWS,
+    DEFAULT_FLUSH_INTERVAL,
+    FORMAT_AUTO,
+    FORMATS,
+    FrameSink,
+)
+from .periodic import DEFAULT_WINDOW, numpy_available
+from .poller import DEFAULT_POLL, parse_poll
+from .remote_write import DEFAULT_INTERVAL, RemoteWriter
+from .rms import SCALE_ARCSEC, SCALE_PX, WINDOW_LIVE
+from .rmsstore import SESSION, RmsWindow, parse_duration, parse_rms_windows
+from .state import PHD2State
+from .utils import set_remote_writer
 
 
 def parse_args() -> dict:
@@ -29,6 +48,11 @@ def parse_args() -> dict:
         type=str,
         help="the host PHD2 is exposing events on, default: 127.0.0.1",
     )
+    parser.add_argument(
+        "--phd2instances",
+        type=int,
+        help="number of PHD2 instances to collect from, on consecutive ports starting at phd2port, default: 1",
+    )
     parser.add_argument(
         "--port", type=int, help="the port to export metrics on, default: 9753"
     )
@@ -37,6 +61,111 @@ def parse_args() -> dict:
         type=int,
         help="number of samples used to calculate RMS, default: 10",
     )
+    parser.add_argument(
+        "--rms_windows",
+        type=str,
+        help="comma separated RMS windows as name:size, size is a number of frames, a duration up to 10h (300s, 5m, 1h) or 'session', default: live:<rms_samples>,5m:5m,session",
+    )
+    parser.add_argument(
+        "--guide_error_buckets_px",
+        type=str,
+        help="comma separated bucket upper bounds of the phd2_guide_error histogram in px, default: "
+        + ",".join(f"{b:g}" for b in ERROR_BUCKETS[SCALE_PX]),
+    )
+    parser.add_argument(
+        "--guide_error_buckets_arcsec",
+        type=str,
+        help="comma separated bucket upper bounds of the phd2_guide_error histogram in arcsec, default: "
+        + ",".join(f"{b:g}" for b in ERROR_BUCKETS[SCALE_ARCSEC]),
+    )
+    parser.add_argument(
+        "--periodic_error_window",
+        type=str,
+        help="guiding time analyzed for RA periodic error as a duration (30m, 2h), 'off' to not analyze, needs numpy, default: 2h",
+    )
+    parser.add_argument(
+        "--json_decoder",
+        type=str,
+        choices=[DECODER_AUTO, *DECODER_NAMES],
+        help="JSON decoder for PHD2 events, auto picks the fastest installed, default: auto",
+    )
+    parser.add_argument(
+        "--queue_size",
+        type=int,
+        help=f"batches of events read but not yet handled before dropping, default: {QUEUE_SIZE}",
+    )
+    parser.add_argument(
+        "--rpc_timeout",
+        type=float,
+        help="seconds to wait for PHD2 to answer a JSONRPC request, default: 10",
+    )
+    parser.add_argument(
+        "--poll",
+        type=str,
+        help=f"comma separated JSONRPC methods polled as method:interval, interval is seconds or a duration (30s, 5m), 'off' to not poll, default: {DEFAULT_POLL}",
+    )
+    parser.add_argument(
+        "--capture_dir",
+        type=Path,
+        help="write the raw PHD2 event stream to compressed files in this directory, default: no capture",
+    )
+    parser.add_argument(
+        "--capture_compression",
+        type=str,
+        choices=[COMPRESSION_AUTO, *COMPRESSIONS],
+        help="capture compression, auto uses zstd if installed else gzip, default: auto",
+    )
+    parser.add_argument(
+        "--capture_max_bytes",
+        type=int,
+        help=f"start a new capture file after this many bytes, default: {DEFAULT_MAX_BYTES}",
+    )
+    parser.add_argument(
+        "--frames_dir",
+        type=Path,
+        help="write every guiding frame to a columnar file per guiding session in this directory, default: not written",
+    )
+    parser.add_argument(
+        "--frames_format",
+        type=str,
+        choices=[FORMAT_AUTO, *FORMATS],
+        help="frames file format, auto uses parquet if pyarrow is installed else binary, default: auto",
+    )
+    parser.add_argument(
+        "--frames_batch",
+        type=int,
+        help=f"frames buffered in memory before they are written, default: {DEFAULT_BATCH_ROWS}",
+    )
+    parser.add_argument(
+        "--frames_flush_interval",
+        type=float,
+        help=f"seconds frames are buffered before they are written, parquet files are also closed and a new one started, default: {DEFAULT_FLUSH_INTERVAL:g}",
+    )
+    parser.add_argument(
+        "--remote_write_url",
+        type=str,
+        help="also push every metric update to this Prometheus remote-write endpoint, e.g. http://prometheus:9090/api/v1/write, default: no push",
+    )
+    parser.add_argument(
+        "--remote_write_spool",
+        type=Path,
+        help="keep remote-write requests that could not be sent in this directory and send them once the endpoint is back, default: dropped",
+    )
+    parser.add_argument(
+        "--remote_write_interval",
+        type=float,
+        help=f"seconds between remote-write requests, default: {DEFAULT_INTERVAL:g}",
+    )
+    parser.add_argument(
+        "--metrics_cache_seconds",
+        type=float,
+        help=f"seconds the rendered metrics are served to scrapes before updates are rendered again, default: {DEFAULT_MIN_INTERVAL:g}",
+    )
+    parser.add_argument(
+        "--debug",
+        action="store_true",
+        help="also serve /debug/profile and /debug/stats on the metrics port, default: disabled",
+    )
 
     # treat args parsed as a dictionary
     return vars(parser.parse_args())
@@ -60,79 +189,162 @@ def get_config(args: dict) -> tuple[str, int, int, int]:
     return phd2host, phd2port, port, rms_samples
 
 
-def run_exporter_loop(phd2host: str, phd2port: int) -> None:
-    """Run the main exporter loop."""
-    state = get_state()
-    print_connect_error = True
-
-    while True:
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect((phd2host, phd2port))
-                print_connect_error = True
-                s.setblocking(False)
-                s.settimeout(2.0)
-                while True:
-                    try:
-                        raw = s.recv(1024)
-                        if len(raw) == 0:
-                            # empty response without a timeout, server is down
-                            # break the loop, which triggers a reconnect
-                            break
-                        # keep a count (inc / total) for everything
-                        if state.global_labels is not None:
-                            utility_inc("phd2", state.global_labels)
-                    except TimeoutError:
-                        # this is fine, just nothing to read.  PHD2 idle.  No metric so it's not confused as an error
-                        # keep a count (inc / total) for everything
-                        if state.global_labels is not None:
-                            utility_inc("phd2", state.global_labels)
-                        continue
-                    except Exception as e:
-                        # non-timeout error, this is bad.  break the loop, which will trigger reconnect
-                        utility_inc("phd2_error", {"type": type(e).__name__})
-                        print(f"Exception: {e}")
-                        break
-                    lines = raw.decode()
-                    for line in lines.split("\r\n"):
-                        if len(line) > 0:
-                            data = json.loads(line)
-                            if "Event" in data:
-                                handle_event(s, data)
-                            elif "jsonrpc" in data and "id" in data:
-                                handle_jsonrpc_response(data)
-        except OSError as e:
-            utility_inc("phd2_error", {"type": type(e).__name__})
-            # Connection refused error code - don't log these, it's spammy
-            connection_refused_errno = 10061
-            if e.errno == connection_refused_errno:
-                if print_connect_error:
-                    print(
-                        "Failed to connect to PHD2.  Server is down or unreachable.  Retrying silently..."
-                    )
-                    print_connect_error = False
-            else:
-                print(f"socket.error: {e}")
-        except Exception as e:
-            utility_inc("phd2_error", {"type": type(e).__name__})
-            print(f"Exception: {e}")
-
-        # something went wrong.  try again in a little bit...
-        time.sleep(2)
+def get_instances(
+    phd2host: str, phd2port: int, count: int | None
+) -> list[tuple[str, int]]:
+    """
+    Get host and port for each PHD2 instance.
+
+    PHD2 serves the first instance on phd2port and subsequent instances on the following ports.
+    """
+    if not count:
+        count = 1
+    return [(phd2host, phd2port + i) for i in range(count)]
+
+
+def get_rms_windows_config(args: dict, rms_samples: int) -> list[RmsWindow]:
+    """Get RMS windows from arguments, exported with the "window" label."""
+    spec = args.get("rms_windows")
+    if not spec:
+        spec = f"{WINDOW_LIVE}:{rms_samples},5m:5m,{SESSION}"
+    return parse_rms_windows(spec)
+
+
+def get_guide_error_buckets(args: dict) -> dict[str, tuple[float, ...]]:
+    """Get configured guide error histogram buckets by scale, defaults are not included."""
+    buckets = {}
+    for scale in (SCALE_PX, SCALE_ARCSEC):
+        spec = args.get(f"guide_error_buckets_{scale}")
+        if spec:
+            buckets[scale] = parse_buckets(spec)
+    return buckets
+
+
+def get_periodic_error_window(args: dict) -> float:
+    """Get seconds of guiding analyzed for periodic error, 0 if disabled."""
+    spec = args.get("periodic_error_window")
+    if not spec:
+        return DEFAULT_WINDOW
+    if spec == "off":
+        return 0.0
+    seconds = parse_duration(spec)
+    if seconds is None:
+        raise ValueError(f"invalid periodic error window: {spec!r}")
+    return seconds
+
+
+def get_capture_sink(args: dict, host: str, port: int) -> CaptureSink | None:
+    """Get the capture sink for a PHD2 instance, None if capture is not enabled."""
+    directory = args.get("capture_dir")
+    if not directory:
+        return None
+    return CaptureSink(
+        directory,
+        f"phd2-{host}-{port}",
+        args.get("capture_compression") or COMPRESSION_AUTO,
+        args.get("capture_max_bytes") or DEFAULT_MAX_BYTES,
+    )
+
+
+def get_frame_sink(args: dict, host: str, port: int) -> FrameSink | None:
+    """Get the frame sink for a PHD2 instance, None if frames are not written."""
+    directory = args.get("frames_dir")
+    if not directory:
+        return None
+    return FrameSink(
+        directory,
+        f"phd2-{host}-{port}",
+        args.get("frames_format") or FORMAT_AUTO,
+        args.get("frames_batch") or DEFAULT_BATCH_ROWS,
+        flush_interval=args.get("frames_flush_interval") or DEFAULT_FLUSH_INTERVAL,
+    )
+
+
+def get_remote_writer(args: dict) -> RemoteWriter | None:
+    """Get the remote writer shared by all PHD2 instances, None if not pushing."""
+    url = args.get("remote_write_url")
+    if not url:
+        return None
+    return RemoteWriter(
+        url,
+        spool_dir=args.get("remote_write_spool"),
+        interval=args.get("remote_write_interval") or DEFAULT_INTERVAL,
+    )
 
 
 def main() -> int:
     """Main entry point."""
     args = parse_args()
     phd2host, phd2port, port, rms_samples = get_config(args)
+    rms_windows = get_rms_windows_config(args, rms_samples)
+    guide_error_buckets = get_guide_error_buckets(args)
+    periodic_error_window = get_periodic_error_window(args)
+    if periodic_error_window and not numpy_available():
+        print("Periodic error analysis needs numpy, install the analysis extra")
+    decoder_name, decode = get_decoder(args.get("json_decoder") or DECODER_AUTO)
+    print(f"Decoding PHD2 events with {decoder_name}")
+    poll_intervals = parse_poll(args.get("poll") or DEFAULT_POLL)
 
-    state = get_state()
-    state.phd_rms_samples = rms_samples
+    remote_writer = get_remote_writer(args)
+    if remote_writer is not None:
+        remote_writer.start()
+        set_remote_writer(remote_writer)
+        print(f"Pushing metrics to {remote_writer.url}")
 
-    # Start up the server to expose the metrics.
-    metrics_utility.metrics(port)
+    # every PHD2 instance gets its own state
+    collectors = []
+    for host, instance_port in get_instances(
+        phd2host, phd2port, args.get("phd2instances")
+    ):
+        state = PHD2State()
+        state.phd_rms_samples = rms_samples
+        state.phd_rms_windows = rms_windows
+        state.guide_error_buckets = guide_error_buckets
+        state.periodic_error_window = periodic_error_window
+        if args.get("rpc_timeout"):
+            state.jrpc_timeout = args["rpc_timeout"]
+        state.frames = get_frame_sink(args, host, instance_port)
+        if state.frames is not None:
+            state.frames.start()
+        capture = get_capture_sink(args, host, instance_port)
+        if capture is not None:
+            capture.start()
+        collectors.append(
+            InstanceCollector(
+                host,
+                instance_port,
+                state,
+                decode=decode,
+                capture=capture,
+                queue_size=args.get("queue_size") or QUEUE_SIZE,
+                poll_intervals=poll_intervals,
+            )
+        )
+
+    # Start up the server to expose the metrics.  One endpoint for all instances.
+    start_metrics_server(
+        port,
+        min_interval=args.get("metrics_cache_seconds") or DEFAULT_MIN_INTERVAL,
+        # collectors run on this thread
+        debug=make_debug(
+            [collector.state for collector in collectors], threading.get_ident()
+        )
+        if args.get("debug")
+        else None,
+    )
 
-    run_exporter_loop(phd2host, phd2port)
+    try:
+        asyncio.run(run_collectors(collectors))
+    finally:
+        # flush captured data and frames still queued
+        for collector in collectors:
+            if collector.capture is not None:
+                collector.capture.close()
+            if collector.state.frames is not None:
+                collector.state.frames.close()
+        if remote_writer is not None:
+            set_remote_writer(None)
+            remote_writer.close()
 
     return 0
 
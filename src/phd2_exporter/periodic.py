@@ -0,0 +1,220 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Periodic error analysis of the RA guide error.
+
+RADistanceRaw of guiding frames is kept in a rolling float32 buffer of
+the last hours. Every ANALYSIS_INTERVAL seconds a Lomb-Scargle periodogram,
+which copes with uneven frame timing, is computed with NumPy on a
+background thread. The strongest periods and their amplitudes are
+exported. Needs numpy, install with the analysis extra, without it
+nothing is analyzed.
+"""
+
+import math
+import time
+from array import array
+from bisect import bisect_left
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import cache
+from typing import Any
+
+from .rms import KEY_RA_RAW, LABEL_SCALE, SCALE_ARCSEC, SCALE_PX
+from .state import PHD2State
+from .utils import get_metric_handle
+
+METRIC_PE_PERIOD = "phd2_periodic_error_period_seconds"
+METRIC_PE_AMPLITUDE = "phd2_periodic_error_amplitude"
+
+LABEL_RANK = "rank"
+
+# default seconds of guiding kept for analysis
+DEFAULT_WINDOW = 7200.0
+
+# seconds between analyses
+ANALYSIS_INTERVAL = 60.0
+
+# fewer samples do not give a meaningful spectrum
+MIN_SAMPLES = 64
+
+# periods searched, worm periods of common mounts are a few minutes
+MIN_PERIOD = 20.0
+MAX_PERIOD = 1200.0
+
+FREQUENCIES = 2000
+
+# frequencies evaluated at once, bounds memory to samples * chunk floats
+FREQUENCY_CHUNK = 64
+
+# strongest periods exported
+PEAKS = 3
+
+# (period seconds, amplitude px) of the strongest periods, strongest first
+Peaks = list[tuple[float, float]]
+
+_executor: ThreadPoolExecutor | None = None
+
+
+@cache
+def _load_numpy() -> Any:
+    """Get numpy if installed, None if not."""
+    try:
+        import numpy as np  # noqa: PLC0415
+    except ImportError:
+        return None
+    return np
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the thread analyses run on, shared by all PHD2 instances."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="periodic-error"
+        )
+    return _executor
+
+
+def lomb_scargle(np: Any, times: Any, values: Any, periods: Any) -> tuple[Any, Any]:
+    """
+    Compute the Lomb-Scargle periodogram of values at times for periods.
+
+    Returns the power and the amplitude of the best fitting sine for each
+    period. Frequencies are evaluated in chunks to bound memory.
+    """
+    y = values - values.mean()
+    omegas = 2 * np.pi / periods
+    power = np.empty(len(omegas))
+    amplitude = np.empty(len(omegas))
+    for start in range(0, len(omegas), FREQUENCY_CHUNK):
+        w = omegas[start : start + FREQUENCY_CHUNK, None]
+        wt = w * times
+        # time offset that makes the sine and cosine terms independent
+        tau = np.arctan2(np.sin(2 * wt).sum(axis=1), np.cos(2 * wt).sum(axis=1)) / (
+            2 * w[:, 0]
+        )
+        arg = wt - w * tau[:, None]
+        cos = np.cos(arg)
+        sin = np.sin(arg)
+        yc = cos @ y
+        ys = sin @ y
+        cc = (cos * cos).sum(axis=1)
+        ss = (sin * sin).sum(axis=1)
+        power[start : start + len(w)] = 0.5 * (yc * yc / cc + ys * ys / ss)
+        amplitude[start : start + len(w)] = np.hypot(yc / cc, ys / ss)
+    return power, amplitude
+
+
+def find_peaks(np: Any, periods: Any, power: Any, amplitude: Any) -> Peaks:
+    """Get the strongest local maxima of the periodogram."""
+    inner = power[1:-1]
+    maxima = np.flatnonzero((inner > power[:-2]) & (inner >= power[2:])) + 1
+    strongest = maxima[np.argsort(power[maxima])[::-1][:PEAKS]]
+    return [(float(periods[i]), float(amplitude[i])) for i in strongest]
+
+
+def analyze(times: Any, values: Any, span: float) -> Peaks:
+    """Find the strongest periods in samples covering span seconds."""
+    np = _load_numpy()
+    # at least two cycles of the longest period
+    longest = min(MAX_PERIOD, span / 2)
+    if longest <= MIN_PERIOD:
+        return []
+    # evenly spaced in frequency, the resolution of the periodogram
+    periods = 1 / np.linspace(1 / longest, 1 / MIN_PERIOD, FREQUENCIES)
+    power, amplitude = lomb_scargle(np, times, values, periods)
+    return find_peaks(np, periods, power, amplitude)
+
+
+class PeriodicErrorAnalyzer:
+    """Rolling buffer of RA guide error with analyses in the background."""
+
+    def __init__(self, window: float = DEFAULT_WINDOW) -> None:
+        """Initialize analyzer keeping window seconds of samples."""
+        self.window = window
+        # sample times are seconds since the first sample, float32 is precise enough
+        self.start: float | None = None
+        self.times = array("f")
+        self.values = array("f")
+        self.analyzed = 0.0
+        self.future: Future[Peaks] | None = None
+        self.peaks: Peaks = []
+
+    def add(self, timestamp: float, value: float) -> None:
+        """Add a sample, dropping samples older than the window."""
+        if self.start is None:
+            self.start = timestamp
+        offset = timestamp - self.start
+        self.times.append(offset)
+        self.values.append(value)
+        # trim in steps of a tenth of the window, not on every sample
+        if offset - self.times[0] > self.window * 1.1:
+            keep = bisect_left(self.times, offset - self.window)
+            del self.times[:keep]
+            del self.values[:keep]
+
+    def poll(self, now: float) -> Peaks | None:
+        """
+        Start an analysis if one is due, return new results when one finished.
+
+        now is a monotonic time. Returns None while there is nothing new.
+        """
+        if self.future is not None:
+            if not self.future.done():
+                return None
+            future, self.future = self.future, None
+            self.peaks = future.result()
+            return self.peaks
+        if now - self.analyzed < ANALYSIS_INTERVAL or len(self.times) < MIN_SAMPLES:
+            return None
+        np = _load_numpy()
+        self.analyzed = now
+        # copies, the buffers keep growing while the analysis runs
+        times = np.array(self.times, dtype=np.float64)
+        values = np.array(self.values, dtype=np.float64)
+        span = float(times[-1] - times[0])
+        self.future = get_executor().submit(analyze, times, values, span)
+        return None
+
+
+def publish_peaks(state: PHD2State, peaks: Peaks) -> None:
+    """
+    Publish periods and amplitudes, in arcsec once the pixel scale is known.
+
+    Ranks without a peak in this analysis are NaN, not left at the values
+    of an earlier one.
+    """
+    missing = [(math.nan, math.nan)] * (PEAKS - len(peaks))
+    for rank, (period, amplitude) in enumerate([*peaks, *missing], start=1):
+        labels = ((LABEL_RANK, rank),)
+        get_metric_handle(state, METRIC_PE_PERIOD, labels).set(period)
+        get_metric_handle(
+            state, METRIC_PE_AMPLITUDE, (*labels, (LABEL_SCALE, SCALE_PX))
+        ).set(amplitude)
+        if state.pixel_scale > 0:
+            get_metric_handle(
+                state, METRIC_PE_AMPLITUDE, (*labels, (LABEL_SCALE, SCALE_ARCSEC))
+            ).set(amplitude * state.pixel_scale)
+
+
+def numpy_available() -> bool:
+    """Check if analyses can run."""
+    return _load_numpy() is not None
+
+
+def observe_periodic_error(state: PHD2State, data: dict[str, Any]) -> None:
+    """Add the RA guide error of a GuideStep and publish finished analyses."""
+    if not state.periodic_error_window or not numpy_available():
+        return
+    value = data.get(KEY_RA_RAW)
+    if not isinstance(value, int | float):
+        return
+    analyzer = state.periodic_error
+    if analyzer is None:
+        analyzer = state.periodic_error = PeriodicErrorAnalyzer(
+            state.periodic_error_window
+        )
+    # exact frame times, only their differences are used so clock offsets cancel
+    analyzer.add(data.get("Timestamp") or time.time(), value)
+    peaks = analyzer.poll(time.monotonic())
+    if peaks is not None and state.global_labels is not None:
+        publish_peaks(state, peaks)
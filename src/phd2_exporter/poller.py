@@ -0,0 +1,116 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Periodic JSONRPC polling for state PHD2 does not send events for.
+
+PHD2 sends no event when equipment disconnects, so phd2_connected and
+friends would go stale until the next AppState or ConfigurationChange.
+Each polled method has its own interval. Requests due at the same time go
+out in one write, and polls back off while PHD2 is stopped.
+"""
+
+from .jsonrpc import RPC_REQUESTS, Sender
+from .rmsstore import parse_duration
+from .state import PHD2State
+
+DEFAULT_POLL = (
+    "get_connected:30s,get_current_equipment:1m,"
+    "get_exposure:1m,get_guide_output_enabled:1m"
+)
+
+# disables polling
+POLL_OFF = "off"
+
+# PHD2 app states in which nothing is happening, "" before the first AppState
+IDLE_STATES = ("", "Stopped")
+
+# most polls are slowed down by while idle, doubling every poll round
+MAX_BACKOFF = 8.0
+
+
+def parse_poll(spec: str) -> dict[str, float]:
+    """
+    Parse polled methods and their intervals.
+
+    Format is a comma separated list of method:interval where interval is
+    seconds (30) or a duration (30s, 5m, 1h). "off" polls nothing.
+    """
+    intervals: dict[str, float] = {}
+    if spec.strip() == POLL_OFF:
+        return intervals
+    for entry in spec.split(","):
+        item = entry.strip()
+        if not item:
+            continue
+        method, _, interval = item.partition(":")
+        method = method.strip()
+        interval = interval.strip()
+        if method not in RPC_REQUESTS:
+            raise ValueError(
+                f"Unknown poll method '{method}', expected one of: {', '.join(RPC_REQUESTS)}"
+            )
+        seconds = parse_duration(interval)
+        if seconds is None:
+            try:
+                seconds = float(interval)
+            except ValueError:
+                raise ValueError(
+                    f"invalid interval for poll method {method}: {interval!r}"
+                ) from None
+        if seconds <= 0:
+            raise ValueError(f"poll method {method}: interval must be positive")
+        intervals[method] = seconds
+    return intervals
+
+
+class BufferedSender:
+    """Collects requests to send them in a single write."""
+
+    def __init__(self) -> None:
+        """Initialize empty buffer."""
+        self.chunks: list[bytes] = []
+
+    def sendall(self, data: bytes, /) -> None:
+        """Buffer data."""
+        self.chunks.append(data)
+
+    def flush(self, s: Sender) -> None:
+        """Send everything buffered in one write."""
+        if self.chunks:
+            s.sendall(b"".join(self.chunks))
+            self.chunks.clear()
+
+
+class Poller:
+    """Requests JSONRPC methods when their interval is due."""
+
+    def __init__(self, intervals: dict[str, float]) -> None:
+        """Initialize poller with seconds between polls for each method."""
+        self.intervals = intervals
+        # monotonic time each method is polled next, first poll is immediate
+        self.due: dict[str, float] = {}
+        # multiplier for intervals, grows while PHD2 is idle
+        self.backoff = 1.0
+
+    def poll(self, s: Sender, state: PHD2State, now: float) -> list[str]:
+        """Send requests for the methods due at monotonic time now, returns them."""
+        idle = state.phd_state in IDLE_STATES
+        if not idle and self.backoff > 1:
+            # PHD2 is busy again, do not wait out the backed off intervals
+            self.backoff = 1.0
+            for method, interval in self.intervals.items():
+                self.due[method] = min(self.due.get(method, now), now + interval)
+
+        due = [method for method in self.intervals if self.due.get(method, now) <= now]
+        if not due:
+            return due
+
+        batch = BufferedSender()
+        for method in due:
+            # methods still waiting for an answer are not sent again
+            RPC_REQUESTS[method](batch)
+            self.due[method] = now + self.intervals[method] * self.backoff
+        batch.flush(s)
+
+        if idle:
+            self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+        return due
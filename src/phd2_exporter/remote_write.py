@@ -0,0 +1,441 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Push of metric samples to a Prometheus remote-write endpoint.
+
+Every metric update is also recorded as a sample, so no frame is lost
+between scrapes and the exporter does not need to be reachable from
+Prometheus. Samples are timestamped with the local clock when recorded,
+PHD2 event times would mix clocks within a series when PHD2 runs on
+another host, and the receiver drops samples that go back in time.
+A background thread sends the samples collected every interval as one
+snappy compressed protobuf WriteRequest. Requests that cannot be sent
+because the endpoint is unreachable or failing are kept in a spool
+directory and sent, oldest first, once it is back.
+
+The protobuf messages are few and simple, they are encoded by hand.
+python-snappy is used for compression when installed (the snappy extra),
+otherwise a pure Python encoder producing the same format.
+"""
+
+import struct
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+# seconds between requests
+DEFAULT_INTERVAL = 10.0
+
+# samples waiting to be sent before new ones are dropped
+DEFAULT_MAX_SAMPLES = 100_000
+
+# spooled requests are dropped, oldest first, beyond this many bytes
+DEFAULT_SPOOL_BYTES = 100 * 1024 * 1024
+
+# seconds to wait for the endpoint to answer
+DEFAULT_TIMEOUT = 10.0
+
+SPOOL_SUFFIX = ".snappy"
+
+HEADERS = {
+    "Content-Encoding": "snappy",
+    "Content-Type": "application/x-protobuf",
+    "User-Agent": "phd2-exporter",
+    "X-Prometheus-Remote-Write-Version": "0.1.0",
+}
+
+# HTTP statuses worth retrying, other errors mean the request itself is bad
+RETRY_STATUS = 429
+SERVER_ERROR = 500
+
+# varint bytes carry 7 bits, the high bit is set on all but the last byte
+VARINT_BITS = 0x7F
+VARINT_MORE = 0x80
+
+# protobuf wire types
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_BYTES = 2
+
+# snappy copies reach back at most this far with a 2 byte offset
+SNAPPY_MAX_OFFSET = 65535
+SNAPPY_MAX_COPY = 64
+SNAPPY_MAX_LITERAL = 65536
+SNAPPY_MIN_MATCH = 4
+
+# (name, labels) of a series and its samples by millisecond timestamp
+SeriesKey = tuple[str, tuple[tuple[str, str], ...]]
+Series = dict[SeriesKey, dict[int, float]]
+
+DOUBLE = struct.Struct("<d")
+
+
+def encode_varint(value: int) -> bytes:
+    """Encode a non-negative int as a protobuf varint."""
+    out = bytearray()
+    while value > VARINT_BITS:
+        out.append((value & VARINT_BITS) | VARINT_MORE)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def decode_varint(data: bytes, pos: int) -> tuple[int, int]:
+    """Decode a varint at pos, returns the value and the position after it."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & VARINT_BITS) << shift
+        if byte < VARINT_MORE:
+            return value, pos
+        shift += 7
+
+
+def encode_bytes_field(number: int, payload: bytes) -> bytes:
+    """Encode a length delimited field, strings and embedded messages."""
+    return (
+        encode_varint(number << 3 | WIRE_BYTES) + encode_varint(len(payload)) + payload
+    )
+
+
+def encode_sample(value: float, timestamp_ms: int) -> bytes:
+    """Encode a Sample message: double value = 1, int64 timestamp = 2."""
+    # int64 varints are two's complement, timestamps are never negative
+    return (
+        bytes((1 << 3 | WIRE_FIXED64,))
+        + DOUBLE.pack(value)
+        + encode_varint(2 << 3 | WIRE_VARINT)
+        + encode_varint(timestamp_ms)
+    )
+
+
+def encode_write_request(series: Series) -> bytes:
+    """Encode a WriteRequest with one TimeSeries per series, samples in time order."""
+    out = bytearray()
+    for (name, labels), samples in series.items():
+        message = bytearray()
+        # labels must be sorted by name, uppercase names sort before __name__
+        for label, value in sorted((("__name__", name), *labels)):
+            message += encode_bytes_field(
+                1,
+                encode_bytes_field(1, label.encode("utf-8"))
+                + encode_bytes_field(2, value.encode("utf-8")),
+            )
+        for timestamp_ms in sorted(samples):
+            message += encode_bytes_field(
+                2, encode_sample(samples[timestamp_ms], timestamp_ms)
+            )
+        out += encode_bytes_field(1, bytes(message))
+    return bytes(out)
+
+
+def iter_fields(data: bytes) -> Iterator[tuple[int, Any]]:
+    """Iterate the (number, value) fields of a protobuf message."""
+    pos = 0
+    while pos < len(data):
+        key, pos = decode_varint(data, pos)
+        number, wire_type = key >> 3, key & 7
+        value: Any
+        if wire_type == WIRE_VARINT:
+            value, pos = decode_varint(data, pos)
+        elif wire_type == WIRE_FIXED64:
+            value = data[pos : pos + 8]
+            pos += 8
+        elif wire_type == WIRE_BYTES:
+            size, pos = decode_varint(data, pos)
+            value = data[pos : pos + size]
+            pos += size
+        else:
+            raise ValueError(f"unsupported protobuf wire type {wire_type}")
+        yield number, value
+
+
+def decode_write_request(
+    data: bytes,
+) -> list[tuple[dict[str, str], list[tuple[int, float]]]]:
+    """Decode a WriteRequest to the labels and (timestamp ms, value) of each series."""
+    result = []
+    for number, message in iter_fields(data):
+        if number != 1:
+            continue
+        labels: dict[str, str] = {}
+        samples: list[tuple[int, float]] = []
+        for field, value in iter_fields(message):
+            if field == 1:
+                label = dict(iter_fields(value))
+                labels[label[1].decode("utf-8")] = label[2].decode("utf-8")
+            elif field == 2:  # noqa: PLR2004
+                sample = dict(iter_fields(value))
+                samples.append((sample.get(2, 0), DOUBLE.unpack(sample[1])[0]))
+        result.append((labels, samples))
+    return result
+
+
+def _snappy_literal(out: bytearray, literal: bytes) -> None:
+    """Append literal bytes as snappy literal elements."""
+    for start in range(0, len(literal), SNAPPY_MAX_LITERAL):
+        chunk = literal[start : start + SNAPPY_MAX_LITERAL]
+        size = len(chunk) - 1
+        if size < 60:  # noqa: PLR2004
+            out.append(size << 2)
+        elif size < 256:  # noqa: PLR2004
+            out += bytes((60 << 2, size))
+        else:
+            out.append(61 << 2)
+            out += size.to_bytes(2, "little")
+        out += chunk
+
+
+def snappy_compress(data: bytes) -> bytes:
+    """Compress to the snappy block format, matching 4 byte sequences greedily."""
+    out = bytearray(encode_varint(len(data)))
+    # last position of each 4 byte sequence
+    table: dict[bytes, int] = {}
+    literal_start = pos = 0
+    end = len(data)
+    while pos + SNAPPY_MIN_MATCH <= end:
+        key = data[pos : pos + SNAPPY_MIN_MATCH]
+        candidate = table.get(key)
+        table[key] = pos
+        if candidate is None or pos - candidate > SNAPPY_MAX_OFFSET:
+            pos += 1
+            continue
+        length = SNAPPY_MIN_MATCH
+        while (
+            length < SNAPPY_MAX_COPY
+            and pos + length < end
+            and data[candidate + length] == data[pos + length]
+        ):
+            length += 1
+        _snappy_literal(out, data[literal_start:pos])
+        # copy with a 2 byte offset
+        out.append((length - 1) << 2 | 2)
+        out += (pos - candidate).to_bytes(2, "little")
+        pos += length
+        literal_start = pos
+    _snappy_literal(out, data[literal_start:])
+    return bytes(out)
+
+
+def snappy_decompress(data: bytes) -> bytes:
+    """Decompress the snappy block format."""
+    size, pos = decode_varint(data, 0)
+    out = bytearray()
+    while pos < len(data):
+        tag = data[pos]
+        pos += 1
+        element = tag & 3
+        if element == 0:
+            length = tag >> 2
+            if length >= 60:  # noqa: PLR2004
+                extra = length - 59
+                length = int.from_bytes(data[pos : pos + extra], "little")
+                pos += extra
+            out += data[pos : pos + length + 1]
+            pos += length + 1
+            continue
+        if element == 1:
+            length = (tag >> 2 & 7) + 4
+            offset = (tag >> 5) << 8 | data[pos]
+            pos += 1
+        elif element == 2:  # noqa: PLR2004
+            length = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos : pos + 2], "little")
+            pos += 2
+        else:
+            length = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos : pos + 4], "little")
+            pos += 4
+        if not 0 < offset <= len(out):
+            raise ValueError("invalid snappy copy offset")
+        # copies may overlap what they produce
+        for _ in range(length):
+            out.append(out[-offset])
+    if len(out) != size:
+        raise ValueError("snappy data does not match its length")
+    return bytes(out)
+
+
+def get_compressor() -> Callable[[bytes], bytes]:
+    """Get python-snappy's compress if installed, else the pure Python encoder."""
+    try:
+        import snappy  # noqa: PLC0415
+    except ImportError:
+        return snappy_compress
+    compress: Callable[[bytes], bytes] = snappy.compress
+    return compress
+
+
+class RemoteWriter:
+    """Collects samples of all PHD2 instances and sends them in the background."""
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        spool_dir: Path | None = None,
+        interval: float = DEFAULT_INTERVAL,
+        max_samples: int = DEFAULT_MAX_SAMPLES,
+        max_spool_bytes: int = DEFAULT_SPOOL_BYTES,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> None:
+        """Initialize writer for url, failed requests are kept in spool_dir if set."""
+        self.url = url
+        self.spool_dir = spool_dir
+        self.interval = interval
+        self.max_samples = max_samples
+        self.max_spool_bytes = max_spool_bytes
+        self.timeout = timeout
+        self.compress = get_compressor()
+        # (name, labels, value, timestamp ms) waiting to be sent
+        self.samples: list[tuple[str, dict[str, Any], float, int]] = []
+        self.lock = threading.Lock()
+        # counter values, metrics_utility only increments
+        self.counts: dict[tuple[str, tuple[tuple[str, Any], ...]], int] = {}
+        # samples dropped because too many were waiting
+        self.dropped = 0
+        # requests sent, and not sent because the endpoint rejected them
+        self.sent = 0
+        self.rejected = 0
+        self.failing = False
+        self._spool_seq = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start the sender thread."""
+        if self.spool_dir is not None:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(
+            target=self._run, name="remote-write", daemon=True
+        )
+        self._thread.start()
+
+    def set(
+        self,
+        name: str,
+        value: Any,
+        labels: dict[str, Any],
+        timestamp: float | None = None,
+    ) -> None:
+        """Record a gauge sample, at timestamp or now."""
+        if timestamp is None:
+            timestamp = time.time()
+        with self.lock:
+            if len(self.samples) >= self.max_samples:
+                self.dropped += 1
+                return
+            self.samples.append((name, labels, float(value), int(timestamp * 1000)))
+
+    def inc(
+        self, name: str, labels: dict[str, Any], timestamp: float | None = None
+    ) -> None:
+        """Record the new value of a counter, named <name>_total like when scraped."""
+        key = (name, tuple(labels.items()))
+        count = self.counts[key] = self.counts.get(key, 0) + 1
+        self.set(f"{name}_total", count, labels, timestamp)
+
+    def take(self) -> Series:
+        """Take the samples recorded so far, grouped by series."""
+        with self.lock:
+            samples, self.samples = self.samples, []
+        series: Series = {}
+        for name, labels, value, timestamp_ms in samples:
+            key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+            # a later value at the same time replaces the earlier one
+            series.setdefault(key, {})[timestamp_ms] = value
+        return series
+
+    def flush(self) -> None:
+        """Send spooled requests and the samples recorded so far."""
+        series = self.take()
+        payload = self.compress(encode_write_request(series)) if series else None
+        # spooled requests go first, samples of a series must be sent in time order
+        for path in self._spooled():
+            if not self._send(path.read_bytes()):
+                break
+            path.unlink()
+        else:
+            if payload is None or self._send(payload):
+                return
+        if payload is not None:
+            self._spool(payload)
+
+    def close(self) -> None:
+        """Send what is left and stop the thread."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        """Flush every interval until closed."""
+        while not self._stop.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def _send(self, payload: bytes) -> bool:
+        """
+        Post a compressed request, False if it should be sent again later.
+
+        Requests the endpoint rejects as bad are dropped, sending them again
+        would fail the same way.
+        """
+        request = urllib.request.Request(
+            self.url, data=payload, headers=HEADERS, method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except urllib.error.HTTPError as e:
+            if e.code == RETRY_STATUS or e.code >= SERVER_ERROR:
+                self._failed(f"HTTP {e.code}")
+                return False
+            print(f"Remote write rejected by {self.url}: HTTP {e.code} {e.reason}")
+            self.rejected += 1
+            return True
+        except OSError as e:
+            self._failed(str(e))
+            return False
+        if self.failing:
+            print(f"Remote write to {self.url} recovered")
+            self.failing = False
+        self.sent += 1
+        return True
+
+    def _failed(self, reason: str) -> None:
+        """Note a failed request, printed once until requests succeed again."""
+        if not self.failing:
+            print(f"Remote write to {self.url} failed, spooling: {reason}")
+            self.failing = True
+
+    def _spooled(self) -> list[Path]:
+        """Get the spooled requests, oldest first."""
+        if self.spool_dir is None:
+            return []
+        return sorted(self.spool_dir.glob(f"*{SPOOL_SUFFIX}"))
+
+    def _spool(self, payload: bytes) -> None:
+        """Keep a request to send later, dropping the oldest beyond the limit."""
+        if self.spool_dir is None:
+            return
+        self._spool_seq += 1
+        name = f"{time.time_ns():020d}-{self._spool_seq:06d}{SPOOL_SUFFIX}"
+        # renamed once complete, a partial file is never sent
+        partial = self.spool_dir / f"{name}.tmp"
+        partial.write_bytes(payload)
+        partial.rename(self.spool_dir / name)
+
+        spooled = self._spooled()
+        total = sum(path.stat().st_size for path in spooled)
+        # the request just spooled is kept even if it alone is over the limit
+        for path in spooled[:-1]:
+            if total <= self.max_spool_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink()
@@ -0,0 +1,375 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Replay PHD2 guide logs or event captures through the event pipeline.
+
+A capture is a raw recording of the PHD2 event stream (JSON lines), for
+example taken with `nc 127.0.0.1 4400 > capture.txt` or --capture_dir.
+Responses in captures that also recorded the exporter's requests are
+applied as answers to those requests, e.g. the pixel scale. A guide log is the
+PHD2_GuideLog_*.txt file PHD2 writes for every session. Both are read as a
+stream, optionally gzip or zstd compressed, so files of any size can be replayed.
+"""
+
+import argparse
+import csv
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+from .capture import open_capture
+from .decoding import DECODER_AUTO, Decoder, get_decoder
+from .events import handle_event
+from .exposition import start_metrics_server
+from .framing import RECV_BUFSIZE, LineFramer
+from .histogram import publish_histograms
+from .jsonrpc import RPC_CALLBACKS, callback_request_pixel_scale
+from .main import get_guide_error_buckets, get_rms_windows_config
+from .state import PHD2State, get_state, set_state
+
+SPEED_MAX = "max"
+
+# guide log column names that differ from GuideStep event fields
+GUIDE_LOG_COLUMNS = {
+    "mount": "Mount",
+    "RARawDistance": "RADistanceRaw",
+    "DECRawDistance": "DECDistanceRaw",
+    "RAGuideDistance": "RADistanceGuide",
+    "DECGuideDistance": "DECDistanceGuide",
+}
+
+# mount column of a frame without a guide star
+GUIDE_LOG_DROP = "DROP"
+
+GUIDE_LOG_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class NullSender:
+    """Discards JSONRPC requests, nothing answers them during a replay."""
+
+    def sendall(self, data: bytes, /) -> None:
+        """Discard data."""
+
+
+class EventClock:
+    """Clock reading the Timestamp of the last replayed event."""
+
+    def __init__(self) -> None:
+        """Initialize clock, 0 until an event with a Timestamp is replayed."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Get the time of the last replayed event."""
+        return self.now
+
+
+def is_capture(path: Path) -> bool:
+    """Check if a file is an event capture rather than a guide log."""
+    with open_capture(path) as f:
+        return f.read(RECV_BUFSIZE).lstrip().startswith(b"{")
+
+
+def read_capture(path: Path, decode: Decoder) -> Iterator[dict[str, Any]]:
+    """
+    Read events from a capture, one chunk at a time.
+
+    Responses to captured requests are read too, with the method of their
+    request added. Other responses are skipped.
+    """
+    framer = LineFramer()
+    # methods of captured requests waiting for a response, by request ID
+    methods: dict[Any, str] = {}
+    with open_capture(path) as f:
+        while chunk := f.read(RECV_BUFSIZE):
+            for line in framer.feed(chunk):
+                data = decode(line)
+                if "Event" in data:
+                    yield data
+                elif "method" in data and "id" in data:
+                    methods[data["id"]] = data["method"]
+                elif data.get("id") in methods:
+                    yield {**data, "method": methods.pop(data["id"])}
+
+
+def apply_response(data: dict[str, Any]) -> None:
+    """Apply a replayed response as PHD2's answer to its method."""
+    callback = RPC_CALLBACKS.get(data["method"])
+    if callback is not None and "result" in data:
+        callback(data)
+
+
+def parse_value(value: str) -> Any:
+    """Convert a guide log column to a number where possible."""
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def parse_log_time(line: str) -> float:
+    """Get the time from a guide log line ending with a date and time."""
+    return time.mktime(time.strptime(line[-19:], GUIDE_LOG_TIME_FORMAT))
+
+
+class GuideLogReader:
+    """Turns the lines of a PHD2 guide log into PHD2 events."""
+
+    def __init__(self, host: str = "replay", inst: int = 1) -> None:
+        """Initialize reader, events are labelled with host and inst."""
+        self.host = host
+        self.inst = inst
+        # arcsec per pixel from the most recent guiding section header
+        self.pixel_scale: float | None = None
+        self.columns: list[str] = []
+        self.started = 0.0
+        self.timestamp = 0.0
+
+    def event(self, event: str, **fields: Any) -> dict[str, Any]:
+        """Build an event at the current log time."""
+        return {
+            "Event": event,
+            "Timestamp": self.timestamp,
+            "Host": self.host,
+            "Inst": self.inst,
+            **fields,
+        }
+
+    def read(self, lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+        """Read events from guide log lines."""
+        versioned = False
+        for event in self.read_events(lines):
+            if not versioned:
+                # PHD2 greets with Version, which sets the global labels
+                versioned = True
+                yield self.event("Version")
+            yield event
+
+    def read_events(self, lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+        """Read events from guide log lines, without the Version greeting."""
+        for raw in lines:
+            line = raw.strip()
+            if not line:
+                continue
+            if line[0].isdigit() and self.columns:
+                event = self.read_frame(line)
+                if event is not None:
+                    yield event
+            elif line.startswith("Frame,"):
+                self.columns = [
+                    GUIDE_LOG_COLUMNS.get(column, column) for column in line.split(",")
+                ]
+            elif line.startswith("Guiding Begins at"):
+                self.started = self.timestamp = parse_log_time(line)
+                yield self.event("StartGuiding")
+            elif line.startswith("Guiding Ends at"):
+                self.timestamp = parse_log_time(line)
+                self.columns = []
+                yield self.event("LoopingExposuresStopped")
+            elif line.startswith("Calibration Begins at"):
+                self.timestamp = parse_log_time(line)
+                self.columns = []
+                yield self.event("StartCalibration")
+            elif line.startswith("Pixel scale = "):
+                self.pixel_scale = parse_value(line.split()[3])
+            elif line.startswith("INFO: DITHER by"):
+                dx, dy = line[len("INFO: DITHER by") :].split(",")[:2]
+                yield self.event("GuidingDithered", dx=float(dx), dy=float(dy))
+            elif line.startswith("INFO: SETTLING STATE CHANGE"):
+                if "started" in line:
+                    yield self.event("SettleBegin")
+                else:
+                    yield self.event("SettleDone", Status=int("failed" in line))
+
+    def read_frame(self, line: str) -> dict[str, Any] | None:
+        """Turn a guide log row into a GuideStep, or StarLost if no star was found."""
+        row = next(csv.reader([line]))
+        fields = {
+            column: parse_value(value)
+            for column, value in zip(self.columns, row, strict=False)
+            if value != ""
+        }
+        if "Time" not in fields:
+            return None
+        self.timestamp = self.started + fields["Time"]
+        if fields.get("Mount") == GUIDE_LOG_DROP:
+            return self.event(
+                "StarLost",
+                Frame=fields.get("Frame"),
+                StarMass=fields.get("StarMass", 0),
+                SNR=fields.get("SNR", 0),
+                ErrorCode=fields.get("ErrorCode", 0),
+            )
+        return self.event("GuideStep", **fields)
+
+
+def parse_speed(speed: str) -> float | None:
+    """Parse replay speed as a multiple of real time (1, 10, 10x) or max."""
+    if speed == SPEED_MAX:
+        return None
+    value = float(speed.removesuffix("x"))
+    if value <= 0:
+        raise ValueError(f"Invalid replay speed '{speed}'")
+    return value
+
+
+def replay(
+    events: Iterable[dict[str, Any]],
+    speed: float | None,
+    reader: GuideLogReader | None = None,
+    pixel_scale: float | None = None,
+) -> int:
+    """
+    Handle events paced by their timestamps, speed None is as fast as possible.
+
+    Returns the number of events handled. Responses read from a capture are
+    applied as answers to their method. For guide logs the reader's pixel
+    scale is applied as if PHD2 had answered get_pixel_scale. pixel_scale,
+    if given, is used instead of any pixel scale read.
+    """
+    sender = NullSender()
+    state = get_state()
+    # time in state as it was in the session, not as long as the replay took
+    clock = state.clock = EventClock()
+    first: float | None = None
+    start = time.monotonic()
+    applied = None
+    count = 0
+    for data in events:
+        if "Event" not in data:
+            if pixel_scale is None or data["method"] != "get_pixel_scale":
+                apply_response(data)
+            continue
+        timestamp = data.get("Timestamp")
+        if timestamp:
+            clock.now = max(clock.now, timestamp)
+        if speed is not None and timestamp:
+            if first is None:
+                first = timestamp
+            delay = (timestamp - first) / speed - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+        scale = pixel_scale
+        if scale is None and reader is not None:
+            # read from the log before this event
+            scale = reader.pixel_scale
+        if scale is not None and scale != applied:
+            applied = scale
+            callback_request_pixel_scale({"result": scale})
+        handle_event(sender, data)
+        publish_histograms(state, time.time())
+        count += 1
+    # the last changes, usually within HISTOGRAM_INTERVAL
+    publish_histograms(state, time.time(), force=True)
+    return count
+
+
+def replay_file(path: Path, speed: float | None, args: dict) -> int:
+    """Replay a capture or guide log, returns the number of events handled."""
+    pixel_scale = args.get("pixel_scale")
+    if is_capture(path):
+        _, decode = get_decoder(args.get("json_decoder") or DECODER_AUTO)
+        return replay(read_capture(path, decode), speed, pixel_scale=pixel_scale)
+
+    reader = GuideLogReader(args.get("host") or "replay", args.get("inst") or 1)
+    with open_capture(path) as f:
+        lines = (line.decode("utf-8", "replace") for line in f)
+        return replay(reader.read(lines), speed, reader, pixel_scale)
+
+
+def parse_args() -> dict:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Replay a PHD2 guide log or event capture as prometheus metrics."
+    )
+    parser.add_argument("file", type=Path, help="guide log or capture, may be .gz")
+    parser.add_argument(
+        "--speed",
+        type=str,
+        default="1",
+        help="multiple of real time (1, 10, 100x) or max, default: 1",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="export metrics on this port and keep serving after the replay, default: not served",
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="replay",
+        help="host label for guide logs, captures keep their own, default: replay",
+    )
+    parser.add_argument(
+        "--inst", type=int, default=1, help="inst label for guide logs, default: 1"
+    )
+    parser.add_argument(
+        "--rms_samples",
+        type=int,
+        default=10,
+        help="number of samples used to calculate RMS, default: 10",
+    )
+    parser.add_argument(
+        "--rms_windows",
+        type=str,
+        help="RMS windows, see phd2-exporter --help, default: live:<rms_samples>,5m:5m,session",
+    )
+    parser.add_argument(
+        "--pixel_scale",
+        type=float,
+        help="arcsec per px, for captures without get_pixel_scale responses, default: from the file",
+    )
+    parser.add_argument(
+        "--json_decoder",
+        type=str,
+        default=DECODER_AUTO,
+        help="JSON decoder for captures, default: auto",
+    )
+    parser.add_argument(
+        "--guide_error_buckets_px",
+        type=str,
+        help="guide error histogram buckets in px, see phd2-exporter --help",
+    )
+    parser.add_argument(
+        "--guide_error_buckets_arcsec",
+        type=str,
+        help="guide error histogram buckets in arcsec, see phd2-exporter --help",
+    )
+    return vars(parser.parse_args())
+
+
+def main() -> int:
+    """Main entry point."""
+    args = parse_args()
+    speed = parse_speed(args["speed"])
+    path: Path = args["file"]
+
+    state = PHD2State()
+    state.phd_rms_samples = args["rms_samples"]
+    state.phd_rms_windows = get_rms_windows_config(args, args["rms_samples"])
+    state.guide_error_buckets = get_guide_error_buckets(args)
+    set_state(state)
+
+    if args.get("port"):
+        start_metrics_server(args["port"])
+
+    start = time.perf_counter()
+    count = replay_file(path, speed, args)
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {count} events in {elapsed:.2f}s ({count / elapsed:,.0f}/sec)")
+
+    if args.get("port"):
+        print(f"Serving metrics on port {args['port']}, Ctrl-C to exit")
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
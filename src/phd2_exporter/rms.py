@@ -1,18 +1,23 @@
 # Generated-by: Cursor (Claude Sonnet 4.5)
 """RMS calculation for PHD2 guide data."""
 
-import math
+import time
 from typing import Any
 
+from .rmsstore import RmsStore, RmsWindow
 from .state import get_state
-from .utils import utility_set
+from .utils import get_metric_handle
 
 # Constants for metric names and label keys
 METRIC_PHD2_RMS = "phd2_rms"
 
+LABEL_WINDOW = "window"
 LABEL_SOURCE = "source"
 LABEL_SCALE = "scale"
 
+# name of the frame based window sized by --rms_samples
+WINDOW_LIVE = "live"
+
 SCALE_PX = "px"
 SCALE_ARCSEC = "arcsec"
 
@@ -28,67 +33,80 @@ KEY_TOTAL_GUIDE = "TotalDistanceGuide"
 # Constant keys used for RMS collection from GuideStep events
 RMS_KEYS = [KEY_DEC_RAW, KEY_DEC_GUIDE, KEY_RA_RAW, KEY_RA_GUIDE]
 
+# Keys derived from the collected keys
+TOTAL_KEYS = [KEY_TOTAL_RAW, KEY_TOTAL_GUIDE]
+
+
+def get_rms_windows() -> list[RmsWindow]:
+    """Get configured RMS windows, a single window of phd_rms_samples by default."""
+    state = get_state()
+    if state.phd_rms_windows:
+        return state.phd_rms_windows
+    return [RmsWindow(WINDOW_LIVE, samples=state.phd_rms_samples)]
+
 
 def collect_rms_data(data: dict[str, Any]) -> bool:
     """
     Collect RMS data from guide step.
 
-    Returns True if enough data is available to calculate RMS.
+    Returns True if enough data is available to calculate RMS for any window.
     """
     state = get_state()
-    calculate_rms = True
 
     for key in RMS_KEYS:
         if key not in data:
-            calculate_rms = False
-            continue
-        if key not in state.phd_rms_data:
-            state.phd_rms_data[key] = []
-        if len(state.phd_rms_data[key]) >= state.phd_rms_samples:
-            state.phd_rms_data[key].pop(0)
-        else:
-            calculate_rms = False
-        state.phd_rms_data[key].append(data[key])
+            return False
+
+    if state.phd_rms_data is None:
+        # allocate the shared sample store once per guiding session
+        state.phd_rms_data = RmsStore(RMS_KEYS + TOTAL_KEYS, get_rms_windows())
+    store = state.phd_rms_data
 
-    return calculate_rms
+    dec_raw = data[KEY_DEC_RAW] ** 2
+    dec_guide = data[KEY_DEC_GUIDE] ** 2
+    ra_raw = data[KEY_RA_RAW] ** 2
+    ra_guide = data[KEY_RA_GUIDE] ** 2
+    # "total" is the hypotenuse of each DEC/RA {Raw, Guide} tuple, its square is the sum
+    store.append(
+        data.get("Timestamp") or time.time(),
+        [dec_raw, dec_guide, ra_raw, ra_guide, dec_raw + ra_raw, dec_guide + ra_guide],
+    )
+
+    return any(store.is_ready(i) for i in range(len(store.windows)))
 
 
 def calculate_and_export_rms() -> None:
-    """Calculate and export RMS metrics."""
+    """Calculate and export RMS metrics for every window with enough data."""
     state = get_state()
+    store = state.phd_rms_data
+    if store is None:
+        return
 
-    # fabricate data for "total" as hypotenuse of each DEC/RA {Raw, Guide} tuple
-    state.phd_rms_data[KEY_TOTAL_RAW] = []
-    state.phd_rms_data[KEY_TOTAL_GUIDE] = []
-    for i in range(state.phd_rms_samples):
-        state.phd_rms_data[KEY_TOTAL_RAW].append(
-            math.sqrt(
-                math.pow(state.phd_rms_data[KEY_DEC_RAW][i], 2)
-                + math.pow(state.phd_rms_data[KEY_RA_RAW][i], 2)
-            )
-        )
-        state.phd_rms_data[KEY_TOTAL_GUIDE].append(
-            math.sqrt(
-                math.pow(state.phd_rms_data[KEY_DEC_GUIDE][i], 2)
-                + math.pow(state.phd_rms_data[KEY_RA_GUIDE][i], 2)
-            )
-        )
-
-    # do the math for RMS and export metrics
-    for key in state.phd_rms_data:
-        rms_sum_of_squares = 0.0
-        # do the sum of squares bit
-        for value in state.phd_rms_data[key]:
-            rms_sum_of_squares += math.pow(value, 2)
-        # then divide and sqrt
-        rms_px = math.sqrt(rms_sum_of_squares / state.phd_rms_samples)
-        utility_set(METRIC_PHD2_RMS, rms_px, {LABEL_SOURCE: key, LABEL_SCALE: SCALE_PX})
-
-        # calculate for arcsec if we have pixel scale
-        if state.pixel_scale > 0:
-            rms_arcsec = rms_px * state.pixel_scale
-            utility_set(
+    # sums of squares are maintained by the store, only divide and sqrt here
+    for i, window in enumerate(store.windows):
+        if not store.is_ready(i):
+            continue
+        for key, rms_px in store.rms(i).items():
+            # global labels keep RMS of multiple PHD2 instances apart
+            get_metric_handle(
+                state,
                 METRIC_PHD2_RMS,
-                rms_arcsec,
-                {LABEL_SOURCE: key, LABEL_SCALE: SCALE_ARCSEC},
-            )
+                (
+                    (LABEL_WINDOW, window.name),
+                    (LABEL_SOURCE, key),
+                    (LABEL_SCALE, SCALE_PX),
+                ),
+            ).set(rms_px)
+
+            # calculate for arcsec if we have pixel scale
+            if state.pixel_scale > 0:
+                rms_arcsec = rms_px * state.pixel_scale
+                get_metric_handle(
+                    state,
+                    METRIC_PHD2_RMS,
+                    (
+                        (LABEL_WINDOW, window.name),
+                        (LABEL_SOURCE, key),
+                        (LABEL_SCALE, SCALE_ARCSEC),
+                    ),
+                ).set(rms_arcsec)
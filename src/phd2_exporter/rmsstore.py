@@ -0,0 +1,245 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Shared sample store feeding multiple RMS windows."""
+
+import math
+import re
+from array import array
+from dataclasses import dataclass
+
+# fastest guide frames time based windows are sized for, frames per second
+MAX_FRAME_RATE = 10.0
+
+# largest windows accepted, 10 hours at MAX_FRAME_RATE is about 20 MB of samples
+MAX_WINDOW_SECONDS = 36000.0
+MAX_WINDOW_SAMPLES = 360000
+
+# name of the window type without a size, covering the whole guiding session
+SESSION = "session"
+
+DURATION_UNITS = {"s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(text: str) -> float | None:
+    """Parse a duration such as 300s, 5m or 1h to seconds, None if not a duration."""
+    duration = re.fullmatch(r"(\d+(?:\.\d+)?)([smh])", text)
+    if duration is None:
+        return None
+    return float(duration.group(1)) * DURATION_UNITS[duration.group(2)]
+
+
+@dataclass(frozen=True)
+class RmsWindow:
+    """
+    Definition of an RMS window.
+
+    A window covers the last `samples` frames, the frames of the last
+    `seconds` seconds, or the whole session if neither is set.
+    """
+
+    name: str
+    samples: int | None = None
+    seconds: float | None = None
+
+    def __post_init__(self) -> None:
+        """Validate window size."""
+        if self.samples is not None and self.samples < 1:
+            raise ValueError(f"RMS window {self.name}: samples must be positive")
+        if self.seconds is not None and self.seconds <= 0:
+            raise ValueError(f"RMS window {self.name}: seconds must be positive")
+        if self.samples is not None and self.samples > MAX_WINDOW_SAMPLES:
+            raise ValueError(
+                f"RMS window {self.name}: more than {MAX_WINDOW_SAMPLES} samples"
+            )
+        if self.seconds is not None and self.seconds > MAX_WINDOW_SECONDS:
+            raise ValueError(
+                f"RMS window {self.name}: more than {MAX_WINDOW_SECONDS:g} seconds"
+            )
+
+    def is_session(self) -> bool:
+        """True if the window covers the whole session."""
+        return self.samples is None and self.seconds is None
+
+    def capacity(self) -> int:
+        """Samples the store needs for the window, time at MAX_FRAME_RATE."""
+        if self.samples is not None:
+            return self.samples
+        if self.seconds is not None:
+            # frames at both ends of the window are in it
+            return math.ceil(self.seconds * MAX_FRAME_RATE) + 1
+        return 0
+
+
+def parse_rms_windows(spec: str) -> list[RmsWindow]:
+    """
+    Parse RMS window definitions.
+
+    Format is a comma separated list of name:size where size is a number of
+    frames (10), a duration (300s, 5m, 1h) or "session". A bare "session"
+    defines the session window.
+    """
+    windows = []
+    for entry in spec.split(","):
+        item = entry.strip()
+        if not item:
+            continue
+        name, _, size = item.partition(":")
+        name = name.strip()
+        size = size.strip() or name
+        if not name:
+            raise ValueError(f"RMS window without a name: {item!r}")
+
+        seconds = parse_duration(size)
+        if size == SESSION:
+            windows.append(RmsWindow(name))
+        elif size.isdigit():
+            windows.append(RmsWindow(name, samples=int(size)))
+        elif seconds is not None:
+            windows.append(RmsWindow(name, seconds=seconds))
+        else:
+            raise ValueError(f"invalid size for RMS window {name}: {size!r}")
+
+    if len({window.name for window in windows}) != len(windows):
+        raise ValueError(f"duplicate RMS window names in {spec!r}")
+    return windows
+
+
+class _WindowSums:
+    """Running sums of squares for one window over the shared store."""
+
+    def __init__(self, window: RmsWindow, columns: int) -> None:
+        self.window = window
+        self.sums = [0.0] * columns
+        self.count = 0
+        # sequence number of the oldest sample in the window
+        self.start = 0
+
+
+class RmsStore:
+    """
+    Store of squared RMS samples shared by several windows.
+
+    Every sample is squared and stored once in a fixed-capacity ring of
+    arrays, one column per key. Each window only keeps running sums of
+    squares and the position of its oldest sample in the ring, so adding a
+    window costs a few additions per sample and no extra sample storage.
+    The capacity fits the largest frame window and the longest time window
+    at MAX_FRAME_RATE, time windows only lose samples to frames faster than
+    that. The session window never evicts and needs no storage at all.
+
+    Sums of windows that evict are recomputed from the store once every
+    `capacity` samples to bound floating point drift.
+    """
+
+    def __init__(
+        self, keys: list[str], windows: list[RmsWindow], capacity: int | None = None
+    ) -> None:
+        """Initialize an empty store for the given keys and windows."""
+        if capacity is None:
+            capacity = max([1] + [window.capacity() for window in windows])
+        self.keys = keys
+        self.windows = windows
+        self.capacity = capacity
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._columns = [array("d", bytes(8 * capacity)) for _ in keys]
+        self._sums = [_WindowSums(window, len(keys)) for window in windows]
+        # sequence number of the next sample
+        self._seq = 0
+        self._updates = 0
+
+    def __len__(self) -> int:
+        """Number of samples appended since the store was created or cleared."""
+        return self._seq
+
+    def append(self, timestamp: float, squares: list[float]) -> None:
+        """Add the squared values of one sample, in key order."""
+        seq = self._seq
+        index = seq % self.capacity
+        # oldest sample still in the store once this one is written
+        oldest = seq + 1 - self.capacity
+
+        for ws in self._sums:
+            if ws.window.is_session():
+                continue
+            # the slot is about to be overwritten, drop it from windows still using it
+            while ws.count and ws.start < oldest:
+                self._evict(ws)
+
+        self._timestamps[index] = timestamp
+        for column, square in zip(self._columns, squares, strict=True):
+            column[index] = square
+
+        for ws in self._sums:
+            sums = ws.sums
+            for i, square in enumerate(squares):
+                sums[i] += square
+            if ws.count == 0:
+                ws.start = seq
+            ws.count += 1
+
+            window = ws.window
+            if window.samples is not None:
+                while ws.count > window.samples:
+                    self._evict(ws)
+            if window.seconds is not None:
+                cutoff = timestamp - window.seconds
+                while (
+                    ws.count > 1 and self._timestamps[ws.start % self.capacity] < cutoff
+                ):
+                    self._evict(ws)
+
+        self._seq = seq + 1
+        self._updates += 1
+        if self._updates >= self.capacity:
+            self.resum()
+
+    def _evict(self, ws: _WindowSums) -> None:
+        """Remove the oldest sample from a window."""
+        index = ws.start % self.capacity
+        sums = ws.sums
+        for i, column in enumerate(self._columns):
+            sums[i] -= column[index]
+        ws.start += 1
+        ws.count -= 1
+
+    def resum(self) -> None:
+        """Recompute running sums of evicting windows from the stored samples."""
+        for ws in self._sums:
+            if ws.window.is_session():
+                continue
+            indexes = [(ws.start + n) % self.capacity for n in range(ws.count)]
+            ws.sums = [
+                math.fsum(column[i] for i in indexes) for column in self._columns
+            ]
+        self._updates = 0
+
+    def is_ready(self, window_index: int) -> bool:
+        """True if the window has enough samples to report an RMS."""
+        ws = self._sums[window_index]
+        if ws.window.samples is not None:
+            # frame based windows report once full, as the single window always has
+            return ws.count >= ws.window.samples
+        return ws.count > 0
+
+    def count(self, window_index: int) -> int:
+        """Number of samples in a window."""
+        return self._sums[window_index].count
+
+    def rms(self, window_index: int) -> dict[str, float]:
+        """RMS of every key over a window, 0 if the window is empty."""
+        ws = self._sums[window_index]
+        if ws.count == 0:
+            return dict.fromkeys(self.keys, 0.0)
+        # clamp tiny negative results of float error on an all-zero window
+        return {
+            key: math.sqrt(max(total, 0.0) / ws.count)
+            for key, total in zip(self.keys, ws.sums, strict=True)
+        }
+
+    def clear(self) -> None:
+        """Remove all samples from the store and all windows."""
+        for ws in self._sums:
+            ws.sums = [0.0] * len(self.keys)
+            ws.count = 0
+            ws.start = 0
+        self._seq = 0
+        self._updates = 0
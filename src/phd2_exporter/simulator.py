@@ -0,0 +1,364 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Simulated PHD2 event server for load and integration testing.
+
+Speaks the PHD2 event monitoring protocol: a Version and AppState greeting,
+a stream of GuideStep events at a configurable rate with periodic dither and
+settle cycles, and replies to the JSONRPC requests made by the exporter.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from .framing import RECV_BUFSIZE, LineFramer
+
+# seconds between writes, events due in a tick are sent in one write
+TICK = 0.01
+
+# seconds requests are still answered after a session ends
+LINGER = 0.1
+
+PHD_VERSION = "2.6.13"
+
+EQUIPMENT = {
+    "camera": {"name": "Simulator", "connected": True},
+    "mount": {"name": "On-camera", "connected": True},
+}
+
+EXPOSURE_MS = 2000
+
+# JSON-RPC error code for unknown methods
+METHOD_NOT_FOUND = -32601
+
+
+@dataclass
+class SimulatorConfig:
+    """Simulated PHD2 instance settings."""
+
+    host: str = "127.0.0.1"
+    port: int = 4400
+    # reported in Version and AppState, becomes the exporter's host label
+    name: str = "simulator"
+    inst: int = 1
+    # GuideStep events per second
+    rate: float = 1.0
+    # GuideSteps per connection, None streams forever
+    frames: int | None = None
+    # GuideSteps between dithers, 0 never dithers
+    dither_every: int = 50
+    # GuideSteps spent settling after a dither
+    settle_frames: int = 5
+    pixel_scale: float = 1.5
+    seed: int | None = None
+
+
+def make_event(config: SimulatorConfig, event: str, **fields: Any) -> dict[str, Any]:
+    """Build an event with the common PHD2 fields."""
+    return {
+        "Event": event,
+        "Timestamp": time.time(),
+        "Host": config.name,
+        "Inst": config.inst,
+        **fields,
+    }
+
+
+def guide_step(
+    config: SimulatorConfig, frame: int, rng: random.Random
+) -> dict[str, Any]:
+    """Build a GuideStep event with random guide errors."""
+    ra = rng.gauss(0.0, 0.4)
+    dec = rng.gauss(0.0, 0.3)
+    return make_event(
+        config,
+        "GuideStep",
+        Frame=frame,
+        Time=frame * 2.0,
+        Mount="On-camera",
+        dx=rng.gauss(0.0, 0.4),
+        dy=rng.gauss(0.0, 0.4),
+        RADistanceRaw=ra,
+        DECDistanceRaw=dec,
+        RADistanceGuide=ra * 0.7,
+        DECDistanceGuide=dec * 0.7,
+        RADuration=int(abs(ra) * 300),
+        RADirection="West" if ra < 0 else "East",
+        DECDuration=int(abs(dec) * 300),
+        DECDirection="North" if dec < 0 else "South",
+        StarMass=rng.randint(20000, 30000),
+        SNR=rng.uniform(30.0, 60.0),
+        HFD=rng.uniform(2.0, 3.0),
+        AvgDist=abs(ra) + abs(dec),
+    )
+
+
+def greeting(config: SimulatorConfig) -> list[dict[str, Any]]:
+    """Events PHD2 sends when a client connects."""
+    return [
+        make_event(
+            config, "Version", PHDVersion=PHD_VERSION, PHDSubver="", MsgVersion=1
+        ),
+        make_event(config, "AppState", State="Guiding"),
+    ]
+
+
+def session_events(
+    config: SimulatorConfig, rng: random.Random
+) -> Iterator[dict[str, Any]]:
+    """
+    Events for a guiding session, one GuideStep per frame.
+
+    Every dither_every frames a dither is made and the following
+    settle_frames GuideSteps are interleaved with Settling events.
+    """
+    frame = 0
+    settling = 0
+    while config.frames is None or frame < config.frames:
+        frame += 1
+        if config.dither_every and frame % config.dither_every == 0:
+            yield make_event(config, "GuidingDithered", dx=2.0, dy=-1.5)
+            yield make_event(config, "SettleBegin")
+            settling = config.settle_frames
+        yield guide_step(config, frame, rng)
+        if settling:
+            settling -= 1
+            yield make_event(
+                config,
+                "Settling",
+                Distance=rng.uniform(0.1, 1.0),
+                Time=float(config.settle_frames - settling),
+                SettleTime=10.0,
+                StarLocked=True,
+            )
+            if not settling:
+                yield make_event(
+                    config,
+                    "SettleDone",
+                    Status=0,
+                    TotalFrames=config.settle_frames,
+                    DroppedFrames=0,
+                )
+
+
+def encode(event: dict[str, Any]) -> bytes:
+    """Encode an event or response as a PHD2 line."""
+    return json.dumps(event).encode("utf-8") + b"\r\n"
+
+
+def rpc_response(config: SimulatorConfig, request: dict[str, Any]) -> dict[str, Any]:
+    """Build the response to a JSONRPC request."""
+    method = request.get("method")
+    response: dict[str, Any] = {"jsonrpc": "2.0", "id": request.get("id")}
+    if method == "get_pixel_scale":
+        response["result"] = config.pixel_scale
+    elif method == "get_connected":
+        response["result"] = True
+    elif method == "get_current_equipment":
+        response["result"] = EQUIPMENT
+    elif method == "get_exposure":
+        response["result"] = EXPOSURE_MS
+    elif method == "get_guide_output_enabled":
+        response["result"] = True
+    elif method == "get_settling":
+        response["result"] = False
+    else:
+        response["error"] = {"code": METHOD_NOT_FOUND, "message": "method not found"}
+    return response
+
+
+class Simulator:
+    """Serves simulated PHD2 sessions, one per connected client."""
+
+    def __init__(self, config: SimulatorConfig) -> None:
+        """Initialize simulator, call start() to listen."""
+        self.config = config
+        self.server: asyncio.Server | None = None
+        # GuideSteps and other events sent over all connections
+        self.events_sent = 0
+        self.requests_answered = 0
+
+    @property
+    def port(self) -> int:
+        """Port the simulator listens on, useful when started on port 0."""
+        if self.server is None:
+            return self.config.port
+        port: int = self.server.sockets[0].getsockname()[1]
+        return port
+
+    async def start(self) -> None:
+        """Start listening for clients."""
+        self.server = await asyncio.start_server(
+            self.handle_client, self.config.host, self.config.port
+        )
+
+    async def close(self) -> None:
+        """Stop listening."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Stream a session to a client and answer its requests."""
+        responder = asyncio.create_task(self.answer_requests(reader, writer))
+        try:
+            await self.stream_events(writer)
+            # let requests made in response to the last events be answered
+            await writer.drain()
+            await asyncio.sleep(LINGER)
+        except ConnectionError:
+            pass
+        finally:
+            responder.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await responder
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def stream_events(self, writer: asyncio.StreamWriter) -> None:
+        """Write session events, paced by the GuideStep rate."""
+        config = self.config
+        rng = random.Random(config.seed)
+        for event in greeting(config):
+            writer.write(encode(event))
+            self.events_sent += 1
+
+        start = last_write = time.monotonic()
+        frames = 0
+        batch: list[bytes] = []
+        for event in session_events(config, rng):
+            if event["Event"] == "GuideStep":
+                # GuideStep n is due (n - 1) / rate seconds after the start
+                due = start + frames / config.rate
+                now = time.monotonic()
+                if due > now:
+                    # ahead of schedule, send what was due and wait for this frame
+                    if batch:
+                        self.send(writer, batch)
+                        batch = []
+                        await writer.drain()
+                    await asyncio.sleep(due - now)
+                    last_write = time.monotonic()
+                elif now - last_write >= TICK:
+                    # behind schedule still writes every tick, so the client is not
+                    # flooded in one write and requests get answered
+                    self.send(writer, batch)
+                    batch = []
+                    last_write = now
+                    await writer.drain()
+                    await asyncio.sleep(0)
+                frames += 1
+            batch.append(encode(event))
+        self.send(writer, batch)
+
+    def send(self, writer: asyncio.StreamWriter, batch: list[bytes]) -> None:
+        """Write encoded events in one write."""
+        writer.write(b"".join(batch))
+        self.events_sent += len(batch)
+
+    async def answer_requests(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Reply to JSONRPC requests until the client disconnects."""
+        framer = LineFramer()
+        while True:
+            raw = await reader.read(RECV_BUFSIZE)
+            if not raw:
+                return
+            for line in framer.feed(raw):
+                writer.write(encode(rpc_response(self.config, json.loads(line))))
+                self.requests_answered += 1
+
+
+async def serve(config: SimulatorConfig) -> None:
+    """Run the simulator until cancelled."""
+    simulator = Simulator(config)
+    await simulator.start()
+    print(
+        f"Simulating PHD2 on {config.host}:{simulator.port} at {config.rate:g} GuideSteps/sec"
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await simulator.close()
+
+
+def positive_float(value: str) -> float:
+    """Parse a number above 0, for argparse."""
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"must be above 0: {value!r}")
+    return number
+
+
+def parse_args() -> SimulatorConfig:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Simulate the PHD2 event server for testing the exporter."
+    )
+    parser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="default: 127.0.0.1"
+    )
+    parser.add_argument("--port", type=int, default=4400, help="default: 4400")
+    parser.add_argument(
+        "--rate",
+        type=positive_float,
+        default=1.0,
+        help="GuideStep events per second, default: 1",
+    )
+    parser.add_argument(
+        "--frames",
+        type=int,
+        help="GuideSteps per connection, default: stream forever",
+    )
+    parser.add_argument(
+        "--dither_every",
+        type=int,
+        default=50,
+        help="GuideSteps between dithers, 0 to never dither, default: 50",
+    )
+    parser.add_argument(
+        "--settle_frames",
+        type=int,
+        default=5,
+        help="GuideSteps spent settling after a dither, default: 5",
+    )
+    parser.add_argument(
+        "--pixel_scale",
+        type=float,
+        default=1.5,
+        help="arcsec per pixel reported by get_pixel_scale, default: 1.5",
+    )
+    parser.add_argument("--seed", type=int, help="random seed for guide errors")
+    args = parser.parse_args()
+    return SimulatorConfig(
+        host=args.host,
+        port=args.port,
+        rate=args.rate,
+        frames=args.frames,
+        dither_every=args.dither_every,
+        settle_frames=args.settle_frames,
+        pixel_scale=args.pixel_scale,
+        seed=args.seed,
+    )
+
+
+def main() -> int:
+    """Main entry point."""
+    config = parse_args()
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve(config))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,224 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""
+Quantile sketches of guiding session statistics, published as summaries.
+
+A DDSketch keeps counts in logarithmic bins, so every quantile is within
+RELATIVE_ACCURACY of the true value with memory bounded by MAX_BINS
+regardless of session length. Sketches with the same accuracy can be
+merged, e.g. to combine sessions. Sketches are reset when looping stops,
+the published values of the last session stay until the next one publishes,
+which drops them all, so labels only the last session used do not linger.
+"""
+
+import math
+from typing import Any
+
+from .histogram import collector, series_labels
+from .rms import (
+    KEY_DEC_RAW,
+    KEY_RA_RAW,
+    KEY_TOTAL_RAW,
+    LABEL_SCALE,
+    LABEL_SOURCE,
+    SCALE_ARCSEC,
+    SCALE_PX,
+)
+from .state import LabelItems, PHD2State
+from .utils import utility_samples
+
+METRIC_SESSION_GUIDE_ERROR = "phd2_session_guide_error"
+METRIC_SESSION_STAR_MASS = "phd2_session_star_mass"
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+RELATIVE_ACCURACY = 0.01
+
+# 1% accuracy needs ~700 bins for values from 0.001 to 1000
+MAX_BINS = 2048
+
+# values this small are counted as zero, they have no logarithmic bin
+MIN_VALUE = 1e-9
+
+SOURCE_LABELS: dict[str, LabelItems] = {
+    key: ((LABEL_SOURCE, key),) for key in (KEY_RA_RAW, KEY_DEC_RAW, KEY_TOTAL_RAW)
+}
+
+
+class QuantileSketch:
+    """DDSketch of non-negative values with relative accuracy quantiles."""
+
+    __slots__ = (
+        "bins",
+        "count",
+        "gamma",
+        "log_gamma",
+        "max",
+        "max_bins",
+        "min",
+        "relative_accuracy",
+        "sum",
+        "zero_count",
+    )
+
+    def __init__(
+        self, relative_accuracy: float = RELATIVE_ACCURACY, max_bins: int = MAX_BINS
+    ) -> None:
+        """Initialize an empty sketch."""
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        # count per bin, bin k holds values in (gamma^(k-1), gamma^k]
+        self.bins: dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        """Add a value, must not be negative."""
+        if value < 0:
+            raise ValueError(f"sketch values must not be negative: {value}")
+        if value <= MIN_VALUE:
+            self.zero_count += 1
+        else:
+            key = math.ceil(math.log(value) / self.log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + 1
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _collapse(self) -> None:
+        """Merge the lowest bins until within max_bins, low quantiles lose accuracy."""
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_bins
+        lowest = keys[excess]
+        for key in keys[:excess]:
+            self.bins[lowest] += self.bins.pop(key)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Add the values of another sketch with the same accuracy."""
+        if other.gamma != self.gamma:
+            raise ValueError("only sketches with the same accuracy can be merged")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Get the value at quantile q (0 to 1), NaN if the sketch is empty."""
+        if self.count == 0:
+            return math.nan
+        # the extremes are known exactly
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                # middle of the bin in relative terms, clamped to what was seen
+                value = 2 * self.gamma**key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+class SessionSummary:
+    """A sketch published as a summary with QUANTILES."""
+
+    __slots__ = ("dirty", "labels", "name", "scaled", "sketch")
+
+    def __init__(
+        self, name: str, labels: LabelItems = (), scaled: bool = False
+    ) -> None:
+        """Initialize summary, scaled values are px and also published in arcsec."""
+        self.name = name
+        self.labels = labels
+        self.scaled = scaled
+        self.sketch = QuantileSketch()
+        self.dirty = False
+
+    def add(self, value: float) -> None:
+        """Add a value."""
+        self.sketch.add(value)
+        self.dirty = True
+
+    def publish(self, state: PHD2State) -> None:
+        """Write the summary series with the state's global labels."""
+        if self.sketch.count == 0:
+            return
+        if not self.scaled:
+            self._publish(state, self.labels, 1.0)
+        else:
+            self._publish(state, (*self.labels, (LABEL_SCALE, SCALE_PX)), 1.0)
+            if state.pixel_scale > 0:
+                self._publish(
+                    state,
+                    (*self.labels, (LABEL_SCALE, SCALE_ARCSEC)),
+                    state.pixel_scale,
+                )
+        self.dirty = False
+
+    def _publish(self, state: PHD2State, labels: LabelItems, factor: float) -> None:
+        """Publish the summary for one scale, values multiplied by factor."""
+        series = series_labels(state, labels)
+        quantiles = [(repr(q), self.sketch.quantile(q) * factor) for q in QUANTILES]
+        count = self.sketch.count
+        total = self.sketch.sum * factor
+        collector.set_summary(self.name, series, quantiles, count, total)
+        label_dict = dict(series)
+        utility_samples(
+            [
+                *(
+                    (self.name, value, {**label_dict, "quantile": quantile})
+                    for quantile, value in quantiles
+                ),
+                (f"{self.name}_sum", total, label_dict),
+                (f"{self.name}_count", count, label_dict),
+            ]
+        )
+
+
+def get_summary(
+    state: PHD2State, name: str, labels: LabelItems = (), scaled: bool = False
+) -> SessionSummary:
+    """Get the session summary for a name and labels, created on first use."""
+    key = (name, labels)
+    summary = state.sketches.get(key)
+    if summary is None:
+        summary = state.sketches[key] = SessionSummary(name, labels, scaled)
+    return summary
+
+
+def observe_session(state: PHD2State, data: dict[str, Any]) -> None:
+    """Add the guide error and star mass of a GuideStep to the session sketches."""
+    ra = data.get(KEY_RA_RAW)
+    dec = data.get(KEY_DEC_RAW)
+    if isinstance(ra, int | float) and isinstance(dec, int | float):
+        for key, value in (
+            (KEY_RA_RAW, abs(ra)),
+            (KEY_DEC_RAW, abs(dec)),
+            (KEY_TOTAL_RAW, math.hypot(ra, dec)),
+        ):
+            get_summary(
+                state, METRIC_SESSION_GUIDE_ERROR, SOURCE_LABELS[key], scaled=True
+            ).add(value)
+
+    star_mass = data.get("StarMass")
+    if isinstance(star_mass, int | float) and star_mass >= 0:
+        get_summary(state, METRIC_SESSION_STAR_MASS).add(star_mass)
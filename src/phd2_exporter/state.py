@@ -2,9 +2,17 @@
 """Global state management for PHD2 exporter."""
 
 import copy
+import time
+from collections.abc import Callable
+from contextvars import ContextVar, Token
 from threading import Lock
 from typing import Any
 
+from .rmsstore import RmsStore, RmsWindow
+
+# labels as a hashable tuple of (name, value) pairs
+LabelItems = tuple[tuple[str, Any], ...]
+
 # Application states from PHD2
 APP_STATES = [
     "Stopped",  # PHD is idle
@@ -16,6 +24,9 @@ APP_STATES = [
     "Looping",  # PHD is looping exposures
 ]
 
+# Settling can be true while any of the APP_STATES is
+STATUS_SETTLING = "Settling"
+
 
 class PHD2State:
     """Global state for PHD2 exporter."""
@@ -24,20 +35,68 @@ class PHD2State:
         """Initialize PHD2 state."""
         self.phd_state = ""
         self.phd_settling = False
+        # seconds spent in each status, accumulated up to state_time_accounted
+        self.state_seconds: dict[str, float] = {}
+        self.state_time_accounted = 0.0
+        # status metrics are published in full once, then only on transitions
+        self.status_published = False
+        self.state_seconds_published = 0.0
+        # clock all state time is accounted with, one clock so the time is never
+        # accounted twice or lost when PHD2 and the exporter clocks differ
+        self.clock: Callable[[], float] = time.time
         self.phd_rms_samples = 15
-        self.phd_rms_data: dict[str, list[float]] = {}
+        self.phd_rms_windows: list[RmsWindow] = []
+        self.phd_rms_data: RmsStore | None = None
         self.pixel_scale = 0.0
-        self.jrpc_callbacks: dict[int, Any] = {}
+        # guide error histogram buckets by scale, defaults when not set
+        self.guide_error_buckets: dict[str, tuple[float, ...]] = {}
+        # JSONRPC requests waiting for a response by ID, see jsonrpc.send_request
+        self.jrpc_pending: dict[int, Any] = {}
+        # ID of the pending request for each method
+        self.jrpc_methods: dict[str, int] = {}
+        self.jrpc_next_id = 0
+        # seconds to wait for a response before a request expires
+        self.jrpc_timeout = 10.0
         self.mutex = Lock()
         self.global_labels: dict[str, Any] | None = None
+        # immutable copy of global labels, extended by metric handles without copying
+        self.global_label_items: LabelItems = ()
+        # metric handles resolved with the current global labels, see utils.get_metric_handle
+        self.metric_handles: dict[tuple[Any, ...], Any] = {}
+        # histograms by name and labels, see histogram.get_histogram
+        self.histograms: dict[tuple[Any, ...], Any] = {}
+        self.histograms_published = 0.0
+        # guiding session summaries by name and labels, see sketch.get_summary
+        self.sketches: dict[tuple[Any, ...], Any] = {}
+        # published summaries are of a previous session, dropped when the next publishes
+        self.summaries_stale = False
+        # seconds of RA guide error analyzed for periodic error, 0 disables
+        self.periodic_error_window = 7200.0
+        # periodic.PeriodicErrorAnalyzer of the guiding session
+        self.periodic_error: Any = None
+        # drift.DriftEstimator of the frames since the last dither
+        self.drift: Any = None
+        # frames.FrameSink storing every guiding frame, None when not enabled
+        self.frames: Any = None
         self.debug = False
 
     def set_global_labels(self, host: str, inst: int) -> None:
         """Set global labels from PHD2 event."""
-        self.global_labels = {
+        global_labels = {
             "host": host.lower(),
             "inst": inst,
         }
+        if global_labels != self.global_labels:
+            # cached handles are bound to the previous labels
+            self.metric_handles.clear()
+            self.status_published = False
+            # republish with the new labels
+            for histogram in self.histograms.values():
+                histogram.dirty = True
+            for summary in self.sketches.values():
+                summary.dirty = True
+        self.global_labels = global_labels
+        self.global_label_items = tuple(global_labels.items())
 
     def get_global_labels_deepcopy(self) -> dict[str, Any]:
         """Get a copy of global labels."""
@@ -45,15 +104,74 @@ class PHD2State:
             return {}
         return copy.deepcopy(self.global_labels)
 
+    def account_state_time(self, now: float) -> None:
+        """Add time since the last accounting to the active statuses."""
+        if self.state_time_accounted > 0:
+            # clamp, the clock may be set back
+            elapsed = max(now - self.state_time_accounted, 0.0)
+            if self.phd_state:
+                self.state_seconds[self.phd_state] = (
+                    self.state_seconds.get(self.phd_state, 0.0) + elapsed
+                )
+            if self.phd_settling:
+                self.state_seconds[STATUS_SETTLING] = (
+                    self.state_seconds.get(STATUS_SETTLING, 0.0) + elapsed
+                )
+        self.state_time_accounted = max(now, self.state_time_accounted)
+
+    def update_status(self, phd_state: str, settling: bool, now: float) -> list[str]:
+        """
+        Apply the state and settling flag seen at time now.
+
+        Time up to now is accounted to the previous statuses. Returns the
+        statuses whose value changed, empty if nothing changed.
+        """
+        self.account_state_time(now)
+
+        changed = []
+        if phd_state != self.phd_state:
+            if self.phd_state:
+                changed.append(self.phd_state)
+            changed.append(phd_state)
+            self.phd_state = phd_state
+        if settling != self.phd_settling:
+            changed.append(STATUS_SETTLING)
+            self.phd_settling = settling
+        return changed
+
     def reset_rms_data(self) -> None:
         """Reset RMS data."""
-        self.phd_rms_data = {}
+        self.phd_rms_data = None
+
+    def reset_session(self) -> None:
+        """Start new session sketches and analyses, published values stay until replaced."""
+        self.sketches.clear()
+        self.summaries_stale = True
+        self.periodic_error = None
+        self.drift = None
+        # one frames file per session
+        if self.frames is not None:
+            self.frames.rotate()
 
 
 # Global state instance
 _state = PHD2State()
 
+# State of the PHD2 instance being handled in the current context.  Each collector
+# task sets its own state, everything else falls back to the global instance.
+_current_state: ContextVar[PHD2State] = ContextVar("phd2_state", default=_state)
+
 
 def get_state() -> PHD2State:
-    """Get the global state instance."""
-    return _state
+    """Get the state instance for the current context."""
+    return _current_state.get()
+
+
+def set_state(state: PHD2State) -> Token[PHD2State]:
+    """Set the state instance for the current context."""
+    return _current_state.set(state)
+
+
+def reset_state(token: Token[PHD2State]) -> None:
+    """Restore the state instance replaced by set_state."""
+    _current_state.reset(token)
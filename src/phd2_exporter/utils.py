@@ -1,11 +1,29 @@
 # Generated-by: Cursor (Claude Sonnet 4.5)
 """Utility functions for PHD2 exporter."""
 
+from collections.abc import Iterable
 from typing import Any
 
 import metrics_utility
 
-from .state import get_state
+from .state import LabelItems, PHD2State, get_state
+
+# remote_write.RemoteWriter also receiving every metric update, None when not pushing
+_remote_writer: Any = None
+
+# count of metric updates, the exposition is rendered again when it changed
+_generation = 0
+
+
+def set_remote_writer(writer: Any) -> None:
+    """Push every metric update to writer as well, None to stop pushing."""
+    global _remote_writer
+    _remote_writer = writer
+
+
+def get_generation() -> int:
+    """Get the count of metric updates so far."""
+    return _generation
 
 
 def debug(message: str) -> None:
@@ -17,40 +35,124 @@ def debug(message: str) -> None:
 
 def utility_set(name: str, value: Any, label_dict: dict[str, Any]) -> None:
     """Set a metric value with error handling."""
+    global _generation
+    _generation += 1
     try:
         metrics_utility.set(name, value, label_dict)
     except Exception:
         print(f"ERROR: metrics_utility.set({name}, {value}, {label_dict})")
         raise
+    if _remote_writer is not None:
+        _remote_writer.set(name, value, label_dict)
 
 
 def utility_inc(name: str, label_dict: dict[str, Any]) -> None:
     """Increment a metric with error handling."""
+    global _generation
+    _generation += 1
     try:
         metrics_utility.inc(name, label_dict)
     except Exception:
         print(f"ERROR: metrics_utility.inc({name}, {label_dict})")
         raise
+    if _remote_writer is not None:
+        _remote_writer.inc(name, label_dict)
 
 
-def make_labels(data: dict[str, Any], label_keys: list[str]) -> dict[str, Any]:
-    """Create labels dictionary from data."""
-    labels = {}
+def utility_samples(samples: Iterable[tuple[str, Any, dict[str, Any]]]) -> None:
+    """Count samples exposed by a collector as a metric update and push them."""
+    global _generation
+    _generation += 1
+    if _remote_writer is not None:
+        for name, value, label_dict in samples:
+            _remote_writer.set(name, value, label_dict)
 
-    for label_key in label_keys:
-        # default to 0 else future labels will be invalid (must have same labels always)
-        labels[label_key] = data.get(label_key, 0)
 
-    return labels
+class MetricHandle:
+    """A metric name and label set resolved once and reused for every update."""
+
+    __slots__ = ("labels", "name")
+
+    def __init__(self, name: str, labels: dict[str, Any]) -> None:
+        """Bind metric name and labels."""
+        self.name = name
+        self.labels = labels
+
+    def set(self, value: Any) -> None:
+        """Set the metric value."""
+        utility_set(self.name, value, self.labels)
+
+    def inc(self) -> None:
+        """Increment the metric."""
+        utility_inc(self.name, self.labels)
+
+
+def get_metric_handle(
+    state: PHD2State, name: str, extra_labels: LabelItems = ()
+) -> MetricHandle:
+    """
+    Get the handle for a metric with global labels plus extra labels.
+
+    Handles are created on first use and cached on the state until the global labels change.
+    """
+    key = (name, extra_labels)
+    handle = state.metric_handles.get(key)
+    if handle is None:
+        # the only place a label dict is built, global label items are never copied or modified
+        handle = MetricHandle(name, dict(state.global_label_items + extra_labels))
+        state.metric_handles[key] = handle
+    return handle
+
+
+def get_event_metric_handles(
+    state: PHD2State,
+    event: str,
+    metric_keys: tuple[str, ...],
+    label_keys: tuple[str, ...] = (),
+    label_values: tuple[Any, ...] = (),
+) -> tuple[tuple[str, MetricHandle], ...]:
+    """
+    Get handles for the metrics of an event, resolved with a single lookup.
+
+    Metric names are phd2_<event>_<metric_key>, labels are global labels plus
+    label_keys with label_values. Each distinct set of label values, e.g. each
+    guide direction, resolves to its own interned handles.
+    """
+    key = (event, metric_keys, label_values)
+    handles = state.metric_handles.get(key)
+    if handles is None:
+        extra_labels = tuple(zip(label_keys, label_values, strict=True))
+        handles = tuple(
+            (
+                metric_key,
+                get_metric_handle(state, f"phd2_{event}_{metric_key}", extra_labels),
+            )
+            for metric_key in metric_keys
+        )
+        state.metric_handles[key] = handles
+    return handles
 
 
 def create_event_metrics(
-    data: dict[str, Any], labels: dict[str, Any], metric_keys: list[str]
+    state: PHD2State,
+    data: dict[str, Any],
+    metric_keys: tuple[str, ...],
+    label_keys: tuple[str, ...] = (),
 ) -> None:
-    """Create metrics for event data."""
-    for metric_key in metric_keys:
+    """Create metrics for event data, labelled with global labels plus label_keys from data."""
+    label_values: tuple[Any, ...] = ()
+    if label_keys:
+        # default to 0 else future labels will be invalid (must have same labels always)
+        label_values = tuple([data.get(label_key, 0) for label_key in label_keys])
+
+    for metric_key, handle in get_event_metric_handles(
+        state, data["Event"], metric_keys, label_keys, label_values
+    ):
         if metric_key in data:
             value = data[metric_key]
             if isinstance(value, bool):
                 value = 1 if value else 0
-            utility_set(f"phd2_{data['Event']}_{metric_key}", value, labels)
+            elif not isinstance(value, int | float):
+                # only numbers can be exported, e.g. GuideParamChange values vary
+                continue
+            handle.set(value)
@@ -0,0 +1,116 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for capturing the raw event stream."""
+
+import errno
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from phd2_exporter.capture import (
+    COMPRESSION_GZIP,
+    COMPRESSION_NONE,
+    CaptureSink,
+    encode_batch,
+    get_compression,
+    open_capture,
+)
+from phd2_exporter.replay import read_capture
+
+LINES = [b'{"Event": "Version", "Host": "rig", "Inst": 1}', b'{"Event": "Paused"}']
+
+
+def test_encode_batch():
+    """Test a batch is preceded by its receive time."""
+    assert encode_batch(12.5, LINES) == (
+        b'{"Received": 12.5}\r\n' + LINES[0] + b"\r\n" + LINES[1] + b"\r\n"
+    )
+
+
+def test_get_compression():
+    """Test compression selection."""
+    name, _ = get_compression()
+    assert name in ("zstd", "gzip")
+    assert get_compression(COMPRESSION_GZIP)[0] == COMPRESSION_GZIP
+    assert get_compression(COMPRESSION_NONE) == (COMPRESSION_NONE, None)
+    with pytest.raises(ValueError, match="Unknown capture compression"):
+        get_compression("lz4")
+
+
+@pytest.mark.parametrize("compression", [COMPRESSION_GZIP, COMPRESSION_NONE])
+def test_sink_writes_replayable_capture(tmp_path, compression):
+    """Test captured batches can be replayed and keep their receive times."""
+    sink = CaptureSink(tmp_path, "phd2-test", compression)
+    sink.start()
+    assert sink.write(100.0, LINES) is True
+    assert sink.write(101.0, [b'{"Event": "Resumed"}']) is True
+    sink.close()
+
+    assert len(sink.files) == 1
+    events = list(read_capture(sink.files[0], json.loads))
+    assert [e["Event"] for e in events] == ["Version", "Paused", "Resumed"]
+
+    with open_capture(sink.files[0]) as f:
+        lines = f.read().split(b"\r\n")
+    received = [json.loads(line)["Received"] for line in lines if b"Received" in line]
+    assert received == [100.0, 101.0]
+
+
+def test_sink_rotates(tmp_path):
+    """Test a new file is started once the current one is full."""
+    sink = CaptureSink(tmp_path, "phd2-test", COMPRESSION_NONE, max_bytes=10)
+    sink.start()
+    for i in range(3):
+        sink.write(float(i), LINES)
+    sink.close()
+
+    assert len(sink.files) == 3
+    assert all(path.exists() for path in sink.files)
+    assert len(set(sink.files)) == 3
+
+
+def test_sink_drops_when_full(tmp_path):
+    """Test batches are dropped instead of blocking when the queue is full."""
+    # not started, nothing drains the queue
+    sink = CaptureSink(tmp_path, "phd2-test", queue_size=1)
+    assert sink.write(1.0, LINES) is True
+    assert sink.write(2.0, LINES) is False
+    assert sink.dropped == 1
+
+
+def test_sink_survives_write_errors(tmp_path, capsys):
+    """Test a failed batch is reported and writing goes on with a new file."""
+    sink = CaptureSink(tmp_path, "phd2-test", COMPRESSION_NONE)
+    write = CaptureSink._write
+    calls = []
+
+    def failing_write(self, batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise OSError(errno.ENOSPC, "No space left on device")
+        write(self, batch)
+
+    with patch.object(CaptureSink, "_write", failing_write):
+        sink.start()
+        sink.write(1.0, LINES)
+        sink.write(2.0, [b'{"Event": "Resumed"}'])
+        sink.close()
+
+    assert sink.failed == 1
+    assert "No space left on device" in capsys.readouterr().out
+    events = list(read_capture(sink.files[0], json.loads))
+    assert [e["Event"] for e in events] == ["Resumed"]
+
+
+def test_sink_close_with_dead_writer(tmp_path):
+    """Test close returns when the writer thread is gone and the queue is full."""
+    sink = CaptureSink(tmp_path, "phd2-test", queue_size=1)
+    sink._thread = threading.Thread(target=lambda: None)
+    sink._thread.start()
+    sink._thread.join()
+    sink.write(1.0, LINES)
+
+    sink.close()
+
+    assert sink._thread is None
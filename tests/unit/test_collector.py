@@ -0,0 +1,352 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for the asyncio collector."""
+
+import asyncio
+import contextlib
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from phd2_exporter.collector import (
+    InstanceCollector,
+    StreamSocket,
+    process_line,
+    run_collectors,
+)
+from phd2_exporter.histogram import DistributionCollector
+from phd2_exporter.state import PHD2State, get_state, set_state
+
+
+def test_read_events_queue_full_keeps_state_changes():
+    """Test only GuideSteps are shed while event handling is behind."""
+    handled = []
+    gate: dict[str, asyncio.Event] = {}
+    process_batches = InstanceCollector.process_batches
+
+    async def gated(self, s, batches):
+        await gate["open"].wait()
+        await process_batches(self, s, batches)
+
+    events = [{"Event": "GuideStep", "Frame": i} for i in range(20)]
+    events[10] = {"Event": "AppState", "State": "Guiding"}
+    events.append({"jsonrpc": "2.0", "id": 1, "result": 1.5})
+    lines = [json.dumps(e, separators=(",", ":")).encode() for e in events]
+
+    async def handler(
+        _reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        for line in lines:
+            writer.write(line + b"\r\n")
+            await writer.drain()
+            await asyncio.sleep(0.001)
+        writer.close()
+
+    async def run() -> None:
+        gate["open"] = asyncio.Event()
+        server = await asyncio.start_server(handler, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        collector = InstanceCollector("127.0.0.1", port, queue_size=1)
+        collector.state.set_global_labels("host", 1)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        asyncio.get_running_loop().call_later(0.1, gate["open"].set)
+        await collector.read_events(reader, writer)
+        writer.close()
+        server.close()
+
+    with (
+        patch.object(InstanceCollector, "process_batches", gated),
+        patch(
+            "phd2_exporter.collector.handle_event",
+            side_effect=lambda _s, data: handled.append(data["Event"]),
+        ),
+        patch(
+            "phd2_exporter.collector.handle_jsonrpc_response",
+            side_effect=lambda data: handled.append(data["id"]),
+        ),
+        patch("phd2_exporter.utils.metrics_utility"),
+    ):
+        asyncio.run(run())
+
+    assert handled.count("GuideStep") < 19
+    assert "AppState" in handled
+    assert 1 in handled
+
+
+async def start_server(stream: bytes, chunk_size: int) -> asyncio.Server:
+    """Start a server that sends the stream in chunks and closes."""
+
+    async def handler(
+        _reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        for i in range(0, len(stream), chunk_size):
+            writer.write(stream[i : i + chunk_size])
+            await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handler, "127.0.0.1", 0)
+
+
+def make_stream(host: str, count: int) -> bytes:
+    """Build an event stream for a PHD2 instance."""
+    events = [{"Event": "Version", "Host": host, "Inst": 1}]
+    events += [{"Event": "GuideStep", "Frame": i} for i in range(count)]
+    return b"".join(json.dumps(e).encode() + b"\r\n" for e in events)
+
+
+def test_stream_socket_sendall():
+    """Test sendall writes to the stream writer."""
+    writer = MagicMock()
+    StreamSocket(writer).sendall(b"data")
+    writer.write.assert_called_once_with(b"data")
+
+
+def test_stream_socket_captures_requests():
+    """Test requests are written to the capture for replay."""
+    writer = MagicMock()
+    capture = MagicMock()
+    StreamSocket(writer, capture).sendall(b'{"method": "get_pixel_scale", "id": 1}\r\n')
+    capture.write.assert_called_once()
+    assert capture.write.call_args[0][1] == [b'{"method": "get_pixel_scale", "id": 1}']
+
+
+def test_process_line_event():
+    """Test that events are dispatched to handle_event."""
+    s = MagicMock()
+    with patch("phd2_exporter.collector.handle_event") as mock_handle:
+        process_line(s, b'{"Event": "Paused"}')
+        mock_handle.assert_called_once_with(s, {"Event": "Paused"})
+
+
+def test_process_line_jsonrpc():
+    """Test that JSONRPC responses are dispatched."""
+    with patch("phd2_exporter.collector.handle_jsonrpc_response") as mock_handle:
+        process_line(MagicMock(), b'{"jsonrpc": "2.0", "id": 1, "result": 2.5}')
+        mock_handle.assert_called_once_with({"jsonrpc": "2.0", "id": 1, "result": 2.5})
+
+
+def test_read_events_split_reads():
+    """Test that events split across reads are all handled."""
+    frames = []
+
+    async def run() -> None:
+        server = await start_server(make_stream("host", 200), 7)
+        port = server.sockets[0].getsockname()[1]
+        collector = InstanceCollector("127.0.0.1", port)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await collector.read_events(reader, writer)
+        writer.close()
+        server.close()
+
+    with (
+        patch(
+            "phd2_exporter.collector.handle_event",
+            side_effect=lambda _s, data: frames.append(data.get("Frame")),
+        ),
+        patch("phd2_exporter.collector.utility_inc"),
+    ):
+        asyncio.run(run())
+
+    assert frames == [None, *range(200)]
+
+
+def test_run_collectors_isolated_state():
+    """Test that each collector handles events with its own state."""
+    seen: dict[str, set[int]] = {}
+
+    def record(_s, data):
+        state = get_state()
+        if data["Event"] == "Version":
+            state.set_global_labels(data["Host"], data["Inst"])
+        seen.setdefault(state.global_labels["host"], set()).add(id(state))
+
+    async def run(collectors: list[InstanceCollector]) -> None:
+        servers = [
+            await start_server(make_stream("rig1", 10), 64),
+            await start_server(make_stream("rig2", 10), 64),
+        ]
+        for server in servers:
+            collectors.append(
+                InstanceCollector("127.0.0.1", server.sockets[0].getsockname()[1])
+            )
+        # collectors reconnect forever, stop them once the streams are consumed
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(run_collectors(collectors), 0.5)
+        for server in servers:
+            server.close()
+
+    collectors: list[InstanceCollector] = []
+    with (
+        patch("phd2_exporter.collector.handle_event", side_effect=record),
+        patch("phd2_exporter.utils.metrics_utility"),
+    ):
+        asyncio.run(run(collectors))
+
+    assert seen == {
+        "rig1": {id(collectors[0].state)},
+        "rig2": {id(collectors[1].state)},
+    }
+    assert isinstance(collectors[0].state, PHD2State)
+
+
+def test_process_line_custom_decoder():
+    """Test lines are parsed with the given decoder."""
+    decode = MagicMock(return_value={"Event": "Paused"})
+    s = MagicMock()
+    with patch("phd2_exporter.collector.handle_event") as mock_handle:
+        process_line(s, b"line", decode)
+        decode.assert_called_once_with(b"line")
+        mock_handle.assert_called_once_with(s, {"Event": "Paused"})
+
+
+def test_read_events_capture():
+    """Test lines read are written to the capture sink."""
+    capture = MagicMock()
+
+    async def run() -> None:
+        server = await start_server(make_stream("host", 3), 1024)
+        port = server.sockets[0].getsockname()[1]
+        collector = InstanceCollector("127.0.0.1", port, capture=capture)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await collector.read_events(reader, writer)
+        writer.close()
+        server.close()
+
+    with (
+        patch("phd2_exporter.collector.handle_event"),
+        patch("phd2_exporter.collector.utility_inc"),
+    ):
+        asyncio.run(run())
+
+    captured = [line for call in capture.write.call_args_list for line in call[0][1]]
+    assert captured == make_stream("host", 3).split(b"\r\n")[:-1]
+
+
+def test_read_events_queue_full_drops():
+    """Test batches are dropped while event handling is behind."""
+    frames = []
+    gate: dict[str, asyncio.Event] = {}
+    process_batches = InstanceCollector.process_batches
+
+    async def gated(self, s, batches):
+        # event handling is stuck until the gate opens
+        await gate["open"].wait()
+        await process_batches(self, s, batches)
+
+    async def handler(
+        _reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        # one read per event
+        for line in make_stream("host", 50).split(b"\r\n")[:-1]:
+            writer.write(line + b"\r\n")
+            await writer.drain()
+            await asyncio.sleep(0.001)
+        writer.close()
+
+    async def run() -> None:
+        gate["open"] = asyncio.Event()
+        server = await asyncio.start_server(handler, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        collector = InstanceCollector("127.0.0.1", port, queue_size=1)
+        collector.state.set_global_labels("host", 1)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        asyncio.get_running_loop().call_later(0.2, gate["open"].set)
+        await collector.read_events(reader, writer)
+        writer.close()
+        server.close()
+
+    with (
+        patch.object(InstanceCollector, "process_batches", gated),
+        patch(
+            "phd2_exporter.collector.handle_event",
+            side_effect=lambda _s, data: frames.append(data.get("Frame")),
+        ),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
+    ):
+        asyncio.run(run())
+
+    assert 0 < len(frames) < 51
+    mock_metrics.inc.assert_any_call("phd2_queue_dropped", {"host": "host", "inst": 1})
+
+
+def test_read_events_queue_metrics():
+    """Test queue depth and lag are exported."""
+
+    async def run() -> None:
+        server = await start_server(make_stream("host", 5), 1024)
+        port = server.sockets[0].getsockname()[1]
+        collector = InstanceCollector("127.0.0.1", port)
+        collector.state.set_global_labels("host", 1)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await collector.read_events(reader, writer)
+        writer.close()
+        server.close()
+
+    histograms = DistributionCollector()
+    with (
+        patch("phd2_exporter.collector.handle_event"),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
+        patch("phd2_exporter.histogram.collector", histograms),
+    ):
+        asyncio.run(run())
+
+    names = {call[0][0] for call in mock_metrics.set.call_args_list}
+    assert {"phd2_queue_depth", "phd2_queue_lag_seconds"} <= names
+    assert {
+        "phd2_event_latency_seconds",
+        "phd2_event_processing_seconds",
+    } <= set(histograms.histograms)
+
+
+def test_read_events_handler_error():
+    """Test an error handling an event ends reading with that error."""
+
+    async def run() -> None:
+        server = await start_server(make_stream("host", 5), 1024)
+        port = server.sockets[0].getsockname()[1]
+        collector = InstanceCollector("127.0.0.1", port)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            await collector.read_events(reader, writer)
+        finally:
+            writer.close()
+            server.close()
+
+    with (
+        patch("phd2_exporter.collector.handle_event", side_effect=KeyError("Host")),
+        patch("phd2_exporter.utils.metrics_utility"),
+        pytest.raises(KeyError),
+    ):
+        asyncio.run(run())
+
+
+def test_read_events_polls():
+    """Test due polls are written to PHD2 in one write."""
+    received: list[bytes] = []
+
+    async def handler(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        received.append(await asyncio.wait_for(reader.read(4096), 1.0))
+        writer.close()
+
+    async def run() -> None:
+        server = await asyncio.start_server(handler, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        collector = InstanceCollector(
+            "127.0.0.1",
+            port,
+            poll_intervals={"get_connected": 30.0, "get_exposure": 60.0},
+        )
+        collector.state.set_global_labels("host", 1)
+        set_state(collector.state)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await collector.read_events(reader, writer)
+        writer.close()
+        server.close()
+
+    with patch("phd2_exporter.utils.metrics_utility"):
+        asyncio.run(run())
+
+    methods = [json.loads(line)["method"] for line in received[0].splitlines()]
+    assert methods == ["get_connected", "get_exposure"]
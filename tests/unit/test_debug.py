@@ -0,0 +1,113 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for the debug endpoints."""
+
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+import pytest
+
+from phd2_exporter.debug import (
+    collapse_stack,
+    format_collapsed,
+    format_stats,
+    make_debug,
+    sample_stacks,
+)
+from phd2_exporter.exposition import start_metrics_server
+from phd2_exporter.latency import observe_event
+from phd2_exporter.state import PHD2State
+
+
+def busy_loop(stop: threading.Event) -> None:
+    """Keep a thread busy until stopped."""
+    while not stop.is_set():
+        sum(range(100))
+
+
+@pytest.fixture
+def busy_thread():
+    """A thread spinning in busy_loop."""
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_loop, args=(stop,))
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+def test_collapse_stack():
+    """Test stacks are collapsed outermost first."""
+    stack = collapse_stack(sys._getframe())
+    assert stack.endswith(";test_debug.py:test_collapse_stack")
+
+
+def test_sample_stacks(busy_thread):
+    """Test sampling another thread."""
+    stacks = sample_stacks(busy_thread.ident, 0.05, 0.001)
+
+    assert sum(stacks.values()) > 0
+    assert any("test_debug.py:busy_loop" in stack for stack in stacks)
+
+
+def test_format_collapsed():
+    """Test collapsed stack lines, most frequent first."""
+    stacks = Counter({"a;b": 1, "a;c": 3})
+    assert format_collapsed(stacks) == "a;c 3\na;b 1\n"
+
+
+def test_format_stats():
+    """Test call counts and times per event."""
+    state = PHD2State()
+    state.set_global_labels("rig", 1)
+    for _ in range(4):
+        observe_event(state, {"Event": "GuideStep"}, 100.0, 100.0, 0.0005)
+    observe_event(state, {"Event": "Paused"}, 100.0, 100.0, 0.001)
+
+    lines = format_stats([state]).splitlines()
+
+    assert lines[0].split() == [
+        "instance",
+        "event",
+        "calls",
+        "total",
+        "s",
+        "mean",
+        "us",
+    ]
+    assert lines[1].split() == ["rig/1", "GuideStep", "4", "0.002", "500.0"]
+    assert lines[2].split() == ["rig/1", "Paused", "1", "0.001", "1000.0"]
+
+
+def test_debug_server(busy_thread):
+    """Test the endpoints over HTTP, on the metrics server."""
+    server = start_metrics_server(
+        0, "127.0.0.1", debug=make_debug([PHD2State()], busy_thread.ident)
+    )
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base}/debug/stats") as response:
+            assert response.read().startswith(b"instance")
+
+        start = time.monotonic()
+        with urllib.request.urlopen(
+            f"{base}/debug/profile?seconds=0.1&interval=0.001"
+        ) as response:
+            body = response.read().decode()
+        assert time.monotonic() - start >= 0.1
+        assert "busy_loop" in body
+
+        for path, status in [
+            ("/debug/profile?seconds=600", 400),
+            ("/debug/other", 404),
+            ("/other", 404),
+        ]:
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(base + path)
+            assert error.value.code == status
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,58 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for JSON decoding."""
+
+import json
+
+import pytest
+
+from phd2_exporter.decoding import (
+    DECODER_NAMES,
+    available_decoders,
+    get_decoder,
+)
+
+LINE = b'{"Event": "GuideStep", "dx": 0.5, "RALimited": false, "Frame": 7}'
+
+
+def test_get_decoder_json():
+    """Test the standard library decoder is always available."""
+    name, decode = get_decoder("json")
+    assert name == "json"
+    assert decode is json.loads
+
+
+def test_get_decoder_auto():
+    """Test auto picks the first available decoder in preferred order."""
+    name, _ = get_decoder()
+    assert name == available_decoders()[0]
+    assert name in DECODER_NAMES
+
+
+def test_get_decoder_unknown():
+    """Test unknown decoders are rejected."""
+    with pytest.raises(ValueError, match="Unknown JSON decoder"):
+        get_decoder("yaml")
+
+
+@pytest.mark.parametrize("name", available_decoders())
+def test_decoders_agree(name):
+    """Test every available decoder gives the same result as json."""
+    _, decode = get_decoder(name)
+    assert decode(LINE) == json.loads(LINE)
+
+
+@pytest.mark.parametrize("name", available_decoders())
+def test_decoders_invalid_json(name):
+    """Test every available decoder raises ValueError for invalid JSON."""
+    _, decode = get_decoder(name)
+    with pytest.raises(ValueError):
+        decode(b'{"Event": "GuideStep", "dx": ')
+
+
+def test_get_decoder_not_installed():
+    """Test requesting a decoder that is not installed."""
+    missing = [name for name in DECODER_NAMES if name not in available_decoders()]
+    if not missing:
+        pytest.skip("all decoders installed")
+    with pytest.raises(ValueError, match="not installed"):
+        get_decoder(missing[0])
@@ -0,0 +1,91 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for GuideStep distributions."""
+
+import pytest
+
+from phd2_exporter.distribution import (
+    ERROR_BUCKETS,
+    METRIC_GUIDE_ERROR,
+    METRIC_GUIDE_HFD,
+    METRIC_GUIDE_PULSE,
+    METRIC_GUIDE_SNR,
+    observe_guide_step,
+    parse_buckets,
+)
+from phd2_exporter.state import PHD2State
+
+GUIDE_STEP = {
+    "Event": "GuideStep",
+    "RADistanceRaw": -0.5,
+    "DECDistanceRaw": 0.25,
+    "RADuration": 120,
+    "DECDuration": 0,
+    "HFD": 2.5,
+    "SNR": 42.0,
+}
+
+
+def error_histogram(state: PHD2State, source: str, scale: str):
+    """Get the guide error histogram for a source and scale."""
+    return state.histograms.get(
+        (METRIC_GUIDE_ERROR, (("source", source), ("scale", scale)))
+    )
+
+
+def test_parse_buckets():
+    """Test parsing bucket bounds."""
+    assert parse_buckets("0.1, 0.5,1") == (0.1, 0.5, 1.0)
+
+
+@pytest.mark.parametrize("spec", ["", "a,b", "0,1", "1,0.5", "0.5,0.5"])
+def test_parse_buckets_invalid(spec):
+    """Test invalid bucket bounds are rejected."""
+    with pytest.raises(ValueError):
+        parse_buckets(spec)
+
+
+def test_observe_guide_step_px():
+    """Test every value is observed, guide error as distance in px."""
+    state = PHD2State()
+    observe_guide_step(state, GUIDE_STEP)
+
+    ra = error_histogram(state, "RADistanceRaw", "px")
+    assert ra.count == 1
+    assert ra.sum == 0.5
+    assert ra.bounds == ERROR_BUCKETS["px"]
+    assert error_histogram(state, "DECDistanceRaw", "px").sum == 0.25
+    # no pixel scale yet
+    assert error_histogram(state, "RADistanceRaw", "arcsec") is None
+
+    pulse = state.histograms[(METRIC_GUIDE_PULSE, (("source", "RADuration"),))]
+    assert pulse.sum == pytest.approx(0.12)
+    assert state.histograms[(METRIC_GUIDE_HFD, ())].sum == 2.5
+    assert state.histograms[(METRIC_GUIDE_SNR, ())].sum == 42.0
+
+
+def test_observe_guide_step_arcsec():
+    """Test guide error in arcsec with the pixel scale."""
+    state = PHD2State()
+    state.pixel_scale = 2.0
+    observe_guide_step(state, GUIDE_STEP)
+
+    arcsec = error_histogram(state, "RADistanceRaw", "arcsec")
+    assert arcsec.sum == 1.0
+    assert arcsec.bounds == ERROR_BUCKETS["arcsec"]
+
+
+def test_observe_guide_step_custom_buckets():
+    """Test configured buckets are used."""
+    state = PHD2State()
+    state.guide_error_buckets = {"px": (0.1, 1.0)}
+    observe_guide_step(state, GUIDE_STEP)
+
+    assert error_histogram(state, "RADistanceRaw", "px").counts == [0, 1, 0]
+
+
+def test_observe_guide_step_missing_values():
+    """Test missing and non numeric values are skipped."""
+    state = PHD2State()
+    observe_guide_step(state, {"Event": "GuideStep", "HFD": "n/a"})
+
+    assert state.histograms == {}
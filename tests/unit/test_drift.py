@@ -0,0 +1,112 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for drift estimation."""
+
+from unittest.mock import patch
+
+import pytest
+
+from phd2_exporter.drift import (
+    ARCMIN_PER_DRIFT,
+    DriftEstimator,
+    LinearFit,
+    handle_dither,
+    observe_drift,
+)
+from phd2_exporter.state import PHD2State
+
+
+def guided_frames(
+    ra_drift: float, dec_drift: float, frames: int, seconds: float = 2.0
+) -> list[dict]:
+    """GuideSteps of a mount drifting px per frame, each correcting half the error."""
+    steps = []
+    ra = dec = 0.0
+    for frame in range(frames):
+        ra += ra_drift
+        dec += dec_drift
+        ra_guide = ra * 0.5
+        dec_guide = dec * 0.5
+        steps.append(
+            {
+                "Event": "GuideStep",
+                "Timestamp": 1000.0 + frame * seconds,
+                "RADistanceRaw": ra,
+                "DECDistanceRaw": dec,
+                "RADistanceGuide": ra_guide,
+                "DECDistanceGuide": dec_guide,
+            }
+        )
+        # the correction moves the star back
+        ra -= ra_guide
+        dec -= dec_guide
+    return steps
+
+
+def test_linear_fit():
+    """Test the slope of points on a line."""
+    fit = LinearFit()
+    assert fit.slope() is None
+    fit.add(5.0, 1.0)
+    assert fit.slope() is None
+    for t in range(1, 5):
+        fit.add(5.0 + t, 1.0 + 0.5 * t)
+    assert fit.slope() == pytest.approx(0.5)
+
+
+def test_drift_estimator_removes_corrections():
+    """Test the drift is found although guiding keeps the raw error small."""
+    estimator = DriftEstimator()
+    for data in guided_frames(0.1, -0.05, 60):
+        estimator.add(data["Timestamp"], data)
+
+    # 0.1 px per 2 second frame
+    assert estimator.rate("RA") == pytest.approx(3.0)
+    assert estimator.rate("DEC") == pytest.approx(-1.5)
+
+
+def test_drift_estimator_not_enough_frames():
+    """Test no rate until the fit covers enough frames and time."""
+    estimator = DriftEstimator()
+    for data in guided_frames(0.1, 0.1, 20):
+        estimator.add(data["Timestamp"], data)
+
+    # 38 seconds
+    assert estimator.rate("RA") is None
+
+
+def test_observe_drift_publish():
+    """Test drift rates and polar alignment error are published."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    state.pixel_scale = 2.0
+
+    with patch("phd2_exporter.utils.metrics_utility") as mock_metrics:
+        for data in guided_frames(0.1, -0.05, 60):
+            observe_drift(state, data)
+
+    published = {
+        (call[0][0], call[0][2].get("axis"), call[0][2].get("scale")): call[0][1]
+        for call in mock_metrics.set.call_args_list
+    }
+    assert published[("phd2_drift_rate", "RA", "px")] == pytest.approx(3.0)
+    assert published[("phd2_drift_rate", "RA", "arcsec")] == pytest.approx(6.0)
+    assert published[("phd2_drift_rate", "DEC", "arcsec")] == pytest.approx(-3.0)
+    assert published[("phd2_polar_alignment_error_arcmin", None, None)] == (
+        pytest.approx(3.0 * ARCMIN_PER_DRIFT)
+    )
+
+
+def test_polar_alignment_factor():
+    """Test 1 arcsec/min of DEC drift is about 3.8 arcmin of polar alignment error."""
+    assert pytest.approx(3.81, abs=0.01) == ARCMIN_PER_DRIFT
+
+
+def test_handle_dither():
+    """Test a dither starts a new fit."""
+    state = PHD2State()
+    observe_drift(state, guided_frames(0.1, 0.1, 1)[0])
+    assert state.drift is not None
+
+    handle_dither(state, {"Event": "GuidingDithered"})
+
+    assert state.drift is None
@@ -3,7 +3,12 @@
 
 from unittest.mock import MagicMock, patch
 
-from phd2_exporter.events import handle_event
+from prometheus_client.samples import Sample
+
+from phd2_exporter.events import EVENT_SPECS, EVENTS, get_event_spec, handle_event
+from phd2_exporter.histogram import DistributionCollector
+from phd2_exporter.rmsstore import RmsStore, RmsWindow
+from phd2_exporter.sketch import get_summary
 from phd2_exporter.state import PHD2State
 
 
@@ -14,7 +19,8 @@ def test_handle_event_version():
 
     with (
         patch("phd2_exporter.events.get_state", return_value=state),
-        patch("phd2_exporter.events.request_pixel_scale"),
+        patch("phd2_exporter.events.send_requests"),
+        patch("phd2_exporter.utils.metrics_utility"),
     ):
         data = {"Event": "Version", "Host": "TestHost", "Inst": 1}
         handle_event(mock_socket, data)
@@ -22,6 +28,26 @@ def test_handle_event_version():
         assert state.global_labels == {"host": "testhost", "inst": 1}
 
 
+def test_handle_event_labels_changed():
+    """Test series of the previous labels are dropped when the labels change."""
+    state = PHD2State()
+    state.set_global_labels("oldhost", 1)
+    collector = DistributionCollector()
+    collector.set_counter("test", (("host", "oldhost"), ("inst", "1")), 1.0)
+
+    with (
+        patch("phd2_exporter.events.get_state", return_value=state),
+        patch("phd2_exporter.events.send_requests"),
+        patch("phd2_exporter.histogram.collector", collector),
+        patch("phd2_exporter.utils.metrics_utility"),
+    ):
+        handle_event(MagicMock(), {"Event": "Version", "Host": "OldHost", "Inst": 1})
+        assert "test" in collector.counters
+        handle_event(MagicMock(), {"Event": "Version", "Host": "NewHost", "Inst": 1})
+
+    assert collector.counters == {}
+
+
 def test_handle_event_app_state():
     """Test handling AppState event."""
     state = PHD2State()
@@ -29,11 +55,8 @@ def test_handle_event_app_state():
 
     with (
         patch("phd2_exporter.events.get_state", return_value=state),
-        patch("phd2_exporter.events.request_pixel_scale"),
-        patch("phd2_exporter.events.request_connected"),
-        patch("phd2_exporter.events.request_current_equipment"),
-        patch("phd2_exporter.events.utility_set"),
-        patch("phd2_exporter.events.utility_inc"),
+        patch("phd2_exporter.events.send_requests"),
+        patch("phd2_exporter.utils.metrics_utility"),
     ):
         data = {"Event": "AppState", "Host": "TestHost", "Inst": 1, "State": "Looping"}
         handle_event(mock_socket, data)
@@ -46,21 +69,28 @@ def test_handle_event_looping_exposures_stopped():
     """Test handling LoopingExposuresStopped event."""
     state = PHD2State()
     state.set_global_labels("testhost", 1)
-    state.phd_rms_data = {"test": [1, 2, 3]}
+    state.phd_rms_data = RmsStore(["test"], [RmsWindow("live", samples=3)])
+    get_summary(state, "phd2_session_star_mass").add(1000)
+    collector = DistributionCollector()
     mock_socket = MagicMock()
 
     with (
         patch("phd2_exporter.events.get_state", return_value=state),
-        patch("phd2_exporter.events.request_connected"),
-        patch("phd2_exporter.events.request_current_equipment"),
-        patch("phd2_exporter.events.utility_set"),
-        patch("phd2_exporter.events.utility_inc"),
+        patch("phd2_exporter.events.send_requests"),
+        patch("phd2_exporter.utils.metrics_utility"),
+        patch("phd2_exporter.sketch.collector", collector),
     ):
         data = {"Event": "LoopingExposuresStopped"}
         handle_event(mock_socket, data)
 
         assert state.phd_state == "Stopped"
-        assert state.phd_rms_data == {}
+        assert state.phd_rms_data is None
+        # the finished session is published before the sketches are reset
+        assert state.sketches == {}
+        _, count, _ = collector.summaries["phd2_session_star_mass"][
+            (("host", "testhost"), ("inst", "1"))
+        ]
+        assert count == 1
 
 
 def test_handle_event_lock_position_set():
@@ -71,8 +101,7 @@ def test_handle_event_lock_position_set():
 
     with (
         patch("phd2_exporter.events.get_state", return_value=state),
-        patch("phd2_exporter.events.utility_set"),
-        patch("phd2_exporter.events.utility_inc"),
+        patch("phd2_exporter.utils.metrics_utility"),
     ):
         data = {"Event": "LockPositionSet", "X": 100, "Y": 200}
         handle_event(mock_socket, data)
@@ -90,8 +119,7 @@ def test_handle_event_guide_step():
     with (
         patch("phd2_exporter.events.get_state", return_value=state),
         patch("phd2_exporter.events.collect_rms_data", return_value=False),
-        patch("phd2_exporter.events.utility_set"),
-        patch("phd2_exporter.events.utility_inc"),
+        patch("phd2_exporter.utils.metrics_utility"),
     ):
         data = {
             "Event": "GuideStep",
@@ -116,6 +144,7 @@ def test_handle_event_guide_step():
         handle_event(mock_socket, data)
 
         assert state.phd_state == "Guiding"
+        assert ("phd2_guide_hfd", ()) in state.histograms
 
 
 def test_handle_event_guide_step_settling():
@@ -128,8 +157,7 @@ def test_handle_event_guide_step_settling():
     with (
         patch("phd2_exporter.events.get_state", return_value=state),
         patch("phd2_exporter.events.collect_rms_data") as mock_collect,
-        patch("phd2_exporter.events.utility_set"),
-        patch("phd2_exporter.events.utility_inc"),
+        patch("phd2_exporter.utils.metrics_utility"),
     ):
         data = {
             "Event": "GuideStep",
@@ -142,8 +170,9 @@ def test_handle_event_guide_step_settling():
         }
         handle_event(mock_socket, data)
 
-        # Should not collect RMS during settling
+        # Should not collect RMS or distributions during settling
         mock_collect.assert_not_called()
+        assert state.histograms == {}
 
 
 def test_handle_event_star_lost():
@@ -154,8 +183,7 @@ def test_handle_event_star_lost():
 
     with (
         patch("phd2_exporter.events.get_state", return_value=state),
-        patch("phd2_exporter.events.utility_set"),
-        patch("phd2_exporter.events.utility_inc"),
+        patch("phd2_exporter.utils.metrics_utility"),
     ):
         data = {
             "Event": "StarLost",
@@ -177,8 +205,7 @@ def test_handle_event_settling():
 
     with (
         patch("phd2_exporter.events.get_state", return_value=state),
-        patch("phd2_exporter.events.utility_set"),
-        patch("phd2_exporter.events.utility_inc"),
+        patch("phd2_exporter.utils.metrics_utility"),
     ):
         data = {"Event": "SettleBegin"}
         handle_event(mock_socket, data)
@@ -202,8 +229,7 @@ def test_handle_event_calibrating():
 
     with (
         patch("phd2_exporter.events.get_state", return_value=state),
-        patch("phd2_exporter.events.utility_set"),
-        patch("phd2_exporter.events.utility_inc"),
+        patch("phd2_exporter.utils.metrics_utility"),
     ):
         data = {
             "Event": "Calibrating",
@@ -226,8 +252,7 @@ def test_handle_event_paused():
 
     with (
         patch("phd2_exporter.events.get_state", return_value=state),
-        patch("phd2_exporter.events.utility_set"),
-        patch("phd2_exporter.events.utility_inc"),
+        patch("phd2_exporter.utils.metrics_utility"),
     ):
         data = {"Event": "Paused"}
         handle_event(mock_socket, data)
@@ -254,14 +279,160 @@ def test_handle_event_status_metrics():
 
     with (
         patch("phd2_exporter.events.get_state", return_value=state),
-        patch("phd2_exporter.events.utility_set") as mock_set,
-        patch("phd2_exporter.events.utility_inc"),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
     ):
         data = {"Event": "GuideStep"}
         handle_event(mock_socket, data)
 
         # Should set status for all APP_STATES + Settling
         status_calls = [
-            call for call in mock_set.call_args_list if call[0][0] == "phd2_status"
+            call
+            for call in mock_metrics.set.call_args_list
+            if call[0][0] == "phd2_status"
         ]
         assert len(status_calls) == 8  # 7 APP_STATES + Settling
+
+
+def test_handle_event_status_only_on_transition():
+    """Test that status metrics are only updated when the status changes."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    # state time follows the exporter's clock, not PHD2's Timestamp
+    clock = iter([200.0, 203.0, 205.0])
+    state.clock = lambda: next(clock)
+    collector = DistributionCollector()
+    mock_socket = MagicMock()
+
+    def status_calls(mock_metrics):
+        return [
+            call
+            for call in mock_metrics.set.call_args_list
+            if call[0][0] == "phd2_status"
+        ]
+
+    with (
+        patch("phd2_exporter.events.get_state", return_value=state),
+        patch("phd2_exporter.events.collect_rms_data", return_value=False),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
+        patch("phd2_exporter.histogram.collector", collector),
+    ):
+        handle_event(mock_socket, {"Event": "GuideStep", "Timestamp": 100.0})
+        assert len(status_calls(mock_metrics)) == 8
+
+        mock_metrics.reset_mock()
+        handle_event(mock_socket, {"Event": "GuideStep", "Timestamp": 101.0})
+        assert status_calls(mock_metrics) == []
+
+        mock_metrics.reset_mock()
+        handle_event(mock_socket, {"Event": "Paused", "Timestamp": 102.0})
+        calls = status_calls(mock_metrics)
+        assert len(calls) == 2
+        values = {call[0][2]["status"]: call[0][1] for call in calls}
+        assert values == {"Guiding": 0, "Paused": 1}
+        mock_metrics.inc.assert_any_call(
+            "phd2_state_transitions",
+            {"host": "testhost", "inst": 1, "status": "Paused"},
+        )
+        (family,) = collector.collect()
+        assert family.type == "counter"
+        guiding = {"host": "testhost", "inst": "1", "status": "Guiding"}
+        assert Sample("phd2_state_seconds_total", guiding, 5.0) in family.samples
+
+
+def test_event_specs_compiled():
+    """Test every supported event has its counter name resolved."""
+    assert set(EVENT_SPECS) == set(EVENTS)
+    for event, spec in EVENTS.items():
+        assert EVENT_SPECS[event].counter == f"phd2_{event}"
+        assert spec.counter == ""
+
+
+def test_unknown_event_spec_not_kept():
+    """Test unknown events are counted without growing the spec table."""
+    spec = get_event_spec("SomeFutureEvent")
+
+    assert spec.counter == "phd2_SomeFutureEvent"
+    assert "SomeFutureEvent" not in EVENT_SPECS
+
+
+def test_handle_event_rpc_follow_ups():
+    """Test JSONRPC follow-ups are requested for configuration events."""
+    state = PHD2State()
+    mock_socket = MagicMock()
+
+    with (
+        patch("phd2_exporter.events.get_state", return_value=state),
+        patch("phd2_exporter.events.send_requests") as mock_send,
+    ):
+        handle_event(mock_socket, {"Event": "ConfigurationChange"})
+
+        mock_send.assert_called_once_with(
+            mock_socket,
+            ("get_pixel_scale", "get_connected", "get_current_equipment"),
+            refresh=True,
+        )
+
+
+def test_handle_event_alert():
+    """Test Alert events are counted by type."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    mock_socket = MagicMock()
+
+    with (
+        patch("phd2_exporter.events.get_state", return_value=state),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
+    ):
+        handle_event(mock_socket, {"Event": "Alert", "Msg": "x", "Type": "warning"})
+
+        mock_metrics.inc.assert_any_call(
+            "phd2_Alert", {"host": "testhost", "inst": 1, "Type": "warning"}
+        )
+
+
+def test_handle_event_guide_param_change():
+    """Test numeric guide parameter changes are exported by name."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    mock_socket = MagicMock()
+
+    with (
+        patch("phd2_exporter.events.get_state", return_value=state),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
+    ):
+        handle_event(
+            mock_socket,
+            {"Event": "GuideParamChange", "Name": "Aggressiveness", "Value": 70},
+        )
+        handle_event(
+            mock_socket,
+            {"Event": "GuideParamChange", "Name": "Algorithm", "Value": "Hysteresis"},
+        )
+
+        value_calls = [
+            call
+            for call in mock_metrics.set.call_args_list
+            if call[0][0] == "phd2_GuideParamChange_Value"
+        ]
+        assert len(value_calls) == 1
+        assert value_calls[0][0][1] == 70
+        assert value_calls[0][0][2]["Name"] == "Aggressiveness"
+
+
+def test_handle_event_unknown():
+    """Test unknown events are only counted."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    state.phd_state = "Guiding"
+    mock_socket = MagicMock()
+
+    with (
+        patch("phd2_exporter.events.get_state", return_value=state),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
+    ):
+        handle_event(mock_socket, {"Event": "SomethingNew"})
+
+        assert state.phd_state == "Guiding"
+        mock_metrics.inc.assert_any_call(
+            "phd2_SomethingNew", {"host": "testhost", "inst": 1}
+        )
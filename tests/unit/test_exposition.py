@@ -0,0 +1,138 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for the cached metrics exposition."""
+
+import gzip
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import CollectorRegistry, Gauge
+
+from phd2_exporter.exposition import (
+    ExpositionCache,
+    accepts_gzip,
+    make_handler,
+    start_metrics_server,
+)
+from phd2_exporter.utils import get_generation, utility_set
+
+
+@pytest.fixture
+def registry() -> tuple[CollectorRegistry, Gauge]:
+    """Registry with one gauge."""
+    registry = CollectorRegistry()
+    gauge = Gauge("phd2_test", "test gauge", registry=registry)
+    return registry, gauge
+
+
+def update(gauge: Gauge, value: float) -> None:
+    """Set the gauge the way metric updates do, bumping the generation."""
+    with patch("phd2_exporter.utils.metrics_utility"):
+        utility_set("phd2_test", value, {})
+    gauge.set(value)
+
+
+def test_generation_counts_updates():
+    """Test every metric update bumps the generation."""
+    generation = get_generation()
+    with patch("phd2_exporter.utils.metrics_utility"):
+        utility_set("phd2_test", 1, {})
+    assert get_generation() == generation + 1
+
+
+def test_cache_renders_once_per_generation(registry):
+    """Test repeated scrapes are served from the cache until metrics change."""
+    registry, gauge = registry
+    cache = ExpositionCache(registry, min_interval=0)
+    update(gauge, 1.5)
+
+    text = cache.get()
+    assert b"phd2_test 1.5" in text
+    assert cache.get() is text
+    assert cache.renders == 1
+    assert cache.hits == 1
+
+    update(gauge, 2.5)
+    assert b"phd2_test 2.5" in cache.get()
+    assert cache.renders == 2
+
+
+def test_cache_min_interval(registry):
+    """Test updates are rendered at most once per interval."""
+    registry, gauge = registry
+    cache = ExpositionCache(registry, min_interval=10.0)
+    update(gauge, 1.5)
+
+    with patch("phd2_exporter.exposition.time.monotonic", return_value=100.0):
+        cache.get()
+    update(gauge, 2.5)
+    with patch("phd2_exporter.exposition.time.monotonic", return_value=105.0):
+        assert b"phd2_test 1.5" in cache.get()
+    with patch("phd2_exporter.exposition.time.monotonic", return_value=110.0):
+        assert b"phd2_test 2.5" in cache.get()
+    assert cache.renders == 2
+
+
+def test_cache_gzip(registry):
+    """Test the compressed text is cached with the text."""
+    registry, gauge = registry
+    cache = ExpositionCache(registry, min_interval=0)
+    update(gauge, 1.5)
+
+    compressed = cache.get(compressed=True)
+    assert gzip.decompress(compressed) == cache.get()
+    assert cache.get(compressed=True) is compressed
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        (None, False),
+        ("", False),
+        ("gzip", True),
+        ("deflate, GZIP;q=0.5", True),
+        ("identity", False),
+        ("gzip;q=0", False),
+    ],
+)
+def test_accepts_gzip(header, expected):
+    """Test Accept-Encoding parsing."""
+    assert accepts_gzip(header) is expected
+
+
+def test_metrics_server(registry):
+    """Test scrapes get the exposition, compressed when accepted."""
+    registry, gauge = registry
+    update(gauge, 1.5)
+    server = start_metrics_server(0, "127.0.0.1")
+    # serve the test registry
+    server.RequestHandlerClass = make_handler(ExpositionCache(registry))
+    url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+    try:
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert b"phd2_test 1.5" in response.read()
+
+        request = urllib.request.Request(url, headers={"Accept-Encoding": "gzip"})
+        with urllib.request.urlopen(request) as response:
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert b"phd2_test 1.5" in gzip.decompress(response.read())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_metrics_server_debug_disabled(registry):
+    """Test debug paths are not served unless asked for."""
+    registry, _ = registry
+    server = start_metrics_server(0, "127.0.0.1")
+    server.RequestHandlerClass = make_handler(ExpositionCache(registry))
+    url = f"http://127.0.0.1:{server.server_address[1]}/debug/stats"
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url)
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,211 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for the guiding frame store."""
+
+import contextlib
+import errno
+import math
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from phd2_exporter.frames import (
+    FORMAT_BINARY,
+    FORMAT_PARQUET,
+    BinaryWriter,
+    FrameSink,
+    get_format,
+    read_frames,
+    record_frame,
+)
+from phd2_exporter.state import PHD2State
+
+
+def guide_step(frame: int) -> dict:
+    """GuideStep event of a frame."""
+    return {
+        "Event": "GuideStep",
+        "Frame": frame,
+        "Timestamp": 1700000000.25 + frame * 2,
+        "dx": 0.5,
+        "dy": -0.25,
+        "RADistanceRaw": 0.1 * frame,
+        "DECDistanceRaw": 0.2,
+        "RADistanceGuide": 0.05,
+        "DECDistanceGuide": 0.1,
+        "RADuration": 120,
+        "DECDuration": 0,
+        "StarMass": 15000,
+        "SNR": 42.5,
+        "HFD": 2.25,
+    }
+
+
+def test_get_format():
+    """Test format selection."""
+    assert get_format() in (FORMAT_PARQUET, FORMAT_BINARY)
+    assert get_format(FORMAT_BINARY) == FORMAT_BINARY
+    with pytest.raises(ValueError, match="Unknown frames format"):
+        get_format("csv")
+
+
+def test_sink_buffers_until_batch_full(tmp_path):
+    """Test frames are only queued once a batch is full."""
+    # not started, nothing drains the queue
+    sink = FrameSink(tmp_path, "phd2-test", FORMAT_BINARY, batch_rows=3)
+    sink.append(guide_step(1), False)
+    sink.append(guide_step(2), False)
+    assert sink.queue.empty()
+    assert sink.rows == 2
+
+    sink.append(guide_step(3), False)
+    assert sink.queue.qsize() == 1
+    assert sink.rows == 0
+
+
+def test_sink_writes_readable_frames(tmp_path):
+    """Test written frames are read back column by column."""
+    sink = FrameSink(tmp_path, "phd2-test", FORMAT_BINARY, batch_rows=2)
+    sink.start()
+    for frame in range(1, 6):
+        sink.append(guide_step(frame), frame == 3)
+    # missing fields are NaN
+    sink.append({"Event": "GuideStep", "Frame": 6, "Timestamp": 1700000012.25}, False)
+    sink.close()
+
+    assert len(sink.files) == 1
+    frames = read_frames(sink.files[0])
+    assert list(frames["Frame"]) == [1, 2, 3, 4, 5, 6]
+    assert list(frames["Settling"]) == [0, 0, 1, 0, 0, 0]
+    # timestamps keep full precision, the rest are float32
+    assert frames["Timestamp"][0] == 1700000002.25
+    assert frames["RADistanceRaw"][4] == pytest.approx(0.5)
+    assert frames["SNR"][0] == 42.5
+    assert math.isnan(frames["HFD"][5])
+
+
+def test_sink_rotates_per_session(tmp_path):
+    """Test a new file is started after a session ends."""
+    sink = FrameSink(tmp_path, "phd2-test", FORMAT_BINARY)
+    sink.start()
+    sink.append(guide_step(1), False)
+    sink.rotate()
+    # nothing new, no empty file
+    sink.rotate()
+    sink.append(guide_step(2), False)
+    sink.append(guide_step(3), False)
+    sink.close()
+
+    assert len(sink.files) == 2
+    assert list(read_frames(sink.files[0])["Frame"]) == [1]
+    assert list(read_frames(sink.files[1])["Frame"]) == [2, 3]
+
+
+def test_sink_drops_when_full(tmp_path):
+    """Test batches are dropped instead of blocking when the queue is full."""
+    sink = FrameSink(tmp_path, "phd2-test", FORMAT_BINARY, batch_rows=1, queue_size=1)
+    assert sink.append(guide_step(1), False) is True
+    assert sink.append(guide_step(2), False) is False
+    assert sink.dropped == 1
+
+
+def test_sink_flushes_on_interval(tmp_path):
+    """Test buffered frames are written once the flush interval passed."""
+    sink = FrameSink(tmp_path, "phd2-test", FORMAT_BINARY, flush_interval=300.0)
+    sink.start()
+    with patch("phd2_exporter.frames.time.monotonic", return_value=sink.flushed):
+        sink.append(guide_step(1), False)
+    assert sink.rows == 1
+    with patch(
+        "phd2_exporter.frames.time.monotonic", return_value=sink.flushed + 300.0
+    ):
+        sink.append(guide_step(2), False)
+    assert sink.rows == 0
+
+    # readable while the file is still open, once the writer got to it
+    deadline = time.monotonic() + 2.0
+    frames: list[int] = []
+    while frames != [1, 2] and time.monotonic() < deadline:
+        time.sleep(0.01)
+        with contextlib.suppress(IndexError, ValueError):
+            frames = list(read_frames(sink.files[0]).get("Frame", []))
+    assert frames == [1, 2]
+    sink.close()
+
+
+def test_sink_survives_write_errors(tmp_path, capsys):
+    """Test close returns and failed batches are counted on a full disk."""
+    sink = FrameSink(tmp_path, "phd2-test", FORMAT_BINARY, batch_rows=1)
+    with patch.object(
+        BinaryWriter,
+        "write",
+        side_effect=OSError(errno.ENOSPC, "No space left on device"),
+    ):
+        sink.start()
+        for frame in range(1, 8):
+            sink.append(guide_step(frame), False)
+        sink.close()
+
+    assert sink.failed == 7
+    assert sink.dropped == 0
+    # reported once, not for every batch
+    assert capsys.readouterr().out.count("No space left on device") == 1
+
+
+def test_read_frames_rejects_other_files(tmp_path):
+    """Test files that are not binary frames files are rejected."""
+    path = tmp_path / "capture.txt"
+    path.write_bytes(b'{"Event": "Version"}\r\n')
+    with pytest.raises(ValueError, match="not a binary frames file"):
+        read_frames(path)
+
+
+def test_sink_writes_parquet(tmp_path):
+    """Test frames written to Parquet."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    sink = FrameSink(tmp_path, "phd2-test", FORMAT_PARQUET, batch_rows=2)
+    sink.start()
+    for frame in range(1, 4):
+        sink.append(guide_step(frame), False)
+    sink.close()
+
+    table = pq.read_table(sink.files[0])
+    assert table.column("Frame").to_pylist() == [1, 2, 3]
+    assert table.column("SNR").to_pylist() == [42.5] * 3
+
+
+def test_record_frame():
+    """Test GuideSteps go to the state's sink with the settling flag."""
+    state = PHD2State()
+    # not enabled
+    record_frame(state, guide_step(1))
+
+    state.frames = MagicMock()
+    state.phd_settling = True
+    record_frame(state, guide_step(1))
+    state.frames.append.assert_called_once_with(guide_step(1), True)
+
+
+def test_record_frame_counts_dropped():
+    """Test dropped batches are counted."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    state.frames = MagicMock()
+    state.frames.append.return_value = False
+
+    with patch("phd2_exporter.utils.metrics_utility") as mock_metrics:
+        record_frame(state, guide_step(1))
+
+    mock_metrics.inc.assert_called_once_with(
+        "phd2_frames_dropped", {"host": "testhost", "inst": 1}
+    )
+
+
+def test_reset_session_rotates_frames():
+    """Test a frames file covers one guiding session."""
+    state = PHD2State()
+    state.frames = MagicMock()
+
+    state.reset_session()
+
+    state.frames.rotate.assert_called_once_with()
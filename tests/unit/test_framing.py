@@ -0,0 +1,87 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for line framing."""
+
+import json
+
+import pytest
+
+from phd2_exporter.framing import LineFramer
+
+
+def test_feed_complete_lines():
+    """Test feeding complete lines."""
+    framer = LineFramer()
+    lines = framer.feed(b'{"a": 1}\r\n{"b": 2}\r\n')
+    assert lines == [b'{"a": 1}', b'{"b": 2}']
+    assert len(framer) == 0
+
+
+def test_feed_partial_line_carried_over():
+    """Test that a line split across reads is returned once complete."""
+    framer = LineFramer()
+    assert framer.feed(b'{"Event": "Guide') == []
+    assert len(framer) == len(b'{"Event": "Guide')
+    lines = framer.feed(b'Step"}\r\n{"Event"')
+    assert lines == [b'{"Event": "GuideStep"}']
+    assert framer.feed(b': "Paused"}\r\n') == [b'{"Event": "Paused"}']
+
+
+def test_feed_delimiter_split_across_reads():
+    """Test a CRLF delimiter split between two reads."""
+    framer = LineFramer()
+    assert framer.feed(b'{"a": 1}\r') == []
+    assert framer.feed(b'\n{"b": 2}\r\n') == [b'{"a": 1}', b'{"b": 2}']
+
+
+def test_feed_skips_empty_lines():
+    """Test that empty lines are skipped."""
+    framer = LineFramer()
+    assert framer.feed(b'\r\n\r\n{"a": 1}\r\n\r\n') == [b'{"a": 1}']
+
+
+def test_feed_multibyte_character_split():
+    """Test a UTF-8 character split across reads is decoded intact."""
+    framer = LineFramer()
+    raw = json.dumps({"Host": "sternwärte"}, ensure_ascii=False).encode() + b"\r\n"
+    split = raw.index("ä".encode()) + 1
+    assert framer.feed(raw[:split]) == []
+    lines = framer.feed(raw[split:])
+    assert json.loads(lines[0]) == {"Host": "sternwärte"}
+
+
+def test_feed_byte_at_a_time():
+    """Test a stream fed one byte at a time yields every line."""
+    framer = LineFramer()
+    stream = b"".join(
+        json.dumps({"Event": "GuideStep", "Frame": i}).encode() + b"\r\n"
+        for i in range(20)
+    )
+    lines = []
+    for i in range(len(stream)):
+        lines.extend(framer.feed(stream[i : i + 1]))
+    assert [json.loads(line)["Frame"] for line in lines] == list(range(20))
+
+
+def test_feed_line_too_long():
+    """Test that an unterminated line beyond the limit raises."""
+    framer = LineFramer(max_line_length=16)
+    with pytest.raises(ValueError):
+        framer.feed(b"x" * 17)
+    assert len(framer) == 0
+
+
+def test_feed_remainder_too_long():
+    """Test that a partial line after complete lines is also limited."""
+    framer = LineFramer(max_line_length=16)
+    with pytest.raises(ValueError):
+        framer.feed(b'{"a": 1}\r\n' + b"x" * 17)
+    assert len(framer) == 0
+    assert framer.feed(b"x" * 16) == []
+
+
+def test_clear():
+    """Test clearing a partial line."""
+    framer = LineFramer()
+    framer.feed(b'{"partial"')
+    framer.clear()
+    assert framer.feed(b'{"a": 1}\r\n') == [b'{"a": 1}']
@@ -0,0 +1,219 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for histograms."""
+
+from collections.abc import Iterator
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import CollectorRegistry, generate_latest
+
+from phd2_exporter.histogram import (
+    HISTOGRAM_INTERVAL,
+    INF,
+    DistributionCollector,
+    Histogram,
+    drop_series,
+    get_histogram,
+    publish_counter,
+    publish_histograms,
+)
+from phd2_exporter.sketch import get_summary
+from phd2_exporter.state import PHD2State
+
+
+@pytest.fixture
+def collector() -> Iterator[DistributionCollector]:
+    """Collector histograms are published to in place of the shared one."""
+    collector = DistributionCollector()
+    with patch("phd2_exporter.histogram.collector", collector):
+        yield collector
+
+
+def published(collector: DistributionCollector) -> dict[tuple, float]:
+    """Published values by sample name and le label."""
+    return {
+        (sample.name, sample.labels.get("le")): sample.value
+        for family in collector.collect()
+        for sample in family.samples
+    }
+
+
+def test_histogram_observe():
+    """Test observations land in the first bucket with a bound >= value."""
+    histogram = Histogram("test", (1.0, 2.0))
+    for value in [0.5, 1.0, 1.5, 3.0]:
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.sum == pytest.approx(6.0)
+    assert histogram.count == 4
+    assert histogram.dirty is True
+
+
+def test_histogram_publish(collector):
+    """Test cumulative bucket, sum and count series of a histogram family."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    histogram = Histogram("test", (1.0, 2.0), (("stage", "queue"),))
+    for value in [0.5, 1.5, 3.0]:
+        histogram.observe(value)
+
+    histogram.publish(state)
+
+    (family,) = collector.collect()
+    assert family.type == "histogram"
+    assert published(collector) == {
+        ("test_bucket", "1.0"): 1,
+        ("test_bucket", "2.0"): 2,
+        ("test_bucket", "+Inf"): 3,
+        ("test_sum", None): pytest.approx(5.0),
+        ("test_count", None): 3,
+    }
+    assert family.samples[-1].labels == {
+        "host": "testhost",
+        "inst": "1",
+        "stage": "queue",
+    }
+    assert histogram.dirty is False
+
+
+def test_histogram_exposition(collector):
+    """Test histograms are exposed with the histogram TYPE."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    histogram = Histogram("phd2_test_seconds", (1.0,))
+    histogram.observe(0.5)
+    histogram.publish(state)
+    registry = CollectorRegistry()
+    registry.register(collector)
+
+    text = generate_latest(registry).decode()
+
+    assert "# TYPE phd2_test_seconds histogram" in text
+    assert 'phd2_test_seconds_bucket{host="testhost",inst="1",le="1.0"} 1.0' in text
+    assert "# TYPE phd2_test_seconds_bucket" not in text
+
+
+def test_publish_counter_exposition(collector):
+    """Test counters accumulated by the exporter are exposed as counters."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    publish_counter(state, "phd2_test_seconds", (("status", "Guiding"),), 12.5)
+    registry = CollectorRegistry()
+    registry.register(collector)
+
+    text = generate_latest(registry).decode()
+
+    assert "# TYPE phd2_test_seconds_total counter" in text
+    assert (
+        'phd2_test_seconds_total{host="testhost",inst="1",status="Guiding"} 12.5'
+        in text
+    )
+
+
+@pytest.mark.usefixtures("collector")
+def test_histogram_publish_pushed():
+    """Test the histogram series are pushed to the remote writer."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    histogram = Histogram("test", (1.0,))
+    histogram.observe(0.5)
+
+    with patch("phd2_exporter.utils._remote_writer") as mock_writer:
+        histogram.publish(state)
+
+    mock_writer.set.assert_any_call(
+        "test_bucket", 1, {"host": "testhost", "inst": "1", "le": "1.0"}
+    )
+    mock_writer.set.assert_any_call("test_count", 1, {"host": "testhost", "inst": "1"})
+
+
+def test_get_histogram_cached():
+    """Test histograms are created once per name and labels."""
+    state = PHD2State()
+    first = get_histogram(state, "test", (1.0,), (("event", "GuideStep"),))
+
+    assert get_histogram(state, "test", (1.0,), (("event", "GuideStep"),)) is first
+    assert get_histogram(state, "test", (1.0,), (("event", "Paused"),)) is not first
+
+
+def test_publish_histograms_interval(collector):
+    """Test only changed histograms are published, at most every interval."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    changed = get_histogram(state, "changed", (1.0,))
+    get_histogram(state, "unchanged", (1.0,))
+    changed.observe(0.5)
+
+    publish_histograms(state, 100.0)
+    assert set(collector.histograms) == {"changed"}
+
+    changed.observe(0.5)
+    publish_histograms(state, 100.0 + HISTOGRAM_INTERVAL / 2)
+    assert published(collector)[("changed_count", None)] == 1
+
+    publish_histograms(state, 100.0 + HISTOGRAM_INTERVAL)
+    assert published(collector)[("changed_count", None)] == 2
+
+
+def test_publish_histograms_no_labels(collector):
+    """Test nothing is published before global labels are set."""
+    state = PHD2State()
+    get_histogram(state, "test", (1.0,)).observe(0.5)
+
+    publish_histograms(state, 100.0)
+
+    assert collector.histograms == {}
+
+
+def test_publish_histograms_force(collector):
+    """Test forced publishing ignores the interval."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    state.histograms_published = 100.0
+    get_histogram(state, "test", (1.0,)).observe(0.5)
+
+    publish_histograms(state, 101.0)
+    assert collector.histograms == {}
+    publish_histograms(state, 101.0, force=True)
+
+    assert published(collector)[("test_count", None)] == 1
+
+
+def test_drop_series(collector):
+    """Test the series of one instance are dropped, families left empty too."""
+    collector.set_counter("test", (("host", "rig"), ("inst", "1"), ("s", "a")), 1.0)
+    collector.set_counter("test", (("host", "rig"), ("inst", "10")), 2.0)
+    collector.set_histogram("other", (("host", "rig"), ("inst", "1")), [(INF, 1)], 1.0)
+    collector.set_summary("other", (("host", "rig"), ("inst", "1")), [], 1, 1.0)
+
+    drop_series((("host", "rig"), ("inst", 1)))
+
+    assert collector.counters == {"test": {(("host", "rig"), ("inst", "10")): 2.0}}
+    assert collector.histograms == {}
+    assert collector.summaries == {}
+
+
+def test_publish_histograms_drops_previous_session(collector):
+    """Test the next session's first publish drops the previous session's summaries."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    with patch("phd2_exporter.sketch.collector", collector):
+        get_summary(state, "test", (("source", "RA"),)).add(1.0)
+        get_histogram(state, "latency", (1.0,)).observe(0.5)
+        publish_histograms(state, 100.0, force=True)
+
+        state.reset_session()
+        publish_histograms(state, 200.0, force=True)
+        # last session's values stay until the next one publishes
+        assert set(collector.summaries["test"]) == {
+            (("host", "testhost"), ("inst", "1"), ("source", "RA"))
+        }
+
+        get_summary(state, "test", (("source", "DEC"),)).add(1.0)
+        publish_histograms(state, 300.0, force=True)
+
+    assert set(collector.summaries["test"]) == {
+        (("host", "testhost"), ("inst", "1"), ("source", "DEC"))
+    }
+    assert "latency" in collector.histograms
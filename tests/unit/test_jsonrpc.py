@@ -1,42 +1,133 @@
 # Generated-by: Cursor (Claude Sonnet 4.5)
 """Unit tests for JSONRPC handling."""
 
+import json
 from unittest.mock import MagicMock, patch
 
+import pytest
+
 from phd2_exporter.jsonrpc import (
+    METRIC_RPC_LATENCY,
     callback_request_connected,
     callback_request_current_equipment,
+    callback_request_exposure,
+    callback_request_guide_output_enabled,
     callback_request_pixel_scale,
+    callback_request_settling,
+    expire_requests,
     handle_jsonrpc_response,
-    random_jrpc_request_id,
+    next_request_id,
     request_connected,
     request_current_equipment,
     request_pixel_scale,
+    reset_requests,
+    send_request,
+    send_requests,
 )
 from phd2_exporter.state import PHD2State
 
 
-def test_random_jrpc_request_id():
-    """Test random request ID generation."""
+def test_next_request_id():
+    """Test request IDs increase."""
     state = PHD2State()
+    assert next_request_id(state) == 1
+    assert next_request_id(state) == 2
+
+
+def test_send_request_pending():
+    """Test a sent request waits in the pending table."""
+    state = PHD2State()
+    callback = MagicMock()
+    mock_socket = MagicMock()
+
     with patch("phd2_exporter.jsonrpc.get_state", return_value=state):
-        id1 = random_jrpc_request_id()
-        id2 = random_jrpc_request_id()
+        request_id = send_request(mock_socket, "get_connected", callback)
+
+    pending = state.jrpc_pending[request_id]
+    assert pending.method == "get_connected"
+    assert pending.callback is callback
+    assert pending.deadline == pending.sent + state.jrpc_timeout
+    assert state.jrpc_methods == {"get_connected": request_id}
+    sent = json.loads(mock_socket.sendall.call_args[0][0])
+    assert sent == {"method": "get_connected", "id": request_id}
+
+
+def test_send_request_deduplicated():
+    """Test a method waiting for a response is not requested again."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    mock_socket = MagicMock()
+
+    with (
+        patch("phd2_exporter.jsonrpc.get_state", return_value=state),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
+    ):
+        id1 = send_request(mock_socket, "get_pixel_scale", MagicMock())
+        id2 = send_request(mock_socket, "get_pixel_scale", MagicMock())
+        id3 = send_request(mock_socket, "get_connected", MagicMock())
+
+    assert id1 == id2
+    assert id3 != id1
+    assert mock_socket.sendall.call_count == 2
+    mock_metrics.inc.assert_called_once_with(
+        "phd2_rpc_deduplicated",
+        {"host": "testhost", "inst": 1, "method": "get_pixel_scale"},
+    )
 
-        # IDs should be in range
-        assert 1 <= id1 <= 50000
-        assert 1 <= id2 <= 50000
 
-        # IDs should be unique
-        assert id1 != id2
+def test_expire_requests():
+    """Test requests past their deadline are dropped and counted."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    mock_socket = MagicMock()
+
+    with (
+        patch("phd2_exporter.jsonrpc.get_state", return_value=state),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
+    ):
+        request_id = send_request(mock_socket, "get_connected", MagicMock())
+        deadline = state.jrpc_pending[request_id].deadline
+
+        expire_requests(state, deadline - 1)
+        assert request_id in state.jrpc_pending
+
+        expire_requests(state, deadline)
 
+    assert state.jrpc_pending == {}
+    assert state.jrpc_methods == {}
+    mock_metrics.inc.assert_called_once_with(
+        "phd2_rpc_timeout", {"host": "testhost", "inst": 1, "method": "get_connected"}
+    )
+    mock_metrics.set.assert_called_with(
+        "phd2_rpc_outstanding", 0, {"host": "testhost", "inst": 1}
+    )
 
-def test_random_jrpc_request_id_registration():
-    """Test that request IDs are registered in callbacks."""
+
+def test_send_request_after_timeout():
+    """Test a method is requested again once its request expired."""
     state = PHD2State()
+    state.jrpc_timeout = 0.0
+    mock_socket = MagicMock()
+
+    with patch("phd2_exporter.jsonrpc.get_state", return_value=state):
+        id1 = send_request(mock_socket, "get_connected", MagicMock())
+        id2 = send_request(mock_socket, "get_connected", MagicMock())
+
+    assert id2 == id1 + 1
+    assert list(state.jrpc_pending) == [id2]
+    assert mock_socket.sendall.call_count == 2
+
+
+def test_reset_requests():
+    """Test pending requests are forgotten."""
+    state = PHD2State()
+
     with patch("phd2_exporter.jsonrpc.get_state", return_value=state):
-        request_id = random_jrpc_request_id()
-        assert request_id in state.jrpc_callbacks
+        send_request(MagicMock(), "get_connected", MagicMock())
+    reset_requests(state)
+
+    assert state.jrpc_pending == {}
+    assert state.jrpc_methods == {}
 
 
 def test_callback_request_pixel_scale():
@@ -49,13 +140,11 @@ def test_callback_request_pixel_scale():
         patch("phd2_exporter.jsonrpc.utility_set") as mock_set,
     ):
         data = {"result": 2.5, "id": 123}
-        state.jrpc_callbacks[123] = 123
 
         callback_request_pixel_scale(data)
 
         assert state.pixel_scale == 2.5
         mock_set.assert_called_once()
-        assert 123 not in state.jrpc_callbacks  # Should be unregistered
 
 
 def test_callback_request_connected():
@@ -68,12 +157,10 @@ def test_callback_request_connected():
         patch("phd2_exporter.jsonrpc.utility_set") as mock_set,
     ):
         data = {"result": True, "id": 123}
-        state.jrpc_callbacks[123] = 123
 
         callback_request_connected(data)
 
         mock_set.assert_called_once_with("phd2_connected", True, state.global_labels)
-        assert 123 not in state.jrpc_callbacks
 
 
 def test_callback_request_current_equipment():
@@ -83,7 +170,7 @@ def test_callback_request_current_equipment():
 
     with (
         patch("phd2_exporter.jsonrpc.get_state", return_value=state),
-        patch("phd2_exporter.jsonrpc.utility_set") as mock_set,
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
     ):
         data = {
             "result": {
@@ -94,7 +181,41 @@ def test_callback_request_current_equipment():
 
         callback_request_current_equipment(data)
 
-        assert mock_set.call_count == 2
+        assert mock_metrics.set.call_count == 2
+        mock_metrics.set.assert_any_call(
+            "phd2_current_equipment",
+            True,
+            {"host": "testhost", "inst": 1, "device": "camera"},
+        )
+
+
+@pytest.mark.parametrize(
+    ("callback", "result", "metric", "value"),
+    [
+        (callback_request_exposure, 2500, "phd2_exposure_seconds", 2.5),
+        (
+            callback_request_guide_output_enabled,
+            True,
+            "phd2_guide_output_enabled",
+            True,
+        ),
+        (callback_request_settling, False, "phd2_settling", False),
+    ],
+)
+def test_callback_request_polled(callback, result, metric, value):
+    """Test callbacks for polled methods."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+
+    with (
+        patch("phd2_exporter.jsonrpc.get_state", return_value=state),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
+    ):
+        callback({"result": result, "id": 1})
+
+    mock_metrics.set.assert_called_once_with(
+        metric, value, {"host": "testhost", "inst": 1}
+    )
 
 
 def test_request_pixel_scale():
@@ -111,6 +232,44 @@ def test_request_pixel_scale():
         assert "get_pixel_scale" in sent_data
 
 
+def test_send_requests():
+    """Test requesting several methods by name."""
+    state = PHD2State()
+    mock_socket = MagicMock()
+
+    with patch("phd2_exporter.jsonrpc.get_state", return_value=state):
+        send_requests(mock_socket, ("get_connected", "get_pixel_scale"))
+
+        sent = [
+            call[0][0].decode("utf-8") for call in mock_socket.sendall.call_args_list
+        ]
+        assert len(sent) == 2
+        assert "get_connected" in sent[0]
+        assert "get_pixel_scale" in sent[1]
+
+
+def test_send_requests_refresh():
+    """Test a refresh requests a method again while it waits for a response."""
+    state = PHD2State()
+    mock_socket = MagicMock()
+
+    with patch("phd2_exporter.jsonrpc.get_state", return_value=state):
+        send_requests(mock_socket, ("get_pixel_scale",))
+        send_requests(mock_socket, ("get_pixel_scale",))
+        assert mock_socket.sendall.call_count == 1
+        send_requests(mock_socket, ("get_pixel_scale",), refresh=True)
+        assert mock_socket.sendall.call_count == 2
+
+        # the stale response is handled first, the fresh one is kept
+        id1, id2 = state.jrpc_pending
+        handle_jsonrpc_response({"id": id1, "result": 1.5})
+        handle_jsonrpc_response({"id": id2, "result": 2.5})
+
+    assert state.pixel_scale == 2.5
+    assert state.jrpc_pending == {}
+    assert state.jrpc_methods == {}
+
+
 def test_request_connected():
     """Test connected request."""
     state = PHD2State()
@@ -141,13 +300,39 @@ def test_handle_jsonrpc_response():
     """Test JSONRPC response handling."""
     state = PHD2State()
     callback = MagicMock()
-    state.jrpc_callbacks[123] = callback
 
     with patch("phd2_exporter.jsonrpc.get_state", return_value=state):
-        data = {"jsonrpc": "2.0", "id": 123, "result": "test"}
+        request_id = send_request(MagicMock(), "get_connected", callback)
+        data = {"jsonrpc": "2.0", "id": request_id, "result": "test"}
         handle_jsonrpc_response(data)
 
-        callback.assert_called_once_with(data)
+    callback.assert_called_once_with(data)
+    assert state.jrpc_pending == {}
+    assert state.jrpc_methods == {}
+    latency = state.histograms[(METRIC_RPC_LATENCY, (("method", "get_connected"),))]
+    assert latency.count == 1
+
+
+def test_handle_jsonrpc_response_error():
+    """Test an error response is counted and does not call back."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    callback = MagicMock()
+
+    with (
+        patch("phd2_exporter.jsonrpc.get_state", return_value=state),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
+    ):
+        request_id = send_request(MagicMock(), "get_connected", callback)
+        handle_jsonrpc_response(
+            {"jsonrpc": "2.0", "id": request_id, "error": {"code": 1}}
+        )
+
+    callback.assert_not_called()
+    assert state.jrpc_pending == {}
+    mock_metrics.inc.assert_called_once_with(
+        "phd2_rpc_error", {"host": "testhost", "inst": 1, "method": "get_connected"}
+    )
 
 
 def test_handle_jsonrpc_response_no_id():
@@ -160,7 +345,7 @@ def test_handle_jsonrpc_response_no_id():
 
 
 def test_handle_jsonrpc_response_unknown_id():
-    """Test JSONRPC response with unknown ID."""
+    """Test JSONRPC response with unknown ID, e.g. after its request expired."""
     state = PHD2State()
 
     with patch("phd2_exporter.jsonrpc.get_state", return_value=state):
@@ -0,0 +1,51 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for event latency."""
+
+import pytest
+
+from phd2_exporter.latency import (
+    METRIC_LATENCY,
+    METRIC_PROCESSING,
+    NETWORK_LABELS,
+    QUEUE_LABELS,
+    TOTAL_LABELS,
+    observe_event,
+)
+from phd2_exporter.state import PHD2State
+
+
+def histogram(state, name, labels):
+    """Get a recorded histogram."""
+    return state.histograms[(name, labels)]
+
+
+def test_observe_event_stages():
+    """Test each stage is measured from the right timestamps."""
+    state = PHD2State()
+    data = {"Event": "GuideStep", "Timestamp": 100.0}
+    observe_event(state, data, received=100.5, started=100.75, elapsed=0.25)
+
+    assert histogram(state, METRIC_LATENCY, NETWORK_LABELS).sum == pytest.approx(0.5)
+    assert histogram(state, METRIC_LATENCY, QUEUE_LABELS).sum == pytest.approx(0.25)
+    assert histogram(state, METRIC_LATENCY, TOTAL_LABELS).sum == pytest.approx(1.0)
+    processing = histogram(state, METRIC_PROCESSING, (("event", "GuideStep"),))
+    assert processing.sum == pytest.approx(0.25)
+
+
+def test_observe_event_clock_offset():
+    """Test a PHD2 clock ahead of the exporter does not give negative latency."""
+    state = PHD2State()
+    observe_event(state, {"Event": "Paused", "Timestamp": 200.0}, 100.0, 100.0, 0.001)
+
+    assert histogram(state, METRIC_LATENCY, NETWORK_LABELS).sum == 0.0
+    assert histogram(state, METRIC_LATENCY, TOTAL_LABELS).sum == 0.0
+
+
+def test_observe_jsonrpc_response():
+    """Test responses without a Timestamp only record queue and processing time."""
+    state = PHD2State()
+    observe_event(state, {"jsonrpc": "2.0", "id": 1}, 100.0, 100.5, 0.001)
+
+    assert (METRIC_LATENCY, NETWORK_LABELS) not in state.histograms
+    assert histogram(state, METRIC_PROCESSING, (("event", "jsonrpc"),)).count == 1
+    assert histogram(state, METRIC_LATENCY, QUEUE_LABELS).count == 1
@@ -1,7 +1,17 @@
 # Generated-by: Cursor (Claude Sonnet 4.5)
 """Unit tests for main module."""
 
-from phd2_exporter.main import get_config
+from phd2_exporter.main import (
+    get_capture_sink,
+    get_config,
+    get_frame_sink,
+    get_guide_error_buckets,
+    get_instances,
+    get_periodic_error_window,
+    get_remote_writer,
+    get_rms_windows_config,
+)
+from phd2_exporter.rmsstore import RmsWindow
 
 
 def test_get_config_defaults():
@@ -60,3 +70,116 @@ def test_get_config_none_values():
     assert phd2port == 4400
     assert port == 9753
     assert rms_samples == 10
+
+
+def test_get_instances_default():
+    """Test get_instances with a single instance."""
+    assert get_instances("127.0.0.1", 4400, None) == [("127.0.0.1", 4400)]
+
+
+def test_get_instances_multiple():
+    """Test get_instances uses consecutive ports."""
+    instances = get_instances("192.168.1.100", 4400, 3)
+
+    assert instances == [
+        ("192.168.1.100", 4400),
+        ("192.168.1.100", 4401),
+        ("192.168.1.100", 4402),
+    ]
+
+
+def test_get_rms_windows_config_default():
+    """Test default RMS windows use rms_samples for the live window."""
+    windows = get_rms_windows_config({}, 10)
+
+    assert windows == [
+        RmsWindow("live", samples=10),
+        RmsWindow("5m", seconds=300.0),
+        RmsWindow("session"),
+    ]
+
+
+def test_get_rms_windows_config_custom():
+    """Test custom RMS windows."""
+    windows = get_rms_windows_config({"rms_windows": "short:5,night:session"}, 10)
+
+    assert windows == [RmsWindow("short", samples=5), RmsWindow("night")]
+
+
+def test_get_guide_error_buckets():
+    """Test only configured guide error buckets are returned."""
+    assert get_guide_error_buckets({}) == {}
+    assert get_guide_error_buckets({"guide_error_buckets_arcsec": "0.5,1,2"}) == {
+        "arcsec": (0.5, 1.0, 2.0)
+    }
+
+
+def test_get_periodic_error_window():
+    """Test periodic error window durations."""
+    assert get_periodic_error_window({}) == 7200.0
+    assert get_periodic_error_window({"periodic_error_window": "30m"}) == 1800.0
+    assert get_periodic_error_window({"periodic_error_window": "off"}) == 0.0
+
+
+def test_get_capture_sink_disabled():
+    """Test no capture without a capture directory."""
+    assert get_capture_sink({}, "127.0.0.1", 4400) is None
+
+
+def test_get_capture_sink(tmp_path):
+    """Test a capture sink per PHD2 instance."""
+    sink = get_capture_sink(
+        {"capture_dir": tmp_path, "capture_compression": "gzip"}, "127.0.0.1", 4401
+    )
+
+    assert sink is not None
+    assert sink.directory == tmp_path
+    assert sink.prefix == "phd2-127.0.0.1-4401"
+    assert sink.compression == "gzip"
+
+
+def test_get_frame_sink_disabled():
+    """Test no frames written without a frames directory."""
+    assert get_frame_sink({}, "127.0.0.1", 4400) is None
+
+
+def test_get_frame_sink(tmp_path):
+    """Test a frame sink per PHD2 instance."""
+    sink = get_frame_sink(
+        {
+            "frames_dir": tmp_path,
+            "frames_format": "binary",
+            "frames_batch": 100,
+            "frames_flush_interval": 60.0,
+        },
+        "127.0.0.1",
+        4401,
+    )
+
+    assert sink is not None
+    assert sink.directory == tmp_path
+    assert sink.prefix == "phd2-127.0.0.1-4401"
+    assert sink.format == "binary"
+    assert sink.batch_rows == 100
+    assert sink.flush_interval == 60.0
+
+
+def test_get_remote_writer_disabled():
+    """Test no push without a remote-write URL."""
+    assert get_remote_writer({}) is None
+
+
+def test_get_remote_writer(tmp_path):
+    """Test the remote writer configuration."""
+    writer = get_remote_writer(
+        {
+            "remote_write_url": "http://prometheus:9090/api/v1/write",
+            "remote_write_spool": tmp_path,
+            "remote_write_interval": 30.0,
+        }
+    )
+
+    assert writer is not None
+    assert writer.url == "http://prometheus:9090/api/v1/write"
+    assert writer.spool_dir == tmp_path
+    assert writer.interval == 30.0
@@ -0,0 +1,146 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for periodic error analysis."""
+
+import math
+import random
+from unittest.mock import patch
+
+import pytest
+
+from phd2_exporter.periodic import (
+    MIN_SAMPLES,
+    PeriodicErrorAnalyzer,
+    analyze,
+    observe_periodic_error,
+    publish_peaks,
+)
+from phd2_exporter.state import PHD2State
+
+np = pytest.importorskip("numpy")
+
+
+def periodic_samples(
+    period: float, amplitude: float, seconds: float
+) -> tuple[list[float], list[float]]:
+    """RA error with a periodic component, frames 1.5 to 3 seconds apart."""
+    rng = random.Random(3)
+    times, values = [], []
+    t = 0.0
+    while t < seconds:
+        times.append(t)
+        values.append(
+            amplitude * math.sin(2 * math.pi * t / period) + rng.gauss(0.0, 0.3)
+        )
+        t += rng.uniform(1.5, 3.0)
+    return times, values
+
+
+def test_analyze_finds_period():
+    """Test the periodic component is the strongest peak."""
+    times, values = periodic_samples(480.0, 1.5, 7200.0)
+
+    peaks = analyze(np.array(times), np.array(values), times[-1] - times[0])
+
+    period, amplitude = peaks[0]
+    assert period == pytest.approx(480.0, rel=0.02)
+    assert amplitude == pytest.approx(1.5, rel=0.1)
+    assert len(peaks) <= 3
+
+
+def test_analyze_short_span():
+    """Test nothing is found without enough guiding time."""
+    assert analyze(np.arange(10.0), np.zeros(10), 9.0) == []
+
+
+def test_analyzer_rolling_window():
+    """Test samples older than the window are dropped."""
+    analyzer = PeriodicErrorAnalyzer(window=100.0)
+    for t in range(1000, 1300):
+        analyzer.add(float(t), 0.5)
+
+    assert analyzer.times.typecode == "f"
+    assert len(analyzer.times) == len(analyzer.values) <= 111
+    assert analyzer.times[-1] - analyzer.times[0] <= 110.0
+
+
+def test_analyzer_poll():
+    """Test analyses run in the background and results are returned once."""
+    analyzer = PeriodicErrorAnalyzer()
+    times, values = periodic_samples(300.0, 2.0, 3600.0)
+    for t, value in zip(times[: MIN_SAMPLES - 1], values, strict=False):
+        analyzer.add(t, value)
+    assert analyzer.poll(1000.0) is None
+    assert analyzer.future is None
+
+    for t, value in zip(
+        times[MIN_SAMPLES - 1 :], values[MIN_SAMPLES - 1 :], strict=False
+    ):
+        analyzer.add(t, value)
+    assert analyzer.poll(1000.0) is None
+    assert analyzer.future is not None
+    analyzer.future.result()
+
+    peaks = analyzer.poll(1001.0)
+    assert peaks is not None
+    assert peaks[0][0] == pytest.approx(300.0, rel=0.02)
+    # next analysis is not due yet
+    assert analyzer.poll(1002.0) is None
+    assert analyzer.future is None
+
+
+def test_publish_peaks():
+    """Test periods and amplitudes in px and arcsec."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    state.pixel_scale = 2.0
+
+    with patch("phd2_exporter.utils.metrics_utility") as mock_metrics:
+        publish_peaks(state, [(480.0, 1.5)])
+
+    labels = {"host": "testhost", "inst": 1, "rank": 1}
+    mock_metrics.set.assert_any_call(
+        "phd2_periodic_error_period_seconds", 480.0, labels
+    )
+    mock_metrics.set.assert_any_call(
+        "phd2_periodic_error_amplitude", 1.5, {**labels, "scale": "px"}
+    )
+    mock_metrics.set.assert_any_call(
+        "phd2_periodic_error_amplitude", 3.0, {**labels, "scale": "arcsec"}
+    )
+
+
+def test_publish_peaks_clears_missing_ranks():
+    """Test ranks without a peak are NaN instead of keeping stale values."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    state.pixel_scale = 2.0
+
+    with patch("phd2_exporter.utils.metrics_utility") as mock_metrics:
+        publish_peaks(state, [(480.0, 1.5), (240.0, 0.5), (120.0, 0.25)])
+        mock_metrics.reset_mock()
+        publish_peaks(state, [(480.0, 1.5)])
+
+    published = {
+        (call[0][0], call[0][2]["rank"], call[0][2].get("scale")): call[0][1]
+        for call in mock_metrics.set.call_args_list
+    }
+    assert published[("phd2_periodic_error_period_seconds", 1, None)] == 480.0
+    for rank in (2, 3):
+        assert math.isnan(published[("phd2_periodic_error_period_seconds", rank, None)])
+        assert math.isnan(published[("phd2_periodic_error_amplitude", rank, "px")])
+        assert math.isnan(published[("phd2_periodic_error_amplitude", rank, "arcsec")])
+
+
+def test_observe_periodic_error():
+    """Test GuideStep RA error is buffered, unless disabled."""
+    state = PHD2State()
+    observe_periodic_error(state, {"Timestamp": 100.0, "RADistanceRaw": 0.4})
+    observe_periodic_error(state, {"Timestamp": 102.0, "RADistanceRaw": -0.2})
+
+    assert list(state.periodic_error.times) == [0.0, 2.0]
+    assert list(state.periodic_error.values) == pytest.approx([0.4, -0.2])
+
+    disabled = PHD2State()
+    disabled.periodic_error_window = 0.0
+    observe_periodic_error(disabled, {"Timestamp": 100.0, "RADistanceRaw": 0.4})
+    assert disabled.periodic_error is None
@@ -0,0 +1,129 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for JSONRPC polling."""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from phd2_exporter.poller import (
+    DEFAULT_POLL,
+    MAX_BACKOFF,
+    BufferedSender,
+    Poller,
+    parse_poll,
+)
+from phd2_exporter.state import PHD2State
+
+
+def sent_methods(mock_socket: MagicMock) -> list[list[str]]:
+    """Methods requested in each write."""
+    return [
+        [json.loads(line)["method"] for line in call[0][0].splitlines()]
+        for call in mock_socket.sendall.call_args_list
+    ]
+
+
+def guiding_state() -> PHD2State:
+    """State of a PHD2 instance that is guiding."""
+    state = PHD2State()
+    state.phd_state = "Guiding"
+    return state
+
+
+def test_parse_poll():
+    """Test parsing methods and intervals."""
+    assert parse_poll("get_connected:30s, get_exposure:2m,get_settling:5") == {
+        "get_connected": 30.0,
+        "get_exposure": 120.0,
+        "get_settling": 5.0,
+    }
+
+
+def test_parse_poll_default():
+    """Test the default polls are valid."""
+    assert "get_connected" in parse_poll(DEFAULT_POLL)
+
+
+def test_parse_poll_off():
+    """Test polling can be disabled."""
+    assert parse_poll("off") == {}
+
+
+@pytest.mark.parametrize(
+    "spec", ["get_nothing:30s", "get_connected:soon", "get_connected:0"]
+)
+def test_parse_poll_invalid(spec):
+    """Test invalid polls are rejected."""
+    with pytest.raises(ValueError):
+        parse_poll(spec)
+
+
+def test_buffered_sender():
+    """Test buffered data is sent in one write."""
+    mock_socket = MagicMock()
+    batch = BufferedSender()
+    batch.flush(mock_socket)
+    batch.sendall(b"a")
+    batch.sendall(b"b")
+    batch.flush(mock_socket)
+
+    mock_socket.sendall.assert_called_once_with(b"ab")
+    assert batch.chunks == []
+
+
+def test_poll_intervals():
+    """Test methods are polled at their own intervals, due ones in one write."""
+    state = guiding_state()
+    poller = Poller({"get_connected": 10.0, "get_exposure": 30.0})
+    mock_socket = MagicMock()
+
+    with patch("phd2_exporter.jsonrpc.get_state", return_value=state):
+        assert poller.poll(mock_socket, state, 100.0) == [
+            "get_connected",
+            "get_exposure",
+        ]
+        state.jrpc_pending.clear()
+        state.jrpc_methods.clear()
+        assert poller.poll(mock_socket, state, 105.0) == []
+        assert poller.poll(mock_socket, state, 110.0) == ["get_connected"]
+
+    assert sent_methods(mock_socket) == [
+        ["get_connected", "get_exposure"],
+        ["get_connected"],
+    ]
+
+
+def test_poll_pending_not_resent():
+    """Test a method still waiting for an answer is not requested again."""
+    state = guiding_state()
+    poller = Poller({"get_connected": 10.0})
+    mock_socket = MagicMock()
+
+    with patch("phd2_exporter.jsonrpc.get_state", return_value=state):
+        poller.poll(mock_socket, state, 100.0)
+        assert poller.poll(mock_socket, state, 110.0) == ["get_connected"]
+
+    assert mock_socket.sendall.call_count == 1
+
+
+def test_poll_backoff_while_idle():
+    """Test polls slow down while PHD2 is stopped and recover when it is busy."""
+    state = PHD2State()
+    state.phd_state = "Stopped"
+    poller = Poller({"get_connected": 10.0})
+
+    with patch("phd2_exporter.jsonrpc.get_state", return_value=state):
+        gaps = []
+        now = 0.0
+        for _ in range(5):
+            poller.poll(MagicMock(), state, now)
+            gaps.append(poller.due["get_connected"] - now)
+            now = poller.due["get_connected"]
+        assert gaps == [10.0, 20.0, 40.0, 80.0, 80.0]
+        assert poller.backoff == MAX_BACKOFF
+
+        state.phd_state = "Guiding"
+        assert poller.poll(MagicMock(), state, now - 70.0) == []
+        assert poller.backoff == 1.0
+        assert poller.due["get_connected"] == now - 60.0
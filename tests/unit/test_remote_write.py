@@ -0,0 +1,306 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for pushing samples with Prometheus remote-write."""
+
+import os
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from phd2_exporter.events import handle_event
+from phd2_exporter.remote_write import (
+    RemoteWriter,
+    decode_varint,
+    decode_write_request,
+    encode_varint,
+    encode_write_request,
+    iter_fields,
+    snappy_compress,
+    snappy_decompress,
+)
+from phd2_exporter.state import PHD2State
+from phd2_exporter.utils import set_remote_writer, utility_inc, utility_set
+
+
+class Receiver(ThreadingHTTPServer):
+    """Local stand-in for a remote-write endpoint, answering with status."""
+
+    def __init__(self) -> None:
+        """Listen on a free localhost port."""
+        super().__init__(("127.0.0.1", 0), ReceiverHandler)
+        self.status = 204
+        self.requests: list[tuple[dict[str, str], bytes]] = []
+
+    @property
+    def url(self) -> str:
+        """URL remote-write requests are posted to."""
+        return f"http://127.0.0.1:{self.server_address[1]}/api/v1/write"
+
+    def series(self) -> list[tuple[dict[str, str], list[tuple[int, float]]]]:
+        """Decode the series of every request received."""
+        return [
+            series
+            for _, body in self.requests
+            for series in decode_write_request(snappy_decompress(body))
+        ]
+
+
+class ReceiverHandler(BaseHTTPRequestHandler):
+    """Records posted requests."""
+
+    server: Receiver
+
+    def do_POST(self) -> None:
+        """Record the request and answer with the configured status."""
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.server.status < 300:
+            self.server.requests.append((dict(self.headers), body))
+        self.send_response(self.server.status)
+        self.end_headers()
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        """Keep test output quiet."""
+
+
+@pytest.fixture
+def receiver() -> Iterator[Receiver]:
+    """Run a receiver in the background."""
+    server = Receiver()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_varint():
+    """Test varints round trip."""
+    for value in (0, 1, 127, 128, 300, 1700000000000):
+        encoded = encode_varint(value)
+        assert decode_varint(encoded, 0) == (value, len(encoded))
+    assert encode_varint(300) == b"\xac\x02"
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"abc",
+        b"phd2_GuideStep_SNR" * 50,
+        bytes(range(256)) * 3,
+        os.urandom(70000),
+    ],
+)
+def test_snappy_round_trip(data):
+    """Test compressed data decompresses to the original."""
+    assert snappy_decompress(snappy_compress(data)) == data
+
+
+def test_snappy_compresses_repeats():
+    """Test repeated label names are compressed."""
+    data = b"__name__phd2_GuideStep_dx host rig inst 1 " * 100
+    assert len(snappy_compress(data)) < len(data) / 10
+
+
+def test_snappy_matches_python_snappy():
+    """Test the pure Python encoder output is readable by python-snappy."""
+    snappy = pytest.importorskip("snappy")
+    data = b"phd2_GuideStep_RADistanceRaw" * 100 + bytes(range(256))
+    assert snappy.uncompress(snappy_compress(data)) == data
+    assert snappy_decompress(snappy.compress(data)) == data
+
+
+def test_write_request_round_trip():
+    """Test series are encoded with sorted labels and samples in time order."""
+    series = {
+        ("phd2_GuideStep_SNR", (("host", "rig"), ("inst", "1"))): {
+            2000: 42.5,
+            1000: 40.0,
+        },
+        ("phd2_connected", ()): {1500: 1.0},
+    }
+
+    assert decode_write_request(encode_write_request(series)) == [
+        (
+            {"__name__": "phd2_GuideStep_SNR", "host": "rig", "inst": "1"},
+            [(1000, 40.0), (2000, 42.5)],
+        ),
+        ({"__name__": "phd2_connected"}, [(1500, 1.0)]),
+    ]
+
+
+def test_write_request_sorts_name_label():
+    """Test __name__ is sorted with the other labels, after uppercase ones."""
+    series = {
+        (
+            "phd2_GuideStep_RADuration",
+            (("RADirection", "West"), ("host", "rig")),
+        ): {1000: 120.0},
+    }
+
+    payload = encode_write_request(series)
+    (_, message), *_ = iter_fields(payload)
+    names = [
+        dict(iter_fields(label))[1]
+        for field, label in iter_fields(message)
+        if field == 1
+    ]
+    assert names == [b"RADirection", b"__name__", b"host"]
+
+
+def test_writer_take_groups_series():
+    """Test samples are grouped by series, the last value at a time wins."""
+    writer = RemoteWriter("http://127.0.0.1:1/api/v1/write")
+    labels = {"inst": 1, "host": "rig"}
+    writer.set("phd2_GuideStep_dx", 0.5, labels, 100.0)
+    writer.set("phd2_GuideStep_dx", 0.25, labels, 102.0)
+    writer.set("phd2_GuideStep_dx", 0.75, labels, 102.0)
+    writer.inc("phd2_GuideStep", labels, 100.0)
+    writer.inc("phd2_GuideStep", labels, 102.0)
+
+    assert writer.take() == {
+        ("phd2_GuideStep_dx", (("host", "rig"), ("inst", "1"))): {
+            100000: 0.5,
+            102000: 0.75,
+        },
+        ("phd2_GuideStep_total", (("host", "rig"), ("inst", "1"))): {
+            100000: 1.0,
+            102000: 2.0,
+        },
+    }
+    assert writer.take() == {}
+
+
+def test_writer_drops_beyond_max_samples():
+    """Test samples are dropped instead of growing memory without bound."""
+    writer = RemoteWriter("http://127.0.0.1:1/api/v1/write", max_samples=2)
+    for value in range(3):
+        writer.set("phd2_connected", value, {}, 100.0 + value)
+    assert writer.dropped == 1
+    assert len(writer.take()) == 1
+
+
+def test_writer_sends_to_receiver(receiver):
+    """Test samples are posted as snappy compressed protobuf."""
+    writer = RemoteWriter(receiver.url)
+    writer.set("phd2_GuideStep_SNR", 42.5, {"host": "rig", "inst": 1}, 1700000000.5)
+    writer.flush()
+    # nothing recorded, nothing sent
+    writer.flush()
+
+    assert len(receiver.requests) == 1
+    headers, _ = receiver.requests[0]
+    assert headers["Content-Encoding"] == "snappy"
+    assert headers["Content-Type"] == "application/x-protobuf"
+    assert headers["X-Prometheus-Remote-Write-Version"] == "0.1.0"
+    assert receiver.series() == [
+        (
+            {"__name__": "phd2_GuideStep_SNR", "host": "rig", "inst": "1"},
+            [(1700000000500, 42.5)],
+        )
+    ]
+    assert writer.sent == 1
+
+
+def test_writer_spools_while_endpoint_fails(receiver, tmp_path):
+    """Test requests are spooled while failing and sent in order once back."""
+    receiver.status = 503
+    writer = RemoteWriter(receiver.url, spool_dir=tmp_path)
+    writer.set("phd2_connected", 1, {}, 100.0)
+    writer.flush()
+    writer.set("phd2_connected", 0, {}, 101.0)
+    writer.flush()
+
+    assert len(list(tmp_path.iterdir())) == 2
+    assert writer.failing is True
+
+    receiver.status = 204
+    writer.set("phd2_connected", 1, {}, 102.0)
+    writer.flush()
+
+    assert list(tmp_path.iterdir()) == []
+    assert writer.failing is False
+    assert [samples for _, samples in receiver.series()] == [
+        [(100000, 1.0)],
+        [(101000, 0.0)],
+        [(102000, 1.0)],
+    ]
+
+
+def test_writer_spools_while_endpoint_unreachable(tmp_path):
+    """Test requests are spooled when nothing listens."""
+    with Receiver() as server:
+        url = server.url
+    writer = RemoteWriter(url, spool_dir=tmp_path, timeout=1.0)
+    writer.set("phd2_connected", 1, {}, 100.0)
+    writer.flush()
+
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_writer_drops_oldest_spooled(receiver, tmp_path):
+    """Test the spool is bounded, the oldest requests are dropped."""
+    receiver.status = 500
+    writer = RemoteWriter(receiver.url, spool_dir=tmp_path, max_spool_bytes=1)
+    writer.set("phd2_connected", 1, {}, 100.0)
+    writer.flush()
+    writer.set("phd2_connected", 0, {}, 101.0)
+    writer.flush()
+
+    # the newest request is kept even if it alone is over the limit
+    assert len(list(tmp_path.iterdir())) == 1
+    receiver.status = 204
+    writer.flush()
+    assert [samples for _, samples in receiver.series()] == [[(101000, 0.0)]]
+
+
+def test_writer_drops_rejected_requests(receiver, tmp_path):
+    """Test requests the endpoint rejects are not spooled."""
+    receiver.status = 400
+    writer = RemoteWriter(receiver.url, spool_dir=tmp_path)
+    writer.set("phd2_connected", 1, {}, 100.0)
+    writer.flush()
+
+    assert list(tmp_path.iterdir()) == []
+    assert writer.rejected == 1
+
+
+def test_writer_thread_sends_on_close(receiver):
+    """Test samples left are sent when closing."""
+    writer = RemoteWriter(receiver.url, interval=60.0)
+    writer.start()
+    writer.set("phd2_connected", 1, {}, 100.0)
+    writer.close()
+
+    assert len(receiver.series()) == 1
+
+
+def test_metric_updates_pushed():
+    """Test metric updates go to the remote writer, stamped when recorded."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    writer = RemoteWriter("http://127.0.0.1:1/api/v1/write")
+    set_remote_writer(writer)
+    try:
+        with (
+            patch("phd2_exporter.utils.metrics_utility"),
+            patch("phd2_exporter.events.get_state", return_value=state),
+            patch("phd2_exporter.remote_write.time.time", return_value=1800000000.0),
+        ):
+            utility_set("phd2_connected", 1, {"host": "testhost", "inst": 1})
+            utility_inc("phd2_error", {"type": "OSError"})
+            # PHD2 time is not used, it may be another host's clock
+            handle_event(
+                MagicMock(),
+                {"Event": "StarLost", "Timestamp": 1700000000.5, "SNR": 3.5},
+            )
+    finally:
+        set_remote_writer(None)
+
+    series = writer.take()
+    labels = (("host", "testhost"), ("inst", "1"))
+    assert series[("phd2_connected", labels)] == {1800000000000: 1.0}
+    assert series[("phd2_error_total", (("type", "OSError"),))] == {1800000000000: 1.0}
+    assert series[("phd2_StarLost_SNR", labels)] == {1800000000000: 3.5}
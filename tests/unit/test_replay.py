@@ -0,0 +1,246 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for replaying guide logs and captures."""
+
+import gzip
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+from phd2_exporter.replay import (
+    GuideLogReader,
+    is_capture,
+    parse_speed,
+    read_capture,
+    replay,
+    replay_file,
+)
+from phd2_exporter.state import PHD2State
+
+GUIDE_LOG = """PHD2 version 2.6.11, Log version 2.5. Log enabled at 2023-01-10 21:03:33
+
+Calibration Begins at 2023-01-10 21:05:00
+Direction,Step,dx,dy,x,y,Dist
+West,0,0.000,0.000,0.000,0.000,0.000
+Calibration complete, mount = Mount.
+
+Guiding Begins at 2023-01-10 21:10:00
+Dither = both axes, Dither scale = 1.000
+Pixel scale = 1.54 arc-sec/px, Binning = 1, Focal length = 500 mm
+Frame,Time,mount,dx,dy,RARawDistance,DECRawDistance,RAGuideDistance,DECGuideDistance,RADuration,RADirection,DECDuration,DECDirection,XStep,YStep,StarMass,SNR,ErrorCode
+1,2.000,"Mount",0.123,-0.456,0.321,-0.111,0.250,0.000,120,W,0,,,,23456,45.67,0
+2,4.000,"DROP",,,,,,,,,,,,,120,2.10,1,"Star lost - low SNR"
+INFO: DITHER by 1.234, -0.567, new lock pos = 100.1, 200.2
+INFO: SETTLING STATE CHANGE, Settling started
+3,6.000,"Mount",0.1,0.2,0.3,0.4,0.3,0.4,50,E,30,N,,,23000,40.00,0
+INFO: SETTLING STATE CHANGE, Settling complete
+Guiding Ends at 2023-01-10 21:10:08
+"""
+
+GUIDING_BEGINS = time.mktime(time.strptime("2023-01-10 21:10:00", "%Y-%m-%d %H:%M:%S"))
+
+
+def read_log(text: str = GUIDE_LOG) -> tuple[GuideLogReader, list[dict]]:
+    """Read all events from guide log text."""
+    reader = GuideLogReader("rig", 2)
+    return reader, list(reader.read(text.splitlines()))
+
+
+def test_guide_log_events():
+    """Test guide log lines become PHD2 events."""
+    reader, events = read_log()
+
+    assert [e["Event"] for e in events] == [
+        "Version",
+        "StartCalibration",
+        "StartGuiding",
+        "GuideStep",
+        "StarLost",
+        "GuidingDithered",
+        "SettleBegin",
+        "GuideStep",
+        "SettleDone",
+        "LoopingExposuresStopped",
+    ]
+    assert all(e["Host"] == "rig" and e["Inst"] == 2 for e in events)
+    assert reader.pixel_scale == 1.54
+
+
+def test_guide_log_guide_step():
+    """Test guide log columns are mapped to GuideStep fields."""
+    _, events = read_log()
+    step = events[3]
+
+    assert step["Timestamp"] == GUIDING_BEGINS + 2.0
+    assert step["Frame"] == 1
+    assert step["RADistanceRaw"] == 0.321
+    assert step["DECDistanceGuide"] == 0
+    assert step["RADirection"] == "W"
+    assert step["Mount"] == "Mount"
+    # empty columns are left out
+    assert "DECDirection" not in step
+
+
+def test_guide_log_drop_and_settle():
+    """Test dropped frames, dithers and settling."""
+    _, events = read_log()
+
+    assert events[4]["StarMass"] == 120
+    assert events[4]["ErrorCode"] == 1
+    assert events[5]["dx"] == 1.234
+    assert events[5]["dy"] == -0.567
+    assert events[8]["Status"] == 0
+    assert events[9]["Timestamp"] == GUIDING_BEGINS + 8.0
+
+
+def test_capture(tmp_path):
+    """Test reading a capture, plain and gzip compressed."""
+    lines = [
+        {"Event": "Version", "Host": "rig", "Inst": 1},
+        {"jsonrpc": "2.0", "id": 1, "result": 1.5},
+        {"Event": "GuideStep", "Frame": 1},
+    ]
+    data = b"".join(json.dumps(line).encode() + b"\r\n" for line in lines)
+    plain = tmp_path / "capture.txt"
+    plain.write_bytes(data)
+    compressed = tmp_path / "capture.txt.gz"
+    compressed.write_bytes(gzip.compress(data))
+
+    for path in [plain, compressed]:
+        assert is_capture(path) is True
+        # only events are replayed
+        assert list(read_capture(path, json.loads)) == [lines[0], lines[2]]
+
+
+def test_capture_responses(tmp_path):
+    """Test responses to captured requests are read with their method."""
+    lines = [
+        {"Event": "Version", "Host": "rig", "Inst": 1},
+        {"method": "get_pixel_scale", "id": 7},
+        {"jsonrpc": "2.0", "id": 7, "result": 1.54},
+        {"jsonrpc": "2.0", "id": 8, "result": 1000},
+    ]
+    path = tmp_path / "capture.txt"
+    path.write_bytes(b"".join(json.dumps(line).encode() + b"\r\n" for line in lines))
+
+    assert list(read_capture(path, json.loads)) == [
+        lines[0],
+        {"jsonrpc": "2.0", "id": 7, "result": 1.54, "method": "get_pixel_scale"},
+    ]
+
+
+def test_is_capture_guide_log(tmp_path):
+    """Test a guide log is not a capture."""
+    path = tmp_path / "PHD2_GuideLog.txt"
+    path.write_text(GUIDE_LOG)
+    assert is_capture(path) is False
+
+
+@pytest.mark.parametrize(
+    ("speed", "expected"), [("1", 1.0), ("10x", 10.0), ("2.5", 2.5), ("max", None)]
+)
+def test_parse_speed(speed, expected):
+    """Test replay speeds."""
+    assert parse_speed(speed) == expected
+
+
+@pytest.mark.parametrize("speed", ["0", "-1", "fast"])
+def test_parse_speed_invalid(speed):
+    """Test invalid replay speeds."""
+    with pytest.raises(ValueError):
+        parse_speed(speed)
+
+
+def test_replay_max_speed():
+    """Test events are handled without waiting at max speed."""
+    events = [{"Event": "GuideStep", "Timestamp": 100.0 + i * 60} for i in range(5)]
+    with (
+        patch("phd2_exporter.replay.handle_event") as mock_handle,
+        patch("phd2_exporter.replay.time.sleep") as mock_sleep,
+    ):
+        assert replay(events, None) == 5
+
+    assert mock_handle.call_count == 5
+    mock_sleep.assert_not_called()
+
+
+def test_replay_state_time_follows_log():
+    """Test state time is accounted with the replayed events' time."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    events = [
+        {"Event": "StartGuiding", "Timestamp": 100.0},
+        {"Event": "GuideStep", "Timestamp": 160.0},
+        {"Event": "GuidingStopped", "Timestamp": 190.0},
+    ]
+    with (
+        patch("phd2_exporter.replay.get_state", return_value=state),
+        patch("phd2_exporter.replay.handle_event"),
+    ):
+        replay(events, None)
+
+    assert state.clock() == 190.0
+
+
+def test_replay_paced():
+    """Test events are paced by their timestamps divided by speed."""
+    events = [{"Event": "GuideStep", "Timestamp": 100.0 + i * 10} for i in range(3)]
+    with (
+        patch("phd2_exporter.replay.handle_event"),
+        patch("phd2_exporter.replay.time.monotonic", return_value=0.0),
+        patch("phd2_exporter.replay.time.sleep") as mock_sleep,
+    ):
+        replay(events, 10.0)
+
+    assert [call[0][0] for call in mock_sleep.call_args_list] == [1.0, 2.0]
+
+
+def test_replay_file_guide_log_pixel_scale(tmp_path):
+    """Test a guide log's pixel scale is applied before its first GuideStep."""
+    path = tmp_path / "PHD2_GuideLog.txt.gz"
+    path.write_bytes(gzip.compress(GUIDE_LOG.encode()))
+    seen = []
+
+    with (
+        patch(
+            "phd2_exporter.replay.handle_event",
+            side_effect=lambda _s, data: seen.append(data["Event"]),
+        ),
+        patch("phd2_exporter.replay.callback_request_pixel_scale") as mock_scale,
+    ):
+        count = replay_file(path, None, {"host": "rig"})
+
+    assert count == len(seen) == 10
+    mock_scale.assert_called_once_with({"result": 1.54})
+
+
+def test_replay_captured_pixel_scale():
+    """Test a captured get_pixel_scale response is applied, without counting."""
+    state = PHD2State()
+    events = [
+        {"method": "get_pixel_scale", "jsonrpc": "2.0", "id": 7, "result": 1.54},
+        {"Event": "GuideStep", "Timestamp": 100.0},
+    ]
+    with (
+        patch("phd2_exporter.replay.get_state", return_value=state),
+        patch("phd2_exporter.jsonrpc.get_state", return_value=state),
+        patch("phd2_exporter.replay.handle_event"),
+    ):
+        assert replay(events, None) == 1
+
+    assert state.pixel_scale == 1.54
+
+
+def test_replay_pixel_scale_option(tmp_path):
+    """Test a given pixel scale is used instead of the guide log's."""
+    path = tmp_path / "PHD2_GuideLog.txt"
+    path.write_text(GUIDE_LOG)
+
+    with (
+        patch("phd2_exporter.replay.handle_event"),
+        patch("phd2_exporter.replay.callback_request_pixel_scale") as mock_scale,
+    ):
+        replay_file(path, None, {"pixel_scale": 2.5})
+
+    mock_scale.assert_called_once_with({"result": 2.5})
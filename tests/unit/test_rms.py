@@ -5,25 +5,52 @@ import math
 from unittest.mock import patch
 
 from phd2_exporter.rms import calculate_and_export_rms, collect_rms_data
+from phd2_exporter.rmsstore import RmsWindow
 from phd2_exporter.state import PHD2State
 
 
+def make_guide_step(ra_raw=1.0, dec_raw=2.0, ra_guide=3.0, dec_guide=4.0):
+    """Create GuideStep data with the RMS keys."""
+    return {
+        "RADistanceRaw": ra_raw,
+        "DECDistanceRaw": dec_raw,
+        "RADistanceGuide": ra_guide,
+        "DECDistanceGuide": dec_guide,
+    }
+
+
+def collect(state, samples):
+    """Collect a list of GuideStep data into the state."""
+    result = False
+    with patch("phd2_exporter.rms.get_state", return_value=state):
+        for data in samples:
+            result = collect_rms_data(data)
+    return result
+
+
+def find_rms(mock_set, source, scale="px", window="live"):
+    """Find the exported RMS value for a source."""
+    for call in mock_set.call_args_list:
+        labels = call[0][2]
+        if (
+            call[0][0] == "phd2_rms"
+            and labels["source"] == source
+            and labels["scale"] == scale
+            and labels["window"] == window
+        ):
+            return call[0][1]
+    return None
+
+
 def test_collect_rms_data_insufficient_data():
     """Test RMS data collection with insufficient data."""
     state = PHD2State()
     state.phd_rms_samples = 5
 
-    data = {
-        "RADistanceRaw": 1.0,
-        "DECDistanceRaw": 2.0,
-        "RADistanceGuide": 3.0,
-        "DECDistanceGuide": 4.0,
-    }
-
     with patch("phd2_exporter.rms.get_state", return_value=state):
-        result = collect_rms_data(data)
+        result = collect_rms_data(make_guide_step())
         assert result is False
-        assert len(state.phd_rms_data["RADistanceRaw"]) == 1
+        assert state.phd_rms_data.count(0) == 1
 
 
 def test_collect_rms_data_exact_samples():
@@ -31,24 +58,20 @@ def test_collect_rms_data_exact_samples():
     state = PHD2State()
     state.phd_rms_samples = 3
 
-    data = {
-        "RADistanceRaw": 1.0,
-        "DECDistanceRaw": 2.0,
-        "RADistanceGuide": 3.0,
-        "DECDistanceGuide": 4.0,
-    }
-
     with patch("phd2_exporter.rms.get_state", return_value=state):
-        # Collect samples - need N+1 calls to get True (N to fill, +1 to trigger calculation)
-        # Calls 1-3: build up to 3 samples
-        for _ in range(3):
-            result = collect_rms_data(data)
+        # Calls 1-2: still filling the window
+        for _ in range(2):
+            result = collect_rms_data(make_guide_step())
             assert result is False
 
-        # Call 4: now we have enough samples to calculate
-        result = collect_rms_data(data)
+        # Call 3: the window is full, enough samples to calculate
+        result = collect_rms_data(make_guide_step())
         assert result is True
-        assert len(state.phd_rms_data["RADistanceRaw"]) == 3
+        assert state.phd_rms_data.count(0) == 3
+
+        # further samples keep the window full
+        assert collect_rms_data(make_guide_step()) is True
+        assert state.phd_rms_data.count(0) == 3
 
 
 def test_collect_rms_data_missing_key():
@@ -65,6 +88,8 @@ def test_collect_rms_data_missing_key():
     with patch("phd2_exporter.rms.get_state", return_value=state):
         result = collect_rms_data(data)
         assert result is False
+        # nothing is collected from an incomplete GuideStep
+        assert state.phd_rms_data is None
 
 
 def test_collect_rms_data_array_limiting():
@@ -72,47 +97,51 @@ def test_collect_rms_data_array_limiting():
     state = PHD2State()
     state.phd_rms_samples = 3
 
-    data = {
-        "RADistanceRaw": 1.0,
-        "DECDistanceRaw": 2.0,
-        "RADistanceGuide": 3.0,
-        "DECDistanceGuide": 4.0,
-    }
+    # Collect 5 samples (more than limit)
+    collect(state, [make_guide_step(ra_raw=float(i)) for i in range(5)])
 
-    with patch("phd2_exporter.rms.get_state", return_value=state):
-        # Collect 5 samples (more than limit)
-        for i in range(5):
-            data["RADistanceRaw"] = float(i)
-            collect_rms_data(data)
+    # Should only keep last 3
+    assert state.phd_rms_data.count(0) == 3
+    # Should have values 2, 3, 4 (oldest removed)
+    rms = state.phd_rms_data.rms(0)["RADistanceRaw"]
+    assert abs(rms - math.sqrt((4.0 + 9.0 + 16.0) / 3.0)) < 0.001
+
+
+def test_collect_rms_data_total():
+    """Test that totals are collected as hypotenuse of RA/DEC."""
+    state = PHD2State()
+    state.phd_rms_samples = 2
+
+    collect(state, [make_guide_step(ra_raw=3.0, dec_raw=4.0, ra_guide=0.0)])
 
-        # Should only keep last 3
-        assert len(state.phd_rms_data["RADistanceRaw"]) == 3
-        # Should have values 2, 3, 4 (oldest removed)
-        assert state.phd_rms_data["RADistanceRaw"] == [2.0, 3.0, 4.0]
+    rms = state.phd_rms_data.rms(0)
+    assert abs(rms["TotalDistanceRaw"] - 5.0) < 0.001
+    assert abs(rms["TotalDistanceGuide"] - 4.0) < 0.001
 
 
 def test_calculate_and_export_rms():
     """Test RMS calculation and export."""
     state = PHD2State()
+    state.set_global_labels("testhost", 1)
     state.phd_rms_samples = 3
     state.pixel_scale = 2.0
-    state.phd_rms_data = {
-        "RADistanceRaw": [1.0, 2.0, 3.0],
-        "DECDistanceRaw": [2.0, 4.0, 6.0],
-        "RADistanceGuide": [0.5, 1.0, 1.5],
-        "DECDistanceGuide": [1.0, 2.0, 3.0],
-    }
+    collect(state, [make_guide_step()] * 3)
 
     with (
         patch("phd2_exporter.rms.get_state", return_value=state),
-        patch("phd2_exporter.rms.utility_set") as mock_set,
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
     ):
+        mock_set = mock_metrics.set
         calculate_and_export_rms()
 
         # Should export metrics for all keys including totals
         # RADistanceRaw, DECDistanceRaw, RADistanceGuide, DECDistanceGuide, TotalDistanceRaw, TotalDistanceGuide
         # Each with px and arcsec = 12 calls
         assert mock_set.call_count == 12
+        # global labels and window are included
+        assert mock_set.call_args_list[0][0][2]["host"] == "testhost"
+        assert mock_set.call_args_list[0][0][2]["window"] == "live"
+        assert find_rms(mock_set, "RADistanceRaw", "arcsec") == 2.0
 
 
 def test_calculate_and_export_rms_no_pixel_scale():
@@ -120,17 +149,13 @@ def test_calculate_and_export_rms_no_pixel_scale():
     state = PHD2State()
     state.phd_rms_samples = 3
     state.pixel_scale = 0.0
-    state.phd_rms_data = {
-        "RADistanceRaw": [1.0, 2.0, 3.0],
-        "DECDistanceRaw": [2.0, 4.0, 6.0],
-        "RADistanceGuide": [0.5, 1.0, 1.5],
-        "DECDistanceGuide": [1.0, 2.0, 3.0],
-    }
+    collect(state, [make_guide_step()] * 3)
 
     with (
         patch("phd2_exporter.rms.get_state", return_value=state),
-        patch("phd2_exporter.rms.utility_set") as mock_set,
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
     ):
+        mock_set = mock_metrics.set
         calculate_and_export_rms()
 
         # Should only export px metrics (6 calls)
@@ -142,25 +167,41 @@ def test_calculate_rms_math():
     state = PHD2State()
     state.phd_rms_samples = 3
     state.pixel_scale = 0.0
-    state.phd_rms_data = {
-        "RADistanceRaw": [3.0, 4.0, 5.0],
-        "DECDistanceRaw": [0.0, 0.0, 0.0],
-        "RADistanceGuide": [0.0, 0.0, 0.0],
-        "DECDistanceGuide": [0.0, 0.0, 0.0],
-    }
+    collect(
+        state,
+        [make_guide_step(ra_raw=v, dec_raw=0.0) for v in [3.0, 4.0, 5.0]],
+    )
+
+    with (
+        patch("phd2_exporter.rms.get_state", return_value=state),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
+    ):
+        mock_set = mock_metrics.set
+        calculate_and_export_rms()
+
+        # RMS of [3, 4, 5] = sqrt((9 + 16 + 25) / 3) = sqrt(50/3) ≈ 4.082
+        expected = math.sqrt(50.0 / 3.0)
+        assert abs(find_rms(mock_set, "RADistanceRaw") - expected) < 0.001
+
+
+def test_calculate_rms_sliding_window():
+    """Test RMS only covers the most recent samples."""
+    state = PHD2State()
+    state.phd_rms_samples = 3
+    collect(
+        state,
+        [make_guide_step(ra_raw=v) for v in [100.0, -50.0, 3.0, 4.0, 5.0]],
+    )
 
     with (
         patch("phd2_exporter.rms.get_state", return_value=state),
-        patch("phd2_exporter.rms.utility_set") as mock_set,
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
     ):
+        mock_set = mock_metrics.set
         calculate_and_export_rms()
 
-        # Find the call for RADistanceRaw
-        for call in mock_set.call_args_list:
-            if call[0][0] == "phd2_rms" and call[0][2]["source"] == "RADistanceRaw":
-                # RMS of [3, 4, 5] = sqrt((9 + 16 + 25) / 3) = sqrt(50/3) ≈ 4.082
-                expected = math.sqrt(50.0 / 3.0)
-                assert abs(call[0][1] - expected) < 0.001
+        expected = math.sqrt(50.0 / 3.0)
+        assert abs(find_rms(mock_set, "RADistanceRaw") - expected) < 0.001
 
 
 def test_calculate_rms_total_distance():
@@ -168,23 +209,66 @@ def test_calculate_rms_total_distance():
     state = PHD2State()
     state.phd_rms_samples = 2
     state.pixel_scale = 0.0
-    state.phd_rms_data = {
-        "RADistanceRaw": [3.0, 5.0],
-        "DECDistanceRaw": [4.0, 12.0],
-        "RADistanceGuide": [0.0, 0.0],
-        "DECDistanceGuide": [0.0, 0.0],
-    }
+    collect(
+        state,
+        [
+            make_guide_step(ra_raw=3.0, dec_raw=4.0),
+            make_guide_step(ra_raw=5.0, dec_raw=12.0),
+        ],
+    )
 
     with (
         patch("phd2_exporter.rms.get_state", return_value=state),
-        patch("phd2_exporter.rms.utility_set") as mock_set,
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
     ):
+        mock_set = mock_metrics.set
         calculate_and_export_rms()
 
         # Total should be hypotenuse: sqrt(3^2 + 4^2) = 5, sqrt(5^2 + 12^2) = 13
         # RMS of [5, 13] = sqrt((25 + 169) / 2) = sqrt(97)
         expected = math.sqrt(97.0)
+        assert abs(find_rms(mock_set, "TotalDistanceRaw") - expected) < 0.001
+
+
+def test_calculate_and_export_rms_no_data():
+    """Test nothing is exported before any data is collected."""
+    state = PHD2State()
+
+    with (
+        patch("phd2_exporter.rms.get_state", return_value=state),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
+    ):
+        mock_set = mock_metrics.set
+        calculate_and_export_rms()
+
+        mock_set.assert_not_called()
+
 
-        for call in mock_set.call_args_list:
-            if call[0][0] == "phd2_rms" and call[0][2]["source"] == "TotalDistanceRaw":
-                assert abs(call[0][1] - expected) < 0.001
+def test_calculate_rms_multiple_windows():
+    """Test that every ready window is exported from one set of samples."""
+    state = PHD2State()
+    state.phd_rms_windows = [
+        RmsWindow("live", samples=2),
+        RmsWindow("long", samples=10),
+        RmsWindow("session"),
+    ]
+    result = collect(
+        state,
+        [make_guide_step(ra_raw=v) for v in [1.0, 1.0, 3.0, 4.0]],
+    )
+    assert result is True
+
+    with (
+        patch("phd2_exporter.rms.get_state", return_value=state),
+        patch("phd2_exporter.utils.metrics_utility") as mock_metrics,
+    ):
+        mock_set = mock_metrics.set
+        calculate_and_export_rms()
+
+        # "long" is not full yet and not exported
+        assert mock_set.call_count == 12
+        assert find_rms(mock_set, "RADistanceRaw", window="long") is None
+        live = find_rms(mock_set, "RADistanceRaw", window="live")
+        assert abs(live - math.sqrt(25.0 / 2.0)) < 0.001
+        session = find_rms(mock_set, "RADistanceRaw", window="session")
+        assert abs(session - math.sqrt(27.0 / 4.0)) < 0.001
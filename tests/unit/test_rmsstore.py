@@ -0,0 +1,183 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for the shared RMS sample store."""
+
+import math
+import random
+
+import pytest
+
+from phd2_exporter.rmsstore import (
+    MAX_FRAME_RATE,
+    MAX_WINDOW_SAMPLES,
+    MAX_WINDOW_SECONDS,
+    RmsStore,
+    RmsWindow,
+    parse_rms_windows,
+)
+
+
+def rms_of(values):
+    """Reference RMS."""
+    return math.sqrt(math.fsum(v * v for v in values) / len(values))
+
+
+def fill(store, values, start=0.0, step=1.0):
+    """Append single key samples at evenly spaced timestamps."""
+    for i, value in enumerate(values):
+        store.append(start + i * step, [value * value])
+
+
+def test_parse_rms_windows():
+    """Test parsing window definitions."""
+    windows = parse_rms_windows("live:10, 5m:5m,hour:1h,sec:30s, session")
+
+    assert windows == [
+        RmsWindow("live", samples=10),
+        RmsWindow("5m", seconds=300.0),
+        RmsWindow("hour", seconds=3600.0),
+        RmsWindow("sec", seconds=30.0),
+        RmsWindow("session"),
+    ]
+    assert windows[-1].is_session() is True
+    assert windows[0].is_session() is False
+
+
+def test_parse_rms_windows_named_session():
+    """Test a session window with a custom name."""
+    assert parse_rms_windows("night:session") == [RmsWindow("night")]
+
+
+@pytest.mark.parametrize(
+    "spec", ["live:abc", "live:0", "live:-5s", ":10", "a:10,a:20", "live:5d"]
+)
+def test_parse_rms_windows_invalid(spec):
+    """Test invalid window definitions."""
+    with pytest.raises(ValueError):
+        parse_rms_windows(spec)
+
+
+def test_store_frame_window():
+    """Test a frame based window covers the last N samples."""
+    store = RmsStore(["ra"], [RmsWindow("live", samples=3)])
+    fill(store, [1.0, 2.0])
+    assert store.is_ready(0) is False
+    assert store.rms(0)["ra"] == pytest.approx(rms_of([1.0, 2.0]))
+
+    fill(store, [3.0, 4.0, 5.0])
+    assert store.is_ready(0) is True
+    assert store.count(0) == 3
+    assert store.rms(0)["ra"] == pytest.approx(rms_of([3.0, 4.0, 5.0]))
+
+
+def test_store_time_window():
+    """Test a time based window covers samples within its duration."""
+    store = RmsStore(["ra"], [RmsWindow("10s", seconds=10.0)])
+    # one sample every 2 seconds, timestamps 0..18
+    fill(store, [float(i) for i in range(10)], step=2.0)
+
+    # samples with timestamp >= 8 are in the window
+    assert store.count(0) == 6
+    assert store.rms(0)["ra"] == pytest.approx(rms_of([4.0, 5.0, 6.0, 7.0, 8.0, 9.0]))
+
+
+def test_store_time_window_keeps_latest_sample():
+    """Test a time window keeps the newest sample after a long gap."""
+    store = RmsStore(["ra"], [RmsWindow("10s", seconds=10.0)])
+    fill(store, [1.0, 2.0])
+    store.append(1000.0, [9.0])
+    assert store.count(0) == 1
+    assert store.rms(0)["ra"] == pytest.approx(3.0)
+
+
+def test_store_session_window():
+    """Test the session window covers everything since the last clear."""
+    store = RmsStore(["ra"], [RmsWindow("session")], capacity=4)
+    values = [float(i) for i in range(20)]
+    fill(store, values)
+    assert store.count(0) == 20
+    assert store.rms(0)["ra"] == pytest.approx(rms_of(values))
+
+
+def test_store_capacity_caps_windows():
+    """Test windows are capped at the store capacity."""
+    store = RmsStore(["ra"], [RmsWindow("hour", seconds=3600.0)], capacity=4)
+    fill(store, [float(i) for i in range(10)])
+    assert store.count(0) == 4
+    assert store.rms(0)["ra"] == pytest.approx(rms_of([6.0, 7.0, 8.0, 9.0]))
+
+
+def test_store_default_capacity():
+    """Test default capacity fits the largest frame and time window."""
+    assert RmsStore(["ra"], [RmsWindow("live", samples=10)]).capacity == 10
+    assert RmsStore(["ra"], [RmsWindow("big", samples=5000)]).capacity == 5000
+    windows = [RmsWindow("live", samples=10), RmsWindow("hour", seconds=3600.0)]
+    assert RmsStore(["ra"], windows).capacity == 3600 * MAX_FRAME_RATE + 1
+    assert RmsStore(["ra"], [RmsWindow("session")]).capacity == 1
+
+
+def test_time_window_not_capped():
+    """Test a time window keeps every frame of fast guiding."""
+    store = RmsStore(["ra"], [RmsWindow("hour", seconds=3600.0)])
+    # one frame a second for 2 hours
+    for t in range(7200):
+        store.append(float(t), [1.0])
+    assert store.count(0) == 3601
+
+
+def test_window_too_large():
+    """Test windows larger than the store can hold are rejected."""
+    RmsWindow("max", seconds=MAX_WINDOW_SECONDS)
+    with pytest.raises(ValueError, match="more than"):
+        RmsWindow("day", seconds=MAX_WINDOW_SECONDS + 1)
+    with pytest.raises(ValueError, match="more than"):
+        RmsWindow("big", samples=MAX_WINDOW_SAMPLES + 1)
+    with pytest.raises(ValueError, match="more than"):
+        parse_rms_windows("day:24h")
+
+
+def test_store_multiple_keys_and_windows():
+    """Test several windows and keys fed from one store."""
+    windows = [
+        RmsWindow("live", samples=5),
+        RmsWindow("30s", seconds=30.0),
+        RmsWindow("session"),
+    ]
+    store = RmsStore(["ra", "dec"], windows, capacity=50)
+    rng = random.Random(1)
+    ra = [rng.uniform(-2.0, 2.0) for _ in range(200)]
+    dec = [rng.uniform(-1.0, 1.0) for _ in range(200)]
+    for i in range(200):
+        store.append(float(i), [ra[i] ** 2, dec[i] ** 2])
+
+    live = store.rms(0)
+    assert live["ra"] == pytest.approx(rms_of(ra[-5:]))
+    assert live["dec"] == pytest.approx(rms_of(dec[-5:]))
+    # timestamps 169..199 are within 30 seconds of 199
+    assert store.rms(1)["ra"] == pytest.approx(rms_of(ra[-31:]))
+    assert store.rms(2)["dec"] == pytest.approx(rms_of(dec))
+
+
+def test_store_running_sums_stay_accurate():
+    """Test running sums match a recomputation after many evictions."""
+    store = RmsStore(["ra"], [RmsWindow("live", samples=10)], capacity=100)
+    rng = random.Random(42)
+    # large values followed by small ones are the worst case for drift
+    big = [rng.uniform(-1000.0, 1000.0) for _ in range(5000)]
+    small = [rng.uniform(-0.01, 0.01) for _ in range(10)]
+    fill(store, big + small)
+    assert store.rms(0)["ra"] == pytest.approx(rms_of(small), rel=1e-6)
+
+
+def test_store_empty_and_clear():
+    """Test an empty store and clearing."""
+    store = RmsStore(["ra"], [RmsWindow("live", samples=2), RmsWindow("session")])
+    assert store.rms(0) == {"ra": 0.0}
+    assert store.is_ready(1) is False
+
+    fill(store, [1.0, 2.0, 3.0])
+    store.clear()
+    assert len(store) == 0
+    assert store.count(0) == 0
+    assert store.count(1) == 0
+    fill(store, [4.0])
+    assert store.rms(1)["ra"] == pytest.approx(4.0)
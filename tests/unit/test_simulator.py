@@ -0,0 +1,190 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for the PHD2 simulator."""
+
+import asyncio
+import json
+import random
+import time
+from unittest.mock import patch
+
+import pytest
+
+from phd2_exporter.collector import InstanceCollector
+from phd2_exporter.framing import LineFramer
+from phd2_exporter.simulator import (
+    EQUIPMENT,
+    METHOD_NOT_FOUND,
+    Simulator,
+    SimulatorConfig,
+    parse_args,
+    rpc_response,
+    session_events,
+)
+from phd2_exporter.state import set_state
+
+
+def test_session_events_frames():
+    """Test a session streams the configured number of GuideSteps."""
+    config = SimulatorConfig(frames=10, dither_every=0)
+    events = list(session_events(config, random.Random(1)))
+
+    assert [e["Event"] for e in events] == ["GuideStep"] * 10
+    assert [e["Frame"] for e in events] == list(range(1, 11))
+    assert all(e["Host"] == "simulator" and e["Inst"] == 1 for e in events)
+
+
+def test_session_events_dither_cycle():
+    """Test dithers are followed by settling GuideSteps and SettleDone."""
+    config = SimulatorConfig(frames=6, dither_every=3, settle_frames=2)
+    names = [e["Event"] for e in session_events(config, random.Random(1))]
+
+    assert names == [
+        "GuideStep",
+        "GuideStep",
+        "GuidingDithered",
+        "SettleBegin",
+        "GuideStep",
+        "Settling",
+        "GuideStep",
+        "Settling",
+        "SettleDone",
+        "GuideStep",
+        "GuidingDithered",
+        "SettleBegin",
+        "GuideStep",
+        "Settling",
+    ]
+
+
+def test_session_events_settle_done_total_frames():
+    """Test SettleDone counts the configured settling frames."""
+    config = SimulatorConfig(frames=20, dither_every=10, settle_frames=7)
+    settle_done = [
+        e
+        for e in session_events(config, random.Random(1))
+        if e["Event"] == "SettleDone"
+    ]
+
+    assert settle_done[0]["TotalFrames"] == 7
+
+
+def test_rpc_response():
+    """Test replies to the requests made by the exporter."""
+    config = SimulatorConfig(pixel_scale=2.5)
+
+    assert rpc_response(config, {"method": "get_pixel_scale", "id": 3}) == {
+        "jsonrpc": "2.0",
+        "id": 3,
+        "result": 2.5,
+    }
+    assert rpc_response(config, {"method": "get_connected", "id": 4})["result"]
+    assert (
+        rpc_response(config, {"method": "get_current_equipment", "id": 5})["result"]
+        == EQUIPMENT
+    )
+    assert rpc_response(config, {"method": "get_exposure", "id": 7})["result"] == 2000
+    assert rpc_response(config, {"method": "get_guide_output_enabled", "id": 8})[
+        "result"
+    ]
+    assert rpc_response(config, {"method": "get_settling", "id": 9})["result"] is False
+    error = rpc_response(config, {"method": "guide", "id": 6})["error"]
+    assert error["code"] == METHOD_NOT_FOUND
+
+
+def test_simulator_serves_session():
+    """Test a client receives the greeting, the session and request replies."""
+
+    async def run() -> tuple[list[dict], int]:
+        simulator = Simulator(
+            SimulatorConfig(port=0, rate=1e6, frames=20, dither_every=0, seed=1)
+        )
+        await simulator.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", simulator.port)
+        writer.write(b'{"method": "get_pixel_scale", "id": 7}\r\n')
+
+        framer = LineFramer()
+        received = []
+        while raw := await reader.read(65536):
+            received += [json.loads(line) for line in framer.feed(raw)]
+        writer.close()
+        await simulator.close()
+        return received, simulator.events_sent
+
+    received, sent = asyncio.run(run())
+    events = [data["Event"] for data in received if "Event" in data]
+
+    assert events[:2] == ["Version", "AppState"]
+    assert events.count("GuideStep") == 20
+    assert sent == 22
+    assert {"jsonrpc": "2.0", "id": 7, "result": 1.5} in received
+
+
+def test_simulator_paces_guide_steps():
+    """Test GuideSteps are sent at the configured rate, not once per tick."""
+
+    async def run() -> tuple[list[float], float]:
+        simulator = Simulator(
+            SimulatorConfig(port=0, rate=20.0, frames=10, dither_every=0, seed=1)
+        )
+        await simulator.start()
+        start = time.monotonic()
+        reader, writer = await asyncio.open_connection("127.0.0.1", simulator.port)
+
+        framer = LineFramer()
+        arrivals = []
+        while raw := await reader.read(65536):
+            arrivals += [
+                time.monotonic() - start
+                for line in framer.feed(raw)
+                if json.loads(line).get("Event") == "GuideStep"
+            ]
+        elapsed = time.monotonic() - start
+        writer.close()
+        await simulator.close()
+        return arrivals, elapsed
+
+    arrivals, elapsed = asyncio.run(run())
+
+    assert len(arrivals) == 10
+    # 10 frames at 20/s take 0.45s from the first to the last
+    assert arrivals[-1] - arrivals[0] >= 0.4
+    assert elapsed < 2.0
+
+
+def test_simulator_drives_collector():
+    """Test the collector handles a simulated session end to end."""
+    collector = InstanceCollector("127.0.0.1", 0)
+
+    async def run() -> None:
+        # as done by InstanceCollector.run()
+        set_state(collector.state)
+        simulator = Simulator(SimulatorConfig(port=0, rate=1e6, frames=30, seed=1))
+        await simulator.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", simulator.port)
+        await collector.read_events(reader, writer)
+        writer.close()
+        await simulator.close()
+
+    with patch("phd2_exporter.utils.metrics_utility") as mock_metrics:
+        asyncio.run(run())
+
+    assert collector.state.global_labels == {"host": "simulator", "inst": 1}
+    assert collector.state.phd_state == "Guiding"
+    guide_steps = [
+        call
+        for call in mock_metrics.inc.call_args_list
+        if call[0][0] == "phd2_GuideStep"
+    ]
+    assert len(guide_steps) == 30
+
+
+def test_parse_args_rate():
+    """Test the rate must be above 0."""
+    with patch("sys.argv", ["phd2-simulator", "--rate", "2.5"]):
+        assert parse_args().rate == 2.5
+    for rate in ["0", "-1", "nan"]:
+        with (
+            patch("sys.argv", ["phd2-simulator", "--rate", rate]),
+            pytest.raises(SystemExit),
+        ):
+            parse_args()
@@ -0,0 +1,133 @@
+# Generated-by: Cursor (Claude Sonnet 4.5)
+"""Unit tests for quantile sketches."""
+
+import math
+import random
+from unittest.mock import patch
+
+import pytest
+
+from phd2_exporter.histogram import DistributionCollector
+from phd2_exporter.sketch import (
+    METRIC_SESSION_GUIDE_ERROR,
+    METRIC_SESSION_STAR_MASS,
+    QuantileSketch,
+    SessionSummary,
+    observe_session,
+)
+from phd2_exporter.state import PHD2State
+
+
+def exact_quantile(values: list[float], q: float) -> float:
+    """Quantile of sorted values with the rank used by the sketch."""
+    return sorted(values)[math.floor(q * (len(values) - 1))]
+
+
+def test_sketch_relative_accuracy():
+    """Test quantiles are within the relative accuracy."""
+    rng = random.Random(1)
+    values = [rng.lognormvariate(-1.0, 1.0) for _ in range(10000)]
+    sketch = QuantileSketch(0.01)
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.01, 0.5, 0.9, 0.99):
+        expected = exact_quantile(values, q)
+        assert sketch.quantile(q) == pytest.approx(expected, rel=0.01)
+    assert sketch.quantile(0.0) == min(values)
+    assert sketch.quantile(1.0) == max(values)
+    assert sketch.count == 10000
+    assert sketch.sum == pytest.approx(sum(values))
+
+
+def test_sketch_zero_and_empty():
+    """Test zeros and the empty sketch."""
+    sketch = QuantileSketch()
+    assert math.isnan(sketch.quantile(0.5))
+
+    for value in [0.0, 0.0, 0.0, 2.0]:
+        sketch.add(value)
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1.0) == 2.0
+
+
+def test_sketch_negative():
+    """Test negative values are rejected."""
+    with pytest.raises(ValueError):
+        QuantileSketch().add(-1.0)
+
+
+def test_sketch_bounded_bins():
+    """Test memory stays bounded, high quantiles keep their accuracy."""
+    sketch = QuantileSketch(0.01, max_bins=50)
+    values = [1.1**i for i in range(200)]
+    for value in values:
+        sketch.add(value)
+
+    assert len(sketch.bins) == 50
+    assert sketch.quantile(0.99) == pytest.approx(
+        exact_quantile(values, 0.99), rel=0.01
+    )
+
+
+def test_sketch_merge():
+    """Test a merged sketch equals one fed all values."""
+    rng = random.Random(2)
+    values = [rng.uniform(0.0, 3.0) for _ in range(1000)]
+    combined, first, second = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for i, value in enumerate(values):
+        combined.add(value)
+        (first if i % 2 else second).add(value)
+
+    first.merge(second)
+
+    assert first.bins == combined.bins
+    assert first.count == combined.count
+    assert first.quantile(0.9) == combined.quantile(0.9)
+    with pytest.raises(ValueError):
+        first.merge(QuantileSketch(0.05))
+
+
+def test_session_summary_publish():
+    """Test summary families in px and arcsec."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    state.pixel_scale = 2.0
+    summary = SessionSummary("test", (("source", "RA"),), scaled=True)
+    for value in [1.0, 1.0, 1.0]:
+        summary.add(value)
+    collector = DistributionCollector()
+
+    with patch("phd2_exporter.sketch.collector", collector):
+        summary.publish(state)
+
+    (family,) = collector.collect()
+    assert family.type == "summary"
+    published = {
+        (sample.name, sample.labels["scale"], sample.labels.get("quantile")): (
+            sample.value
+        )
+        for sample in family.samples
+    }
+    assert published[("test", "px", "0.5")] == 1.0
+    assert published[("test", "arcsec", "0.99")] == 2.0
+    assert published[("test_sum", "arcsec", None)] == 6.0
+    assert published[("test_count", "px", None)] == 3
+    assert summary.dirty is False
+
+
+def test_observe_session():
+    """Test guide error and star mass of a GuideStep are sketched."""
+    state = PHD2State()
+    observe_session(
+        state,
+        {"RADistanceRaw": -3.0, "DECDistanceRaw": 4.0, "StarMass": 25000},
+    )
+
+    def sketch(name, labels=()):
+        return state.sketches[(name, labels)].sketch
+
+    assert sketch(METRIC_SESSION_GUIDE_ERROR, (("source", "RADistanceRaw"),)).sum == 3.0
+    total = sketch(METRIC_SESSION_GUIDE_ERROR, (("source", "TotalDistanceRaw"),))
+    assert total.sum == 5.0
+    assert sketch(METRIC_SESSION_STAR_MASS).sum == 25000
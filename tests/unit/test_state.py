@@ -1,7 +1,10 @@
 # Generated-by: Cursor (Claude Sonnet 4.5)
 """Unit tests for state module."""
 
-from phd2_exporter.state import PHD2State, get_state
+import contextvars
+
+from phd2_exporter.rmsstore import RmsStore, RmsWindow
+from phd2_exporter.state import PHD2State, get_state, set_state
 
 
 def test_phd2_state_initialization():
@@ -10,10 +13,13 @@ def test_phd2_state_initialization():
     assert state.phd_state == ""
     assert state.phd_settling is False
     assert state.phd_rms_samples == 15
-    assert state.phd_rms_data == {}
+    assert state.phd_rms_windows == []
+    assert state.phd_rms_data is None
     assert state.pixel_scale == 0.0
-    assert state.jrpc_callbacks == {}
+    assert state.jrpc_pending == {}
+    assert state.jrpc_methods == {}
     assert state.global_labels is None
+    assert state.metric_handles == {}
     assert state.debug is False
 
 
@@ -24,6 +30,14 @@ def test_set_global_labels():
     assert state.global_labels == {"host": "testhost", "inst": 1}
 
 
+def test_set_global_labels_items():
+    """Test that global labels are also kept as immutable items."""
+    state = PHD2State()
+    assert state.global_label_items == ()
+    state.set_global_labels("TestHost", 1)
+    assert state.global_label_items == (("host", "testhost"), ("inst", 1))
+
+
 def test_set_global_labels_lowercase():
     """Test that host is lowercased."""
     state = PHD2State()
@@ -58,9 +72,9 @@ def test_get_global_labels_none():
 def test_reset_rms_data():
     """Test resetting RMS data."""
     state = PHD2State()
-    state.phd_rms_data = {"test": [1, 2, 3]}
+    state.phd_rms_data = RmsStore(["test"], [RmsWindow("live", samples=3)])
     state.reset_rms_data()
-    assert state.phd_rms_data == {}
+    assert state.phd_rms_data is None
 
 
 def test_get_state():
@@ -68,3 +82,71 @@ def test_get_state():
     state1 = get_state()
     state2 = get_state()
     assert state1 is state2  # Should be the same instance
+
+
+def test_set_state_context():
+    """Test that set_state only affects the current context."""
+    global_state = get_state()
+    instance_state = PHD2State()
+
+    def run_instance():
+        set_state(instance_state)
+        return get_state()
+
+    assert contextvars.copy_context().run(run_instance) is instance_state
+    assert get_state() is global_state
+
+
+def test_update_status_transition():
+    """Test state transitions report changed statuses."""
+    state = PHD2State()
+
+    assert state.update_status("Looping", False, 100.0) == ["Looping"]
+    assert state.update_status("Looping", False, 101.0) == []
+    assert state.update_status("Guiding", True, 110.0) == [
+        "Looping",
+        "Guiding",
+        "Settling",
+    ]
+    assert state.phd_state == "Guiding"
+    assert state.phd_settling is True
+    assert state.update_status("Guiding", False, 120.0) == ["Settling"]
+
+
+def test_update_status_time_in_state():
+    """Test time is accounted to the status active before each update."""
+    state = PHD2State()
+    state.update_status("Looping", False, 100.0)
+    state.update_status("Guiding", True, 110.0)
+    state.update_status("Guiding", False, 115.0)
+    state.account_state_time(130.0)
+
+    assert state.state_seconds == {
+        "Looping": 10.0,
+        "Guiding": 20.0,
+        "Settling": 5.0,
+    }
+
+
+def test_account_state_time_clock_going_backwards():
+    """Test time in state never decreases."""
+    state = PHD2State()
+    state.update_status("Guiding", False, 100.0)
+    state.account_state_time(110.0)
+    state.account_state_time(105.0)
+    state.account_state_time(112.0)
+
+    assert state.state_seconds == {"Guiding": 12.0}
+
+
+def test_set_global_labels_republishes_status():
+    """Test changed global labels require publishing all statuses again."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    state.status_published = True
+
+    state.set_global_labels("testhost", 1)
+    assert state.status_published is True
+
+    state.set_global_labels("otherhost", 1)
+    assert state.status_published is False
@@ -5,10 +5,13 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
+from phd2_exporter.state import PHD2State
 from phd2_exporter.utils import (
+    MetricHandle,
     create_event_metrics,
     debug,
-    make_labels,
+    get_event_metric_handles,
+    get_metric_handle,
     utility_inc,
     utility_set,
 )
@@ -68,34 +71,100 @@ def test_utility_inc_error():
             utility_inc("test_metric", {"label": "value"})
 
 
-def test_make_labels_all_present():
-    """Test make_labels with all keys present."""
-    data = {"key1": "value1", "key2": "value2", "key3": "value3"}
-    labels = make_labels(data, ["key1", "key2"])
-    assert labels == {"key1": "value1", "key2": "value2"}
-
-
-def test_make_labels_missing_keys():
-    """Test make_labels with missing keys."""
-    data = {"key1": "value1"}
-    labels = make_labels(data, ["key1", "key2"])
-    assert labels == {"key1": "value1", "key2": 0}
+def test_metric_handle():
+    """Test metric handle set and inc."""
+    with patch("phd2_exporter.utils.metrics_utility") as mock_metrics:
+        handle = MetricHandle("test_metric", {"label": "value"})
+        handle.set(42)
+        handle.inc()
+        mock_metrics.set.assert_called_once_with("test_metric", 42, {"label": "value"})
+        mock_metrics.inc.assert_called_once_with("test_metric", {"label": "value"})
 
 
-def test_make_labels_empty():
-    """Test make_labels with no keys."""
-    data = {"key1": "value1"}
-    labels = make_labels(data, [])
-    assert labels == {}
+def test_metric_handle_every_update_through_metrics_utility():
+    """Test every update of a handle goes through metrics_utility."""
+    with patch("phd2_exporter.utils.metrics_utility") as mock_metrics:
+        handle = MetricHandle("test_metric", {"label": "value"})
+        handle.set(1)
+        handle.set(2)
+        handle.inc()
+        handle.inc()
+    assert mock_metrics.set.call_count == 2
+    assert mock_metrics.inc.call_count == 2
+
+
+def test_get_metric_handle_cached():
+    """Test handles are resolved once and reused."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+
+    handle = get_metric_handle(state, "phd2_status", (("status", "Guiding"),))
+
+    assert handle.name == "phd2_status"
+    assert handle.labels == {"host": "testhost", "inst": 1, "status": "Guiding"}
+    assert get_metric_handle(state, "phd2_status", (("status", "Guiding"),)) is handle
+    assert (
+        get_metric_handle(state, "phd2_status", (("status", "Paused"),)) is not handle
+    )
+    # global labels are not modified
+    assert state.global_labels == {"host": "testhost", "inst": 1}
+
+
+def test_get_metric_handle_invalidated_on_label_change():
+    """Test cached handles are dropped when global labels change."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+    handle = get_metric_handle(state, "phd2")
+
+    # same labels again, e.g. Version followed by AppState
+    state.set_global_labels("TestHost", 1)
+    assert get_metric_handle(state, "phd2") is handle
+
+    state.set_global_labels("otherhost", 2)
+    new_handle = get_metric_handle(state, "phd2")
+    assert new_handle is not handle
+    assert new_handle.labels == {"host": "otherhost", "inst": 2}
+
+
+def test_get_event_metric_handles():
+    """Test event metric handles."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
+
+    handles = get_event_metric_handles(
+        state, "GuideStep", ("RADuration",), ("RADirection",), ("West",)
+    )
+
+    assert [key for key, _ in handles] == ["RADuration"]
+    assert handles[0][1].name == "phd2_GuideStep_RADuration"
+    assert handles[0][1].labels == {
+        "host": "testhost",
+        "inst": 1,
+        "RADirection": "West",
+    }
+    assert (
+        get_event_metric_handles(
+            state, "GuideStep", ("RADuration",), ("RADirection",), ("West",)
+        )
+        is handles
+    )
 
 
 def test_create_event_metrics():
     """Test create_event_metrics."""
+    state = PHD2State()
+    state.set_global_labels("testhost", 1)
     with patch("phd2_exporter.utils.metrics_utility") as mock_metrics:
-        data = {"Event": "TestEvent", "metric1": 42, "metric2": 3.14}
-        labels = {"label": "value"}
-        create_event_metrics(data, labels, ["metric1", "metric2"])
-
+        data = {
+            "Event": "TestEvent",
+            "metric1": 42,
+            "metric2": 3.14,
+            "label": "value",
+        }
+        create_event_metrics(state, data, ("metric1", "metric2"), ("label", "missing"))
+
+        # missing label keys default to 0
+        labels = {"host": "testhost", "inst": 1, "label": "value", "missing": 0}
         assert mock_metrics.set.call_count == 2
         mock_metrics.set.assert_any_call("phd2_TestEvent_metric1", 42, labels)
         mock_metrics.set.assert_any_call("phd2_TestEvent_metric2", 3.14, labels)
@@ -103,23 +172,23 @@ def test_create_event_metrics():
 
 def test_create_event_metrics_boolean():
     """Test create_event_metrics with boolean values."""
+    state = PHD2State()
     with patch("phd2_exporter.utils.metrics_utility") as mock_metrics:
         data = {"Event": "TestEvent", "bool_true": True, "bool_false": False}
-        labels = {"label": "value"}
-        create_event_metrics(data, labels, ["bool_true", "bool_false"])
+        create_event_metrics(state, data, ("bool_true", "bool_false"))
 
         assert mock_metrics.set.call_count == 2
-        mock_metrics.set.assert_any_call("phd2_TestEvent_bool_true", 1, labels)
-        mock_metrics.set.assert_any_call("phd2_TestEvent_bool_false", 0, labels)
+        mock_metrics.set.assert_any_call("phd2_TestEvent_bool_true", 1, {})
+        mock_metrics.set.assert_any_call("phd2_TestEvent_bool_false", 0, {})
 
 
 def test_create_event_metrics_missing_key():
     """Test create_event_metrics with missing key."""
+    state = PHD2State()
     with patch("phd2_exporter.utils.metrics_utility") as mock_metrics:
         data = {"Event": "TestEvent", "metric1": 42}
-        labels = {"label": "value"}
-        create_event_metrics(data, labels, ["metric1", "missing_metric"])
+        create_event_metrics(state, data, ("metric1", "missing_metric"))
 
         # Should only create metric for existing key
         assert mock_metrics.set.call_count == 1
-        mock_metrics.set.assert_called_once_with("phd2_TestEvent_metric1", 42, labels)
+        mock_metrics.set.assert_called_once_with("phd2_TestEvent_metric1", 42, {})